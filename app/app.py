@@ -17,6 +17,7 @@ from app.app_consts import (
     LOG_FILE_PATH,
     MAX_KEY_ALLOC_ATTEMPTS,
     PLAYER_NUM_OPTION,
+    REPLAY_FILE_PATH,
 )
 from mytyping import ActionMap, CursesWindow, Keymap, OptionMap, OptionMapGenerator
 
@@ -219,6 +220,7 @@ class App:
         self.stdscr.nodelay(True)
         utils.log.info("Initializing Game")
         g = game.game.LocalGame(stdscr=self.stdscr, list_of_keymaps=list_of_keymaps)
+        should_restart = False
         try:
             try:
                 utils.log.info("Running game")
@@ -226,8 +228,13 @@ class App:
             except player.exceptions.GameOverException as e:
                 asyncio.run(g.game_over(player_id=e.player_id))
         except player.exceptions.EndGameException as e:
-            if e.should_restart:
-                self._run_local_game(list_of_keymaps)
+            should_restart = e.should_restart
+        finally:
+            # Saved however the game ended, crashes included, as those are the games worth replaying
+            utils.log.info("Saving replay of game with seed {0}".format(g.seed))
+            g.recorder.save(REPLAY_FILE_PATH)
+        if should_restart:
+            self._run_local_game(list_of_keymaps)
 
     def online_multiplayer(self):
         """
@@ -16,4 +16,5 @@ DEFAULT_MENUS_KEYMAP = {
 
 MAX_KEY_ALLOC_ATTEMPTS = 20
 LOG_FILE_PATH = r"./app.log"
+REPLAY_FILE_PATH = r"./last_game.replay"
 PLAYER_NUM_OPTION = "Number of players in a multiplayer session"
@@ -0,0 +1,45 @@
+"""
+Benchmark of the batch environment's steps per second, run from the repo root with:
+    python -m benchmarks.batch_env
+Every step applies a random action to each of the batch's games, and counts as one step per game.
+The process pool only beats a single process when there are cores to spare.
+"""
+import multiprocessing
+import time
+
+import numpy as np  # type: ignore
+
+from game.batch_env import BatchEnv, ProcessBatchEnv
+from game.game_consts import ENV_ACTIONS
+from utils import log
+
+BATCH_SIZES = [1, 64, 512]
+STEPS = 200
+
+
+def steps_per_second(env, games: int) -> float:
+    rng = np.random.default_rng(0)
+    actions = [rng.integers(0, len(ENV_ACTIONS), games, dtype=np.int8) for _ in range(STEPS)]
+    env.reset()
+    start = time.perf_counter()
+    for step_actions in actions:
+        env.step(step_actions)
+    return games * STEPS / (time.perf_counter() - start)
+
+
+def main():
+    log.disable(log.CRITICAL)
+    workers = multiprocessing.cpu_count()
+    for games in BATCH_SIZES:
+        rate = steps_per_second(BatchEnv(games, seed=0), games)
+        print("{0:4} games, 1 process: {1:,.0f} steps/s".format(games, rate))
+        with ProcessBatchEnv(games, workers=workers, seed=0) as env:
+            print(
+                "{0:4} games, {1} workers: {2:,.0f} steps/s".format(
+                    games, workers, steps_per_second(env, games)
+                )
+            )
+
+
+if __name__ == "__main__":
+    main()
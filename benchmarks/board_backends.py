@@ -0,0 +1,49 @@
+"""
+A/B benchmark of the board backends, run from the repo root with:
+    python -m benchmarks.board_backends
+"""
+import random
+import timeit
+
+from player.board import BOARD_BACKENDS
+from player.exceptions import GameOverException
+from player.player import Player
+from utils import log
+
+GAMES = 50
+MOVES_PER_GAME = 300
+
+
+def play(board_backend: str, seed: int):
+    """
+    Plays a game of random inputs on the given backend, until game over or MOVES_PER_GAME
+    """
+    rng = random.Random(seed)
+    game_player = Player(0, board_backend=board_backend)
+    game_player.spawn_first_piece()
+    actions = [
+        lambda: game_player.move_sideways(-1),
+        lambda: game_player.move_sideways(1),
+        lambda: game_player.rotate(clockwise_rotations=1),
+        lambda: game_player.cycle(),
+        lambda: game_player.cycle(),
+        lambda: game_player.cycle(),
+    ]
+    try:
+        for _ in range(MOVES_PER_GAME):
+            rng.choice(actions)()
+    except GameOverException:
+        pass
+
+
+def main():
+    log.disable(log.CRITICAL)
+    for board_backend in BOARD_BACKENDS:
+        duration = timeit.timeit(
+            lambda: [play(board_backend, seed) for seed in range(GAMES)], number=1
+        )
+        print("{0:>10}: {1:.3f}s for {2} games".format(board_backend, duration, GAMES))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Benchmark of the binary board stream against ANSI frames, run from the repo root with:
+    python -m benchmarks.board_stream
+"""
+import random
+import time
+
+from game.game_consts import DEFAULT_KEYMAP, DOWN, DROP, HOLD, LEFT, RIGHT, ROTATE
+from game.headless import player_action_map
+from player.exceptions import GameOverException
+from player.player import Player
+from screen.renderers import AnsiRenderer
+from screen.views.game_views import GameScreen
+from server.board_stream import BoardDecoder, BoardEncoder
+from utils import log
+
+ACTIONS = 20000
+TERMINAL_SIZE = (24, 80)
+
+
+def main():
+    log.disable(log.CRITICAL)
+    rng = random.Random(0)
+    game_player = None
+    encoder = decoder = action_map = game_screen = None
+    ansi_renderer = AnsiRenderer(write=lambda data: None, size=TERMINAL_SIZE)
+    stream_bytes = 0
+    encode_time = decode_time = 0.0
+    for _ in range(ACTIONS):
+        if game_player is None:
+            game_player = Player(0, seed=rng.getrandbits(32))
+            game_player.spawn_first_piece()
+            action_map = player_action_map(game_player)
+            encoder, decoder = BoardEncoder(game_player), BoardDecoder()
+            game_screen = GameScreen(
+                stdscr=ansi_renderer, game_player=game_player, keymap=DEFAULT_KEYMAP, stats_map={}
+            )
+        try:
+            action_map[rng.choice([LEFT, RIGHT, DOWN, ROTATE, DROP, HOLD, LEFT, RIGHT])]()
+        except GameOverException:
+            game_player = None
+        start = time.perf_counter()
+        data = b"".join(encoder.update())
+        encode_time += time.perf_counter() - start
+        start = time.perf_counter()
+        decoder.feed(data)
+        decode_time += time.perf_counter() - start
+        stream_bytes += len(data)
+        game_screen.print_screen()
+        if game_player is None:
+            assert decoder.board.row_masks() == encoder.player.board.row_masks()
+    print(
+        "stream: {0:.1f} bytes/action, encode {1:.1f}us, decode {2:.1f}us".format(
+            stream_bytes / ACTIONS, encode_time / ACTIONS * 1e6, decode_time / ACTIONS * 1e6
+        )
+    )
+    print("ansi frames: {0:.1f} bytes/action".format(ansi_renderer.bytes_written / ACTIONS))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+"""
+Benchmark of headless games per second, run from the repo root with:
+    python -m benchmarks.headless_games
+"""
+import random
+import time
+
+from game.game_consts import DOWN, DROP, HOLD, LEFT, RIGHT, ROTATE
+from game.headless import HeadlessGame
+from utils import log
+
+GAMES = 500
+INPUTS_PER_SECOND = 8
+
+
+def scripted_inputs(seed: int):
+    """
+    Generates an endless stream of random inputs, INPUTS_PER_SECOND of them per virtual second
+    """
+    rng = random.Random(seed)
+    input_time = 0.0
+    while True:
+        input_time += 1 / INPUTS_PER_SECOND
+        yield input_time, rng.choice([LEFT, RIGHT, DOWN, ROTATE, DROP, HOLD, LEFT, RIGHT])
+
+
+def main():
+    log.disable(log.CRITICAL)
+    start = time.perf_counter()
+    for seed in range(GAMES):
+        HeadlessGame(seed=seed).run(scripted_inputs(seed))
+    duration = time.perf_counter() - start
+    print("{0} games in {1:.3f}s, {2:.0f} games/s".format(GAMES, duration, GAMES / duration))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Benchmark of the movement hot path, run from the repo root with:
+    python -m benchmarks.movement
+Every piece is shifted to a random column, then brought down one of three ways:
+    - fall and lock: gravity cycles, one row each, until the piece locks
+    - hard drop: a single drop
+    - wall bumps: pushed against a wall 10 times before a hard drop, so that most pushes fail
+Games restart on game over. The times are per piece, on both board backends.
+"""
+import random
+import time
+
+from player.board import BOARD_BACKENDS
+from player.exceptions import GameOverException
+from player.player import Player
+from player.player_consts import WIDTH
+from utils import log
+
+PIECES = 3000
+
+
+def fall_and_lock(game_player: Player):
+    pieces_locked = game_player.pieces_locked
+    while game_player.pieces_locked == pieces_locked:
+        game_player.cycle()
+
+
+def hard_drop(game_player: Player):
+    game_player.cycle(hard_drop=True)
+
+
+def wall_bumps(game_player: Player):
+    for _ in range(WIDTH):
+        game_player.move_sideways(-1)
+    game_player.cycle(hard_drop=True)
+
+
+def time_pieces(board_backend: str, bring_down) -> float:
+    """
+    :return: The mean time it takes to bring a piece down, in seconds
+    """
+    rng = random.Random(0)
+    game_player = Player(0, board_backend=board_backend, seed=0)
+    game_player.spawn_first_piece()
+    total = 0.0
+    for _ in range(PIECES):
+        try:
+            game_player.rotate(clockwise_rotations=rng.randrange(4))
+            shift = rng.randrange(-WIDTH // 2, WIDTH // 2 + 1)
+            for _ in range(abs(shift)):
+                game_player.move_sideways(1 if shift > 0 else -1)
+            start = time.perf_counter()
+            bring_down(game_player)
+            total += time.perf_counter() - start
+        except GameOverException:
+            game_player = Player(0, board_backend=board_backend, seed=rng.getrandbits(32))
+            game_player.spawn_first_piece()
+    return total / PIECES
+
+
+def main():
+    log.disable(log.CRITICAL)
+    for board_backend in BOARD_BACKENDS:
+        for bring_down in (fall_and_lock, hard_drop, wall_bumps):
+            name = bring_down.__name__.replace("_", " ")
+            mean = time_pieces(board_backend, bring_down)
+            print("{0:8} {1:13}: {2:.1f}us per piece".format(board_backend, name, mean * 1e6))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Benchmark of the reachable placements search, run from the repo root with:
+    python -m benchmarks.placements
+Games are played by a greedy bot picking among the searched placements, so the boards are the kind bots and hints see.
+Only the searches are timed, once per piece, and they should stay under a millisecond to run every frame.
+"""
+import random
+import time
+
+from benchmarks.versus import board_cost
+from game.headless import player_action_map
+from game.placements import Placement, reachable_placements
+from player.board import BitBoard
+from player.exceptions import GameOverException
+from player.piece_tables import PIECE_ROTATIONS
+from player.player import Player
+from utils import log
+
+GAMES = 10
+PIECES_PER_GAME = 200
+
+
+def placement_cost(game_player: Player, placement: Placement) -> int:
+    board = BitBoard.from_row_masks(game_player.board.row_masks())
+    piece = PIECE_ROTATIONS[game_player.active_piece_key][placement.rotation_state]
+    board.lock(piece, placement.bb_x, placement.bb_y)
+    return board_cost(board.rows) - 10 * len(board.clear_full_rows())
+
+
+def main():
+    log.disable(log.CRITICAL)
+    rng = random.Random(0)
+    search_times = []
+    placements_found = 0
+    for _ in range(GAMES):
+        game_player = Player(0, seed=rng.getrandbits(32))
+        game_player.spawn_first_piece()
+        action_map = player_action_map(game_player)
+        try:
+            for _ in range(PIECES_PER_GAME):
+                start = time.perf_counter()
+                placements = reachable_placements(game_player)
+                search_times.append(time.perf_counter() - start)
+                placements_found += len(placements)
+                best = min(placements, key=lambda placement: placement_cost(game_player, placement))
+                for action in best.actions:
+                    action_map[action]()
+        except GameOverException:
+            pass
+    search_times.sort()
+    print(
+        "{0} searches, {1:.1f} placements per piece".format(
+            len(search_times), placements_found / len(search_times)
+        )
+    )
+    print(
+        "{0:.1f}us mean, {1:.1f}us p99, {2:.1f}us max per search".format(
+            sum(search_times) / len(search_times) * 1e6,
+            search_times[int(len(search_times) * 0.99)] * 1e6,
+            search_times[-1] * 1e6,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Benchmark of drawing game frames, on every renderer that doesn't need a terminal. Run from the repo root with:
+    python -m benchmarks.render_frames
+"""
+import random
+import time
+
+from game.game_consts import DEFAULT_KEYMAP, DOWN, DROP, LEFT, RIGHT, ROTATE
+from game.headless import player_action_map
+from player.exceptions import GameOverException
+from player.player import Player
+from screen.renderers import AnsiRenderer, NullRenderer
+from screen.views.game_views import GameScreen
+from utils import log
+
+FRAMES = 5000
+TERMINAL_SIZE = (24, 80)
+
+
+def draw_frames(renderer):
+    rng = random.Random(0)
+    game_player = Player(0, seed=0)
+    game_player.spawn_first_piece()
+    action_map = player_action_map(game_player)
+    game_screen = GameScreen(
+        stdscr=renderer,
+        game_player=game_player,
+        keymap=DEFAULT_KEYMAP,
+        stats_map={"score": lambda p: p.score},
+    )
+    start = time.perf_counter()
+    for _ in range(FRAMES):
+        try:
+            action_map[rng.choice([LEFT, RIGHT, DOWN, ROTATE, DROP, LEFT, RIGHT, DOWN])]()
+        except GameOverException:
+            game_player = Player(0, seed=0)
+            game_player.spawn_first_piece()
+            action_map = player_action_map(game_player)
+            game_screen.player = game_player
+        game_screen.print_screen()
+    return time.perf_counter() - start
+
+
+def main():
+    log.disable(log.CRITICAL)
+    duration = draw_frames(NullRenderer(size=TERMINAL_SIZE))
+    print("null: {0:.0f} frames/s".format(FRAMES / duration))
+    ansi_renderer = AnsiRenderer(write=lambda data: None, size=TERMINAL_SIZE)
+    duration = draw_frames(ansi_renderer)
+    print(
+        "ansi: {0:.0f} frames/s, {1:.0f} bytes/frame".format(
+            FRAMES / duration, ansi_renderer.bytes_written / FRAMES
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Benchmark of a watched game's tick time as its spectators grow, run from the repo root with:
+    python -m benchmarks.spectators
+Spectators are real local connections, half of them never read, so their frames pile up and get dropped.
+Socket buffers are kept small, like on slow links, so that the kernel doesn't absorb the backlog of the slow ones.
+"""
+import asyncio
+import random
+import socket
+import time
+
+from game.game_consts import DEFAULT_KEYMAP, DOWN, DROP, LEFT, RIGHT, ROTATE
+from game.headless import player_action_map
+from player.exceptions import GameOverException
+from player.player import Player
+from screen.renderers import AnsiRenderer
+from screen.views.game_views import GameScreen
+from server.spectators import Broadcaster
+
+SPECTATOR_COUNTS = [0, 10, 100, 500]
+TICKS = 2000
+TICK_INTERVAL = 0.002
+TERMINAL_SIZE = (24, 80)
+SOCKET_BUFFER_SIZE = 4096
+
+
+async def read_forever(reader: asyncio.StreamReader, stats: dict):
+    while True:
+        data = await reader.read(65536)
+        if not data:
+            return
+        stats["received"] += len(data)
+
+
+async def watch_game(spectators: int):
+    writers = []
+
+    def accept(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        writer.get_extra_info("socket").setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, SOCKET_BUFFER_SIZE)
+        writers.append(writer)
+
+    server = await asyncio.start_server(accept, host="127.0.0.1", port=0, backlog=1024)
+    port = server.sockets[0].getsockname()[1]
+    stats = {"received": 0}
+    clients = []
+    for index in range(spectators):
+        if index % 2 == 0:
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            clients += [writer, asyncio.ensure_future(read_forever(reader, stats))]
+        else:  # A plain socket, that nothing reads from
+            slow_client = socket.socket()
+            slow_client.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, SOCKET_BUFFER_SIZE)
+            slow_client.connect(("127.0.0.1", port))
+            clients.append(slow_client)
+    while len(writers) < spectators:
+        await asyncio.sleep(0.01)
+
+    rng = random.Random(0)
+    renderer = AnsiRenderer(write=lambda data: broadcaster.publish(data), size=TERMINAL_SIZE)
+    broadcaster = Broadcaster(keyframe=renderer.keyframe)
+    game_player = Player(0, seed=0)
+    game_player.spawn_first_piece()
+    action_map = player_action_map(game_player)
+    game_screen = GameScreen(
+        stdscr=renderer, game_player=game_player, keymap=DEFAULT_KEYMAP, stats_map={}
+    )
+    game_screen.print_screen()
+    watchers = [broadcaster.attach(writer) for writer in writers]
+
+    tick_times = []
+    for _ in range(TICKS):
+        start = time.perf_counter()
+        try:
+            action_map[rng.choice([LEFT, RIGHT, DOWN, ROTATE, DROP, LEFT, RIGHT, DOWN])]()
+        except GameOverException:
+            game_player = Player(0, seed=0)
+            game_player.spawn_first_piece()
+            action_map = player_action_map(game_player)
+            game_screen.player = game_player
+        game_screen.print_screen()
+        tick_times.append(time.perf_counter() - start)
+        await asyncio.sleep(TICK_INTERVAL)
+
+    broadcaster.close()
+    for client in clients:
+        if isinstance(client, asyncio.Future):
+            client.cancel()
+        else:
+            client.close()
+    for writer in writers:
+        writer.transport.abort()
+    server.close()
+    tick_times.sort()
+    return (
+        sum(tick_times) / len(tick_times),
+        tick_times[int(len(tick_times) * 0.99)],
+        sum(watcher.frames_dropped for watcher in watchers),
+        stats["received"],
+    )
+
+
+def main():
+    for spectators in SPECTATOR_COUNTS:
+        mean, p99, dropped, received = asyncio.run(watch_game(spectators))
+        print(
+            "{0:4} spectators: tick {1:.1f}us mean, {2:.1f}us p99, {3} frames dropped, {4}KB received".format(
+                spectators, mean * 1e6, p99 * 1e6, dropped, received // 1024
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+Startup benchmark, measuring the cold start of the main modules in fresh interpreters. Run from the repo root with:
+    python -m benchmarks.startup
+"""
+import statistics
+import subprocess
+import sys
+import time
+
+RUNS = 10
+IMPORT_TARGETS = [
+    "mytyping",
+    "player.player",
+    "game.headless",
+    "game.game",
+    "app.app",
+]
+HEADLESS_GAME = "from game.headless import HeadlessGame; HeadlessGame(seed=0).run([])"
+CHECK_CURSES = "; import sys; print('_curses' in sys.modules)"
+
+
+def cold_start(code: str):
+    """
+    Runs code in a fresh interpreter RUNS times
+    :return: The median wall time in ms, and whether curses got loaded
+    """
+    durations = []
+    curses_loaded = False
+    for _ in range(RUNS):
+        start = time.perf_counter()
+        output = subprocess.run(
+            [sys.executable, "-c", code + CHECK_CURSES],
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            check=True,
+        ).stdout
+        durations.append((time.perf_counter() - start) * 1000)
+        curses_loaded = output.strip().endswith(b"True")
+    return statistics.median(durations), curses_loaded
+
+
+def main():
+    baseline, _ = cold_start("pass")
+    print("{0:<16} {1:>10} {2:>10}  {3}".format("target", "total ms", "import ms", "curses loaded"))
+    targets = [("import " + target, target) for target in IMPORT_TARGETS]
+    targets.append((HEADLESS_GAME, "headless game"))
+    for code, name in targets:
+        duration, curses_loaded = cold_start(code)
+        print("{0:<16} {1:>10.1f} {2:>10.1f}  {3}".format(name, duration, duration - baseline, curses_loaded))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Load client for the telnet server, opening many sessions that all play at once. Run from the repo root with:
+    python -m benchmarks.telnet_load [sessions] [port] [single|match]
+Without a port, a server is started in this process on a free port, and the clients share its loop.
+In match mode, the sessions are paired into online matches.
+"""
+import asyncio
+import random
+import sys
+import time
+
+from server.server import GameServer
+from server.server_consts import IAC, NAWS, SB, SE
+from utils import log
+
+SESSIONS = 200
+DURATION = 5.0
+KEYS = [b"\x1b[A", b"\x1b[B", b"\x1b[C", b"\x1b[D", b" ", b"l"]
+WINDOW_SIZE = bytes([IAC, SB, NAWS, 0, 80, 0, 24, IAC, SE])
+MODES = {"single": b"s", "match": b"m"}
+
+
+async def client(port: int, seed: int, stats: dict, mode: bytes):
+    rng = random.Random(seed)
+    connect_time = time.perf_counter()
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(WINDOW_SIZE + mode)
+    stats["connected"] += 1
+
+    async def receive():
+        first = True
+        while True:
+            data = await reader.read(65536)
+            if not data:
+                return
+            if first and b"TETRIS" in data:
+                stats["first_frame"].append(time.perf_counter() - connect_time)
+                first = False
+            stats["bytes"] += len(data)
+
+    receiving = asyncio.ensure_future(receive())
+    end = time.perf_counter() + DURATION
+    while time.perf_counter() < end and not receiving.done():
+        writer.write(rng.choice(KEYS))
+        await asyncio.sleep(rng.uniform(0.05, 0.3))
+    if not receiving.done():
+        stats["alive"] += 1
+    receiving.cancel()
+    writer.close()
+
+
+async def loop_lag(stats: dict):
+    while True:
+        start = time.perf_counter()
+        await asyncio.sleep(0.01)
+        stats["max_lag"] = max(stats["max_lag"], time.perf_counter() - start - 0.01)
+
+
+async def main(sessions: int, port: int, mode: str = "single"):
+    server = None
+    if port is None:
+        game_server = GameServer()
+        server = await game_server.start(host="127.0.0.1", port=0)
+        port = server.sockets[0].getsockname()[1]
+    stats = {"connected": 0, "alive": 0, "bytes": 0, "first_frame": [], "max_lag": 0.0}
+    lag_probe = asyncio.ensure_future(loop_lag(stats))
+    await asyncio.gather(*[client(port, seed, stats, MODES[mode]) for seed in range(sessions)])
+    lag_probe.cancel()
+    if server is not None:
+        server.close()
+        while game_server.sessions:  # Let the sessions see their clients leave
+            await asyncio.sleep(0.01)
+    print(
+        "{0}/{1} sessions connected, {2} alive after {3}s".format(
+            stats["connected"], sessions, stats["alive"], DURATION
+        )
+    )
+    if stats["first_frame"]:
+        print(
+            "first frame after {0:.3f}s on average, {1:.3f}s at worst".format(
+                sum(stats["first_frame"]) / len(stats["first_frame"]), max(stats["first_frame"])
+            )
+        )
+    print(
+        "{0:.1f}KB/s received per session, worst loop lag {1:.1f}ms".format(
+            stats["bytes"] / sessions / DURATION / 1024, stats["max_lag"] * 1000
+        )
+    )
+
+
+if __name__ == "__main__":
+    log.disable(log.CRITICAL)
+    asyncio.run(
+        main(
+            sessions=int(sys.argv[1]) if len(sys.argv) > 1 else SESSIONS,
+            port=int(sys.argv[2]) if len(sys.argv) > 2 and sys.argv[2] != "-" else None,
+            mode=sys.argv[3] if len(sys.argv) > 3 else "single",
+        )
+    )
@@ -0,0 +1,101 @@
+"""
+Benchmark of 8 players trading garbage lines, run from the repo root with:
+    python -m benchmarks.versus
+Every tick, each player places one piece where a greedy bot chooses. Only the game's own work is timed, not the bot's
+search. A round restarts once a player tops out, and the tick times of every quarter of the run are compared.
+"""
+import random
+import time
+
+from player.board import BitBoard
+from player.exceptions import GameOverException
+from player.garbage import GarbageRouter
+from player.piece_tables import PIECE_ROTATIONS
+from player.player import Player
+from player.player_consts import ROTATION_STATES, WIDTH
+from utils import log
+
+PLAYERS = 8
+TICKS = 2000
+
+
+def board_cost(rows):
+    """
+    :return: How bad a board is for the bot, by its holes and height
+    """
+    covered = holes = 0
+    for row in reversed(rows):
+        holes += bin(covered & ~row).count("1")
+        covered |= row
+    height = max((x + 1 for x, row in enumerate(rows) if row), default=0)
+    return holes * 5 + height
+
+
+def greedy_placement(game_player: Player):
+    """
+    :return: The (rotation_state, bb_y) the bot drops the active piece at
+    """
+    best_cost, best_placement = None, (0, game_player.bb_y)
+    for rotation_state in range(ROTATION_STATES):
+        piece = PIECE_ROTATIONS[game_player.active_piece_key][rotation_state]
+        for bb_y in range(-2, WIDTH):
+            bb_x = game_player.bb_x
+            if game_player.board.placement_error(piece, bb_x, bb_y) is not None:
+                continue
+            while game_player.board.placement_error(piece, bb_x - 1, bb_y) is None:
+                bb_x -= 1
+            board = BitBoard.from_row_masks(game_player.board.row_masks())
+            board.lock(piece, bb_x, bb_y)
+            cost = board_cost(board.rows) - 10 * len(board.clear_full_rows())
+            if best_cost is None or cost < best_cost:
+                best_cost, best_placement = cost, (rotation_state, bb_y)
+    return best_placement
+
+
+def place(game_player: Player, rotation_state: int, bb_y: int):
+    game_player.rotate(clockwise_rotations=rotation_state)
+    while game_player.bb_y != bb_y:
+        before = game_player.bb_y
+        game_player.move_sideways(1 if bb_y > before else -1)
+        if game_player.bb_y == before:
+            break
+    game_player.cycle(hard_drop=True)
+
+
+def new_round(rng: random.Random):
+    players = [Player(player_id, seed=rng.getrandbits(32)) for player_id in range(PLAYERS)]
+    for game_player in players:
+        game_player.spawn_first_piece()
+    return players, GarbageRouter(players)
+
+
+def main():
+    log.disable(log.CRITICAL)
+    rng = random.Random(0)
+    players, garbage_router = new_round(rng)
+    tick_times = []
+    lines_sent = rounds = 0
+    for _ in range(TICKS):
+        placements = [greedy_placement(game_player) for game_player in players]
+        start = time.perf_counter()
+        round_over = False
+        for game_player, placement in zip(players, placements):
+            try:
+                place(game_player, *placement)
+            except GameOverException:
+                round_over = True
+        tick_times.append(time.perf_counter() - start)
+        if round_over:
+            lines_sent += garbage_router.lines_sent
+            rounds += 1
+            players, garbage_router = new_round(rng)
+    lines_sent += garbage_router.lines_sent
+    print("{0} players, {1} ticks, {2} rounds, {3} garbage lines sent".format(PLAYERS, TICKS, rounds, lines_sent))
+    quarter = TICKS // 4
+    for index in range(4):
+        quarter_times = tick_times[index * quarter: (index + 1) * quarter]
+        print("quarter {0}: {1:.1f}us per tick".format(index + 1, sum(quarter_times) / quarter * 1e6))
+
+
+if __name__ == "__main__":
+    main()
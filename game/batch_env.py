@@ -0,0 +1,350 @@
+"""
+This is the batch environment module, stepping many headless games at once for training and evaluating bots.
+A BatchEnv runs K independent Players by the exact rules of the game (SRS kicks, 7-bag, SCORE), and every step
+applies one action id (an index of ENV_ACTIONS) to each of them.
+Observations are written in place to preallocated NumPy arrays, stacked over the K games, so a step builds no per-game
+lists or tuples, board rows included. Games that end are restarted right away, and flagged in dones.
+ProcessBatchEnv splits the games between worker processes, sharing the same arrays through shared memory.
+"""
+import multiprocessing
+import multiprocessing.connection
+import random
+from multiprocessing import shared_memory
+from typing import Callable, List, NamedTuple, Optional, Tuple
+
+import numpy as np  # type: ignore
+
+from game.game_consts import ENV_ACTIONS, NO_PIECE_ID
+from game.headless import player_action_map
+from player.exceptions import GameOverException
+from player.player import Player
+from player.player_consts import (
+    DEAD,
+    DEFAULT_BOARD_BACKEND,
+    HEIGHT,
+    LIVE,
+    PIECE_IDS,
+    PREVIEW_SIZE,
+    WIDTH,
+)
+
+_BIT_SHIFTS = np.arange(WIDTH, dtype=np.uint16)
+
+
+class BatchObservation(NamedTuple):
+    """
+    The state of K games, every array's first axis being the game index
+    boards are the pixels as in Player.get_board_view(): EMPTY, LIVE for the active piece, DEAD for locked pixels
+    """
+
+    boards: np.ndarray  # (K, HEIGHT, WIDTH) uint8
+    pieces: np.ndarray  # (K,) int8, the id of the active piece, an index of PIECE_KEYS
+    rotations: np.ndarray  # (K,) int8, the rotation state of the active piece
+    positions: np.ndarray  # (K, 2) int8, the (bb_x, bb_y) of the active piece's bounding box
+    held: np.ndarray  # (K,) int8, the id of the held piece, or NO_PIECE_ID
+    next_pieces: np.ndarray  # (K, PREVIEW_SIZE) int8, the ids of the upcoming pieces
+
+
+class BatchBuffers(NamedTuple):
+    """
+    All the arrays a batch environment reads and writes, every array's first axis being the game index
+    """
+
+    boards: np.ndarray
+    pieces: np.ndarray
+    rotations: np.ndarray
+    positions: np.ndarray
+    held: np.ndarray
+    next_pieces: np.ndarray
+    actions: np.ndarray  # (K,) int8, the action ids of the next step, only used by ProcessBatchEnv
+    rewards: np.ndarray  # (K,) int32, the score gained by the last step
+    dones: np.ndarray  # (K,) bool, whether the last step ended the game, which was then restarted
+
+    @property
+    def observation(self) -> BatchObservation:
+        return BatchObservation(*self[: len(BatchObservation._fields)])
+
+    def games(self, start: int, stop: int) -> "BatchBuffers":
+        """
+        :return: Views of the arrays, for games start to stop only
+        """
+        return BatchBuffers(*(array[start:stop] for array in self))
+
+
+BUFFER_SHAPES = BatchBuffers(
+    boards=((HEIGHT, WIDTH), np.uint8),
+    pieces=((), np.int8),
+    rotations=((), np.int8),
+    positions=((2,), np.int8),
+    held=((), np.int8),
+    next_pieces=((PREVIEW_SIZE,), np.int8),
+    actions=((), np.int8),
+    rewards=((), np.int32),
+    dones=((), np.bool_),
+)
+
+
+def allocate_buffers(
+        games: int, allocate: Callable[[Tuple[int, ...], type], np.ndarray] = np.zeros
+) -> BatchBuffers:
+    """
+    :param games: The amount of games, K
+    :param allocate: Makes an array of a shape and dtype, zeroed
+    """
+    return BatchBuffers(*(allocate((games,) + shape, dtype) for shape, dtype in BUFFER_SHAPES))
+
+
+class BatchEnv:
+    """
+    This steps K independent games with one call
+    """
+
+    def __init__(
+            self,
+            games: int,
+            seed: Optional[int] = None,
+            board_backend: str = DEFAULT_BOARD_BACKEND,
+            buffers: Optional[BatchBuffers] = None,
+            first_game: int = 0,
+    ):
+        """
+        :param games: The amount of games, K
+        :param seed: The seed of every game's piece orders, random if not given
+        :param board_backend: Which board storage the players should use
+        :param buffers: The arrays to write to, allocated if not given
+        :param first_game: The index of the first game in a larger batch, so that shards of a batch play the
+            same games as the whole batch would
+        """
+        self.games = games
+        self.board_backend = board_backend
+        self.buffers = buffers if buffers is not None else allocate_buffers(games)
+        self.observation = self.buffers.observation
+        seed = seed if seed is not None else random.getrandbits(32)
+        # Every game slot seeds the games it plays from its own generator, whatever the other slots do
+        self._rngs = [random.Random(seed + first_game + index) for index in range(games)]
+        self.players = [None] * games  # type: List[Optional[Player]]
+        self._actions = [[]] * games  # type: List[List[Callable[[], None]]]
+        self._dead_masks = np.zeros((games, HEIGHT), dtype=np.uint16)
+        self._live_masks = np.zeros((games, HEIGHT), dtype=np.uint16)  # The active piece's rows alone
+        # Views of every game's rows, made once so that observing a game writes to existing arrays only
+        self._dead_rows = list(self._dead_masks)
+        self._live_rows = list(self._live_masks)
+        self._positions = list(self.observation.positions)
+        self._next_pieces = list(self.observation.next_pieces)
+
+    def _new_game(self, index: int):
+        game_player = Player(
+            index, board_backend=self.board_backend, seed=self._rngs[index].getrandbits(32)
+        )
+        game_player.spawn_first_piece()
+        action_map = player_action_map(game_player)
+        self.players[index] = game_player
+        self._actions[index] = [action_map[action] for action in ENV_ACTIONS]
+
+    def reset(self) -> BatchObservation:
+        """
+        Starts a new game in every slot
+        :return: The observation, whose arrays are overwritten in place by the next step
+        """
+        for index in range(self.games):
+            self._new_game(index)
+            self._observe(index)
+        self.buffers.rewards[:] = 0
+        self.buffers.dones[:] = False
+        self._draw_boards()
+        return self.observation
+
+    def step(self, actions: np.ndarray) -> Tuple[BatchObservation, np.ndarray, np.ndarray]:
+        """
+        Applies an action to every game
+        :param actions: (K,) action ids, indices of ENV_ACTIONS
+        :return: The observation, the score every game gained, and whether every game ended (and was restarted)
+            The arrays are overwritten in place by the next step, copy them to keep them
+        """
+        rewards, dones = self.buffers.rewards, self.buffers.dones
+        for index, action in enumerate(actions.tolist()):
+            game_player = self.players[index]
+            score = game_player.score
+            try:
+                self._actions[index][action]()
+                dones[index] = False
+            except GameOverException:
+                dones[index] = True
+            rewards[index] = game_player.score - score
+            if dones[index]:
+                self._new_game(index)
+            self._observe(index)
+        self._draw_boards()
+        return self.observation, rewards, dones
+
+    def _observe(self, index: int):
+        """
+        Writes the state of a game to the arrays, except for the board pixels which are drawn for all games at once
+        """
+        game_player = self.players[index]
+        observation = self.observation
+        game_player.board.write_row_masks(self._dead_rows[index])
+        live_row = self._live_rows[index]
+        live_row[:] = 0
+        if game_player.active_piece_rotation is not None:
+            bb_x, bb_y = game_player.bb_x, game_player.bb_y
+            for x, mask in game_player.active_piece_rotation.row_masks:
+                live_row[x + bb_x] = mask << bb_y if bb_y >= 0 else mask >> -bb_y
+        observation.pieces[index] = PIECE_IDS[game_player.active_piece_key]
+        observation.rotations[index] = game_player.rotation_state
+        position = self._positions[index]
+        position[0] = game_player.bb_x
+        position[1] = game_player.bb_y
+        observation.held[index] = (
+            PIECE_IDS[game_player.held_piece_key]
+            if game_player.held_piece_key is not None
+            else NO_PIECE_ID
+        )
+        next_pieces = self._next_pieces[index]
+        for slot, piece_id in enumerate(game_player.next_pieces.preview_ids()):
+            next_pieces[slot] = piece_id
+
+    def _draw_boards(self):
+        dead = self._dead_masks[:, :, None] >> _BIT_SHIFTS & 1
+        live = self._live_masks[:, :, None] >> _BIT_SHIFTS & 1
+        np.add(dead * DEAD, live * LIVE, out=self.observation.boards, casting="unsafe")
+
+
+def _run_worker(
+        connection: multiprocessing.connection.Connection,
+        memory_names: List[str],
+        games: int,
+        start: int,
+        stop: int,
+        seed: int,
+        board_backend: str,
+):
+    """
+    The main function of a ProcessBatchEnv worker, stepping games start to stop of the shared arrays on command
+    """
+    memories = [shared_memory.SharedMemory(name=name) for name in memory_names]
+    buffers = env = None
+    try:
+        buffers = BatchBuffers(
+            *(
+                np.ndarray((games,) + shape, dtype=dtype, buffer=memory.buf)
+                for memory, (shape, dtype) in zip(memories, BUFFER_SHAPES)
+            )
+        ).games(start, stop)
+        env = BatchEnv(
+            stop - start, seed=seed, board_backend=board_backend, buffers=buffers, first_game=start
+        )
+        while True:
+            command = connection.recv()
+            if command == "reset":
+                env.reset()
+            elif command == "step":
+                env.step(buffers.actions)
+            else:
+                return
+            connection.send(None)
+    except (EOFError, KeyboardInterrupt):
+        pass
+    finally:
+        del buffers, env  # The arrays have to go before the memory they are views of
+        for memory in memories:
+            memory.close()
+
+
+class ProcessBatchEnv:
+    """
+    This is a BatchEnv whose games are split between worker processes, one per core
+    The observation arrays live in shared memory, so a step only sends a command to every worker and waits for them
+    It plays the exact same games as a BatchEnv with the same seed would
+    """
+
+    def __init__(
+            self,
+            games: int,
+            workers: int,
+            seed: Optional[int] = None,
+            board_backend: str = DEFAULT_BOARD_BACKEND,
+    ):
+        """
+        :param games: The amount of games, K
+        :param workers: The amount of worker processes, usually the amount of cores
+        :param seed: The seed of every game's piece orders, random if not given
+        :param board_backend: Which board storage the players should use
+        """
+        self.games = games
+        seed = seed if seed is not None else random.getrandbits(32)
+        self._memories = []  # type: List[shared_memory.SharedMemory]
+        self.buffers = allocate_buffers(games, allocate=self._allocate_shared)
+        self.observation = self.buffers.observation
+        bounds = np.linspace(0, games, workers + 1).astype(int).tolist()
+        self._connections = []  # type: List[multiprocessing.connection.Connection]
+        self.processes = []  # type: List[multiprocessing.Process]
+        for start, stop in zip(bounds, bounds[1:]):
+            connection, worker_connection = multiprocessing.Pipe()
+            process = multiprocessing.Process(
+                target=_run_worker,
+                args=(
+                    worker_connection,
+                    [memory.name for memory in self._memories],
+                    games,
+                    start,
+                    stop,
+                    seed,
+                    board_backend,
+                ),
+                daemon=True,
+            )
+            process.start()
+            self._connections.append(connection)
+            self.processes.append(process)
+
+    def _allocate_shared(self, shape: Tuple[int, ...], dtype: type) -> np.ndarray:
+        size = max(1, int(np.prod(shape)) * np.dtype(dtype).itemsize)
+        memory = shared_memory.SharedMemory(create=True, size=size)
+        self._memories.append(memory)
+        array = np.ndarray(shape, dtype=dtype, buffer=memory.buf)
+        array[...] = 0
+        return array
+
+    def _command(self, command: str):
+        for connection in self._connections:
+            connection.send(command)
+        for connection in self._connections:
+            connection.recv()
+
+    def reset(self) -> BatchObservation:
+        """
+        Like BatchEnv.reset
+        """
+        self._command("reset")
+        return self.observation
+
+    def step(self, actions: np.ndarray) -> Tuple[BatchObservation, np.ndarray, np.ndarray]:
+        """
+        Like BatchEnv.step
+        """
+        self.buffers.actions[:] = actions
+        self._command("step")
+        return self.observation, self.buffers.rewards, self.buffers.dones
+
+    def close(self):
+        """
+        Stops the workers and frees the shared memory, the arrays can't be used afterwards
+        """
+        for connection in self._connections:
+            try:
+                connection.send("close")
+            except (BrokenPipeError, OSError):
+                pass
+        for process in self.processes:
+            process.join()
+        self.buffers = self.observation = None
+        for memory in self._memories:
+            memory.close()
+            memory.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
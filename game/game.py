@@ -4,30 +4,34 @@ It is composed of a GameLazyClass implementing the logic,
     and of classes running the event loop according to the game mode (single player, local / online multiplayer, etc.)
 """
 import asyncio
-from typing import List, Optional, Union
+import random
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Union
 
 import player.exceptions
 import player.player
-import screen.views.game_views
 # noinspection PyUnresolvedReferences
 from game.game_consts import (
     COUNTDOWN_TIMEOUT,
     DEFAULT_KEYMAP,
-    DOWN,
-    DROP,
     GAME_OVER_TIMEOUT,
-    HOLD,
-    LEFT,
-    NO_KEY,
+    GRAVITY,
+    MAX_GRAVITY_CATCH_UP,
     QUIT,
     RESTART,
-    RIGHT,
-    ROTATE,
     fall_speed_formula,
 )
+from game.game_clock import GravityClock
+from game.headless import player_action_map
+from game.key_reader import KeyReader
+from game.replay import ReplayRecorder, player_seed
 from mytyping import ActionMap, CursesWindow, Keymap, StatsDict
+from player.garbage import GarbageRouter
 from screen.views.game_views_consts import COUNTDOWN
 
+if TYPE_CHECKING:
+    from screen.render_scheduler import RenderScheduler
+    from screen.renderers import ScreenOutput
+
 
 class GameLazyClass:
     """
@@ -35,20 +39,38 @@ class GameLazyClass:
     """
 
     def __init__(
-        self, stdscr: CursesWindow, keymap: Keymap = DEFAULT_KEYMAP, player_id: int = 0
+        self,
+        stdscr: "ScreenOutput",
+        keymap: Keymap = DEFAULT_KEYMAP,
+        player_id: int = 0,
+        seed: Optional[int] = None,
+        recorder: Optional[ReplayRecorder] = None,
+        render_scheduler: Optional["RenderScheduler"] = None,
+        on_change: Optional[Callable[[], None]] = None,
     ):
         """
         Initialises and starts a main of one game_player, and prints everything
-        :param stdscr: The curses window object of the main
-        :type stdscr: curses window
+        :param stdscr: The curses window object of the main, or any other renderer to draw the game to
+        :type stdscr: curses window or screen.renderers.Renderer
         :param keymap: Keymap of this main, defaults to main.DEFAULT_KEYMAP
         :type keymap: dict
+        :param seed: The seed of the player's piece order, random if not given
+        :param recorder: If given, every action applied to the player is recorded to it
+        :param render_scheduler: If given, the screen is drawn through it instead of right away on every change
+        :param on_change: If given, called after every action applied to the player
         """
         self.win = stdscr
         self.known_level = 1
         self.fall_speed = self._fall_speed()
+        self.gravity_clock = GravityClock(
+            period=self.fall_speed, max_catch_up=MAX_GRAVITY_CATCH_UP
+        )
         self.player_id = player_id
-        self.player = player.player.Player(self.player_id)
+        self.player = player.player.Player(self.player_id, seed=seed)
+        self.recorder = recorder
+        self.render_scheduler = render_scheduler
+        self.on_change = on_change
+        self.text_over_board = None  # type: Optional[List[str]]
         self.keymap = keymap
         self.stats = {
             "score": lambda game_player: game_player.score,
@@ -56,16 +78,14 @@ class GameLazyClass:
         }  # type: StatsDict
 
         self.action_map = {
-            LEFT: lambda: self.player.move_sideways(-1),
-            RIGHT: lambda: self.player.move_sideways(1),
-            DOWN: lambda: self.player.cycle(),
-            ROTATE: lambda: self.player.rotate(clockwise_rotations=1),
-            DROP: lambda: self.player.cycle(hard_drop=True),
+            **player_action_map(self.player),
             RESTART: lambda: self._end_game(should_restart=True),
             QUIT: lambda: self._end_game(should_restart=False),
-            HOLD: lambda: self.player.hold(),
         }  # type: ActionMap
 
+        # Imported here so that curses is only loaded once a screen is actually built
+        import screen.views.game_views
+
         self.screen = screen.views.game_views.GameScreen(
             stdscr=self.win,
             game_player=self.player,
@@ -82,6 +102,30 @@ class GameLazyClass:
             player_id=self.player_id, should_restart=should_restart
         )
 
+    def act(self, action: str):
+        """
+        Applies an action of the action map, recording it first if there's a recorder
+        :param action: One of the action names of the keymaps, or GRAVITY
+        """
+        if self.recorder is not None:
+            self.recorder.record(self.player_id, action)
+        self.action_map[action]()
+        if self.on_change is not None:
+            self.on_change()
+
+    def request_render(self, **kwargs):
+        """
+        Asks for the screen to be drawn, in the next frame of the render scheduler if there is one, else right away
+        Once the game is over, the game over text stays over the board
+        :param kwargs: Keyword arguments to be passed onwards to the screen's print_screen()
+        """
+        if self.text_over_board is not None:
+            kwargs.setdefault("text_over_board", self.text_over_board)
+        if self.render_scheduler is not None:
+            self.render_scheduler.mark_dirty(self.screen, **kwargs)
+        else:
+            self.screen.print_screen(**kwargs)
+
     def level_up_check(self):
         """
         This function checks the current level of the player using the related lambda in the stats map
@@ -91,26 +135,29 @@ class GameLazyClass:
         if self.known_level != game_level:
             self.known_level = game_level
             self.fall_speed = self._fall_speed()
+            self.gravity_clock.set_period(self.fall_speed)
 
     async def cycle(self):
         """
         This is the function in charge of implementing the game cycle logic.
+        Gravity runs on a fixed timestep, so a cycle that wakes up late applies every step it owes.
         """
+        self.gravity_clock.reset()
         while True:
             await asyncio.sleep(0)
-            self.player.cycle()
-            await asyncio.sleep(0)
-            self.screen.print_screen()
+            for _ in range(self.gravity_clock.tick()):
+                self.act(GRAVITY)
+                self.level_up_check()
             await asyncio.sleep(0)
-            self.level_up_check()
-            await asyncio.sleep(self.fall_speed)
+            self.request_render()
+            await asyncio.sleep(self.gravity_clock.time_until_next_step())
 
     async def start_countdown(self):
         """
         This function starts the starting countdown when summoned, and should be called on game start.
         """
         for number in COUNTDOWN:
-            self.screen.print_screen(text_over_board=number)
+            self.request_render(text_over_board=number)
             await asyncio.sleep(COUNTDOWN_TIMEOUT)
         self.player.spawn_first_piece()
 
@@ -119,37 +166,98 @@ class GameLazyClass:
         This function prints the game over annotation, and should be called when the game is over.
         :param victory: Whether to display a winning or losing text. Displays neutral text when None.
         """
-        self.screen.display_game_over(
+        self.text_over_board = self.screen.game_over_text(
             victory=victory,
             quit_key=self.keymap["quit"],
             restart_key=self.keymap["restart"],
         )
+        self.request_render()
+
+
+def game_over_victories(
+    players_count: int, already_finished_players: List[int], player_id: int
+) -> Dict[int, Optional[bool]]:
+    """
+    Decides which game over texts to display when a player's game is over
+    In a multiplayer game the player lost, and once a single player is left, that player won.
+    :param players_count: The amount of players in the game
+    :param already_finished_players: The ids of the players whose game is over, the player is appended to it
+    :param player_id: The id of the player whose game is over
+    :return: The victory of every player whose game is over now, by player id. None in a single player game
+    """
+    if players_count == 1:
+        return {player_id: None}
+    victories = {player_id: False}  # type: Dict[int, Optional[bool]]
+    already_finished_players.append(player_id)
+    if players_count - len(already_finished_players) == 1:
+        for other_player_id in range(players_count):
+            if other_player_id not in already_finished_players:
+                victories[other_player_id] = True
+    return victories
+
+
+async def player_key_hook(game_lazy_class: GameLazyClass, queue: asyncio.Queue):
+    """
+    Applies the actions of one player's key presses, as they come in
+    :param game_lazy_class: The game of the player
+    :param queue: The player's action queue, as filled by a KeyReader
+    """
+    while True:
+        action = await queue.get()
+        game_lazy_class.act(action)
+        game_lazy_class.request_render()
+
+
+async def game_over_player_key_hook(game_lazy_class: GameLazyClass, queue: asyncio.Queue):
+    """
+    Applies the quit and restart key presses of one player, once their game is over
+    """
+    while True:
+        action = await queue.get()
+        game_lazy_class.action_map[action]()
 
 
 class LocalGame:
     """
     This class implements a local game, with one or more players.
     The amount of players is defined by how many keymaps are given on init.
+    In versus mode, the players send each other garbage lines by clearing rows.
     """
 
     def __init__(
         self,
         stdscr: CursesWindow,
         list_of_keymaps: Union[Keymap, List[Keymap]] = DEFAULT_KEYMAP,
+        seed: Optional[int] = None,
+        fps: Optional[int] = None,
+        versus: Optional[bool] = None,
     ):
         """
         Create a local game, with the players amount being the length of list_of_keymaps
+        The game is recorded to self.recorder, and can be played back with game.replay.play_replay
         :param stdscr: The whole stdscr you want to capture keystrokes on
         :param list_of_keymaps: a list of list_of_keymaps-type dictionaries
+        :param seed: The seed of the game, random if not given
+        :param fps: The frame rate cap shared by the screens of all players, defaults to screen_consts.TARGET_FPS
+        :param versus: Whether the players send each other garbage, defaults to whether there are several players
         """
 
         if not isinstance(list_of_keymaps, list):
             list_of_keymaps = [list_of_keymaps]
 
+        import screen.render_scheduler
+        import screen.screen_utils
+
         self.win = stdscr
         self.list_of_keymaps = list_of_keymaps  # type: List[Keymap]
         self.players_count = len(self.list_of_keymaps)
-        self.already_finished_players = []
+        self.already_finished_players = []  # type: List[int]
+        self.seed = seed if seed is not None else random.getrandbits(32)
+        self.versus = versus if versus is not None else self.players_count > 1
+        self.recorder = ReplayRecorder(
+            seed=self.seed, players_count=self.players_count, versus=self.versus
+        )
+        self.render_scheduler = screen.render_scheduler.RenderScheduler(fps=fps)
 
         self.game_lazy_classes = []  # type: List[GameLazyClass]
         for player_id, keymap in enumerate(self.list_of_keymaps):
@@ -160,76 +268,86 @@ class LocalGame:
                     ),
                     keymap=keymap,
                     player_id=player_id,
+                    seed=player_seed(self.seed, player_id),
+                    recorder=self.recorder,
+                    render_scheduler=self.render_scheduler,
                 )
             )
+        self.garbage_router = None  # type: Optional[GarbageRouter]
+        if self.versus:
+            self.garbage_router = GarbageRouter(
+                [game_lazy_class.player for game_lazy_class in self.game_lazy_classes]
+            )
 
     async def start(self):
         """
         This is what is called to init the relevant GameLazyClasses and start the game properly.
+        All the players' windows are drawn by one render scheduler, so every frame is a single terminal update.
         :return:
         """
+        render_loop = asyncio.ensure_future(self.render_scheduler.run())
         funcs_to_run = []
         for game_lazy_class in self.game_lazy_classes:
             funcs_to_run.append(game_lazy_class.start_countdown())
         await asyncio.gather(*funcs_to_run)
         # TODO BUGFIX: Wait for all previous futures to finish before running next one
-        funcs_to_run = [self.key_hook()]
+        funcs_to_run = [self.key_hook(), render_loop]
         for game_lazy_class in self.game_lazy_classes:
             funcs_to_run.append(game_lazy_class.cycle())
         await asyncio.gather(*funcs_to_run)
 
     async def key_hook(self):
         """
-        This function is looping around and waits for key presses in a non-blocking manner, receiving NO_KEY if no key
-        was pressed.
+        This function waits for key presses as events, with a KeyReader watching the input fd.
         On key press, this reacts according to the first fitting entry in one of the keymaps.
         """
-        while True:
-            # Awaiting the sleep() allows the asyncio scheduler to context switch us
-            await asyncio.sleep(0)
-            key = self.win.getch()
-            if key == NO_KEY:
-                continue
-            for player_num, keymap in enumerate(self.list_of_keymaps):
-                for item in keymap:
-                    if key == keymap[item]:
-                        self.game_lazy_classes[player_num].action_map[item]()
-                        self.game_lazy_classes[player_num].screen.print_screen()
+        key_reader = KeyReader(self.win, self.list_of_keymaps)
+        key_reader.start()
+        try:
+            await asyncio.gather(
+                *[
+                    player_key_hook(game_lazy_class, queue)
+                    for game_lazy_class, queue in zip(self.game_lazy_classes, key_reader.queues)
+                ]
+            )
+        finally:
+            key_reader.stop()
 
     async def game_over_key_hook(self):
         """
         This function is the special key hook logic for the game over screen.
-        It waits for a bit before sampling keys, and then quits on a quit key, and restarts on any other key
+        It waits for a bit before sampling keys, and then quits on a quit key, and restarts on a restart key
         """
         await asyncio.sleep(GAME_OVER_TIMEOUT)
-        while True:
-            await asyncio.sleep(0)
-            key = self.win.getch()
-            if key == NO_KEY:
-                continue
-            for player_num, keymap in enumerate(self.list_of_keymaps):
-                if key == keymap["quit"]:
-                    self.game_lazy_classes[player_num].action_map["quit"]()
-                elif key == keymap["restart"]:
-                    self.game_lazy_classes[player_num].action_map["restart"]()
+        game_over_keymaps = [
+            {QUIT: keymap[QUIT], RESTART: keymap[RESTART]} for keymap in self.list_of_keymaps
+        ]
+        key_reader = KeyReader(self.win, game_over_keymaps)
+        key_reader.start()
+        try:
+            await asyncio.gather(
+                *[
+                    game_over_player_key_hook(game_lazy_class, queue)
+                    for game_lazy_class, queue in zip(self.game_lazy_classes, key_reader.queues)
+                ]
+            )
+        finally:
+            key_reader.stop()
 
     async def game_over(self, player_id):
         """
         This is called on game over, to init the game over logic on all the GameLazyClasses
         """
         # TODO BUGFIX: Game over on one player blocks all other players. We need to rethink it.
-        funcs_to_run = [self.game_over_key_hook()]
-        if self.players_count == 1:
-            for game_lazy_class in self.game_lazy_classes:
-                funcs_to_run.append(game_lazy_class.game_over(victory=None))
-        else:
+        funcs_to_run = [self.game_over_key_hook(), self.render_scheduler.run()]
+        if self.garbage_router is not None:
+            self.garbage_router.eliminate(player_id)
+        victories = game_over_victories(
+            self.players_count, self.already_finished_players, player_id
+        )
+        for finished_player_id, victory in victories.items():
             funcs_to_run.append(
-                self.game_lazy_classes[player_id].game_over(victory=False)
+                self.game_lazy_classes[finished_player_id].game_over(victory=victory)
             )
-            self.already_finished_players.append(self.game_lazy_classes[player_id])
-            if self.players_count - len(self.already_finished_players) == 1:
-                for game_lazy_class in self.game_lazy_classes:
-                    if game_lazy_class not in self.already_finished_players:
-                        funcs_to_run.append(game_lazy_class.game_over(victory=True))
 
         await asyncio.gather(*funcs_to_run)
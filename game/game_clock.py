@@ -0,0 +1,67 @@
+"""
+This is the game clock module, keeping gravity on a fixed timestep.
+Instead of sleeping fall_speed after every step (which adds the render time and scheduler jitter to every period),
+gravity steps are due at fixed times on a monotonic clock, and a loop that falls behind applies all the steps it owes.
+"""
+import time
+from typing import Callable, Optional
+
+
+class GravityClock:
+    """
+    This is a fixed-timestep clock, counting the gravity steps owed since the last tick.
+    The first step is due right away, like the first iteration of the original game cycle.
+    """
+
+    def __init__(
+            self,
+            period: float,
+            clock: Callable[[], float] = time.monotonic,
+            max_catch_up: Optional[int] = None,
+    ):
+        """
+        :param period: The time between gravity steps, in seconds
+        :param clock: A monotonic clock in seconds, a virtual one can be used for headless games
+        :param max_catch_up: The most steps a single tick may owe, the rest are skipped. Unlimited if None
+        """
+        self.clock = clock
+        self.period = period
+        self.max_catch_up = max_catch_up
+        self.next_step_time = self.clock()
+        self.lag = 0.0  # How late the last tick was, compared to the step it was due for
+        self.max_lag = 0.0
+        self.skipped_steps = 0
+
+    def reset(self):
+        """
+        Restarts the clock, making a step due right away
+        """
+        self.next_step_time = self.clock()
+        self.lag = 0.0
+
+    def set_period(self, period: float):
+        """
+        Changes the time between steps, keeping the next step relative to the last one
+        """
+        self.next_step_time += period - self.period
+        self.period = period
+
+    def tick(self) -> int:
+        """
+        Consumes the gravity steps that are due
+        :return: How many steps are owed since the last tick, 0 if the next one isn't due yet
+        """
+        now = self.clock()
+        if now < self.next_step_time:
+            return 0
+        self.lag = now - self.next_step_time
+        self.max_lag = max(self.max_lag, self.lag)
+        steps = int(self.lag // self.period) + 1
+        self.next_step_time += steps * self.period
+        if self.max_catch_up is not None and steps > self.max_catch_up:
+            self.skipped_steps += steps - self.max_catch_up
+            steps = self.max_catch_up
+        return steps
+
+    def time_until_next_step(self) -> float:
+        return max(0.0, self.next_step_time - self.clock())
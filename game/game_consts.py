@@ -1,8 +1,12 @@
 """
 Here are consts relating to the operation of the game module
 """
-from curses import KEY_DOWN, KEY_LEFT, KEY_RIGHT, KEY_UP
 
+# curses key codes, spelled out so that the game logic can be imported without loading curses
+KEY_DOWN = 258
+KEY_UP = 259
+KEY_LEFT = 260
+KEY_RIGHT = 261
 # Dict key consts
 LEFT = "left"
 RIGHT = "right"
@@ -12,6 +16,7 @@ DROP = "drop"
 HOLD = "hold"
 RESTART = "restart"
 QUIT = "quit"
+GRAVITY = "gravity"  # Not a key, the action of the game cycle
 restart_key = ord("r")
 quit_key = ord("q")
 # IO stuff
@@ -99,8 +104,21 @@ LIST_OF_KEYBOARD_KEYS = [
 ]
 # Game consts
 NO_KEY = -1
+INPUT_POLL_INTERVAL = 0.01  # Only used where the event loop can't watch the input fd
 GAME_OVER_TIMEOUT = 0.8
 COUNTDOWN_TIMEOUT = 0.6
+MAX_GRAVITY_CATCH_UP = 20  # The most gravity steps a late game cycle applies at once, the rest are skipped
+
+# Replay logs
+REPLAY_MAGIC = b"MTRP"
+REPLAY_VERSION = 2
+REPLAY_HEADER_FORMAT = "<4sBQB?"  # Magic, version, seed, players count, versus
+REPLAY_EVENT_FORMAT = "<IBB"  # Tick, player id, action id
+REPLAY_ACTIONS = (LEFT, RIGHT, DOWN, ROTATE, DROP, HOLD, GRAVITY)  # The index of an action is its id
+
+# Batch environments
+ENV_ACTIONS = REPLAY_ACTIONS  # The index of an action is its id, like in replays
+NO_PIECE_ID = -1  # The piece id observed when there is no held piece
 
 
 def fall_speed_formula(level: int):
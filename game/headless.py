@@ -0,0 +1,130 @@
+"""
+This is the headless game module, running the player logic without a terminal.
+Instead of key presses and asyncio.sleep, a HeadlessGame is driven by a scripted input stream and a virtual clock,
+so thousands of games can be simulated per second for load testing, replay checks and bot training.
+Gravity runs on the same GravityClock as live games, reading the virtual clock, so both follow the same stepping rules.
+"""
+from typing import Iterable, Optional, Tuple
+
+import player.exceptions
+import player.player
+from game.game_clock import GravityClock
+from game.game_consts import (
+    DOWN,
+    DROP,
+    GRAVITY,
+    HOLD,
+    LEFT,
+    MAX_GRAVITY_CATCH_UP,
+    RIGHT,
+    ROTATE,
+    fall_speed_formula,
+)
+from mytyping import ActionMap
+from player.player_consts import DEFAULT_BOARD_BACKEND
+
+ScriptedInput = Tuple[float, str]  # (virtual time in seconds, action)
+
+
+def player_action_map(game_player: player.player.Player) -> ActionMap:
+    """
+    Generates the actions that move the player's pieces, keyed by the action names of the keymaps
+    :param game_player: The player to act upon
+    """
+    return {
+        LEFT: lambda: game_player.move_sideways(-1),
+        RIGHT: lambda: game_player.move_sideways(1),
+        DOWN: lambda: game_player.cycle(),
+        ROTATE: lambda: game_player.rotate(clockwise_rotations=1),
+        DROP: lambda: game_player.cycle(hard_drop=True),
+        HOLD: lambda: game_player.hold(),
+        GRAVITY: lambda: game_player.cycle(),
+    }
+
+
+class HeadlessGame:
+    """
+    This class runs a single player game with no screen, on a virtual clock.
+    Gravity is applied the same way GameLazyClass.cycle does, right on start and then every fall_speed seconds.
+    The virtual clock is only moved to times gravity is due at or inputs come in, like a game cycle that is never late.
+    """
+
+    def __init__(
+            self,
+            player_id: int = 0,
+            seed: Optional[int] = None,
+            board_backend: str = DEFAULT_BOARD_BACKEND,
+    ):
+        """
+        :param player_id: The id of the player
+        :param seed: The seed of the piece order, random if not given
+        :param board_backend: Which board storage the player should use
+        """
+        self.player_id = player_id
+        self.player = player.player.Player(
+            self.player_id, board_backend=board_backend, seed=seed
+        )
+        self.action_map = player_action_map(self.player)
+        self.known_level = 1
+        self.fall_speed = fall_speed_formula(level=self.known_level)
+        self.time = 0.0  # The virtual clock, in seconds since the first piece spawned
+        self.gravity_clock = GravityClock(
+            period=self.fall_speed, clock=lambda: self.time, max_catch_up=MAX_GRAVITY_CATCH_UP
+        )
+        self.game_over = False
+        self.player.spawn_first_piece()
+
+    def level_up_check(self):
+        """
+        Updates the fall speed if the player's level has changed, like GameLazyClass.level_up_check
+        """
+        game_level = int(self.player.level)
+        if self.known_level != game_level:
+            self.known_level = game_level
+            self.fall_speed = fall_speed_formula(level=self.known_level)
+            self.gravity_clock.set_period(self.fall_speed)
+
+    def act(self, action: str):
+        """
+        Applies an action to the player, marking the game as over on a GameOverException
+        :param action: One of the action names of the keymaps, or GRAVITY
+        """
+        if self.game_over:
+            return
+        try:
+            self.action_map[action]()
+        except player.exceptions.GameOverException:
+            self.game_over = True
+
+    def advance(self, until: float):
+        """
+        Moves the virtual clock forward, applying every gravity step that is due on the way
+        :param until: The virtual time to advance to
+        """
+        while not self.game_over and self.gravity_clock.next_step_time <= until:
+            self.time = self.gravity_clock.next_step_time
+            for _ in range(self.gravity_clock.tick()):
+                self.act(GRAVITY)
+                self.level_up_check()
+        self.time = max(self.time, until)
+
+    def run(self, inputs: Iterable[ScriptedInput], until: Optional[float] = None):
+        """
+        Plays a stream of scripted inputs, in order
+        :param inputs: (virtual time, action) pairs, with non-decreasing times
+        :param until: The virtual time to stop at. If None, gravity keeps going after the inputs until game over
+        :return: Whether the game is over
+        """
+        for input_time, action in inputs:
+            if until is not None and input_time > until:
+                break
+            self.advance(input_time)
+            self.act(action)
+            if self.game_over:
+                return True
+        if until is None:
+            while not self.game_over:
+                self.advance(self.gravity_clock.next_step_time)
+        else:
+            self.advance(until)
+        return self.game_over
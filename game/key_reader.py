@@ -0,0 +1,85 @@
+"""
+This is the key reader module, delivering key presses to the game as events instead of busy-polling getch().
+The input fd is registered with the asyncio loop, and whenever it becomes readable every pending key is read,
+decoded with the keymaps and put in the action queue of the matching players.
+Sources that aren't a local terminal, like network sessions, can skip start() and push their keys with dispatch().
+"""
+import asyncio
+import sys
+from typing import List, Optional
+
+from game.game_consts import INPUT_POLL_INTERVAL, NO_KEY
+from mytyping import CursesWindow, Keymap
+
+
+class KeyReader:
+    """
+    This reads keys from a curses window in nodelay mode, and dispatches them as action names to a queue per player.
+    """
+
+    def __init__(
+            self,
+            win: Optional[CursesWindow],
+            list_of_keymaps: List[Keymap],
+            fd: Optional[int] = None,
+    ):
+        """
+        :param win: The window to getch() from, should be in nodelay mode. Only needed once started
+        :param list_of_keymaps: The keymaps of the players, in order
+        :param fd: The fd to wait on for input, defaults to stdin once started
+        """
+        self.win = win
+        self.list_of_keymaps = list_of_keymaps
+        self.fd = fd
+        self.queues = [
+            asyncio.Queue() for _ in self.list_of_keymaps
+        ]  # type: List[asyncio.Queue]
+        self._loop = None  # type: Optional[asyncio.AbstractEventLoop]
+        self._poll_task = None  # type: Optional[asyncio.Task]
+
+    def start(self):
+        """
+        Starts reading keys on the running loop
+        Falls back to polling every INPUT_POLL_INTERVAL on loops that can't watch fds (e.g. the Windows proactor)
+        """
+        if self.fd is None:
+            self.fd = sys.stdin.fileno()
+        self._loop = asyncio.get_running_loop()
+        try:
+            self._loop.add_reader(self.fd, self.read_keys)
+        except NotImplementedError:
+            self._poll_task = self._loop.create_task(self._poll())
+        self.read_keys()  # Keys that were already buffered won't make the fd readable again
+
+    def stop(self):
+        if self._poll_task is not None:
+            self._poll_task.cancel()
+            self._poll_task = None
+        elif self._loop is not None and not self._loop.is_closed():
+            self._loop.remove_reader(self.fd)
+        self._loop = None
+
+    async def _poll(self):
+        while True:
+            self.read_keys()
+            await asyncio.sleep(INPUT_POLL_INTERVAL)
+
+    def read_keys(self):
+        """
+        Reads every pending key, and dispatches it
+        """
+        while True:
+            key = self.win.getch()
+            if key == NO_KEY:
+                return
+            self.dispatch(key)
+
+    def dispatch(self, key: int):
+        """
+        Puts the action of a key in the queue of every player that has it in their keymap
+        :param key: The key code, as returned by getch()
+        """
+        for player_num, keymap in enumerate(self.list_of_keymaps):
+            for item in keymap:
+                if key == keymap[item]:
+                    self.queues[player_num].put_nowait(item)
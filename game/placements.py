@@ -0,0 +1,235 @@
+"""
+This is the placements module, finding every spot the active piece can lock at, for bots, hints and ghost pieces.
+A breadth first search runs over the (rotation state, bb_x, bb_y) states the piece can reach from where it is, by the
+moves of the action map: LEFT, RIGHT, ROTATE (with the SRS kicks, like Player.rotate) and DOWN as a soft drop.
+Every state where the piece rests on something is a placement, locked by the inputs that reached it and a DROP.
+Placements leaving the same cells DEAD, like the 4 rotations of the O-Block, are only listed once.
+States are grouped in columns of states, one for every (rotation state, bb_y), each a bitmask holding every bb_x.
+Which of them the piece fits at comes from board.fitting_rows(), by the same rules as Player.fits, so the search
+moves whole columns of states with a few bitwise ops, and never tests a placement on the board one by one.
+Gravity isn't part of the search, the input sequences assume the piece doesn't fall while they are played.
+"""
+from typing import Dict, List, NamedTuple, Tuple, Union
+
+from game.game_consts import DOWN, DROP, LEFT, RIGHT, ROTATE
+from player.board import fitting_rows
+from player.piece_tables import PIECE_ROTATIONS, WALL_KICKS
+from player.player import Player
+from player.player_consts import FITTING_BB_X_OFFSET, HEIGHT, ROTATION_STATES, SHAPES_DICT, WIDTH
+
+_Y_STATES = WIDTH + FITTING_BB_X_OFFSET  # The columns of states of a rotation state, for bb_y from -offset up
+_Y_OFFSET = FITTING_BB_X_OFFSET  # Column rotation_state * _Y_STATES + bb_y + _Y_OFFSET holds the states of bb_y
+# The most rows a wall kick moves a piece up or down
+_KICK_REACH = max(abs(kick[0]) for kicks in WALL_KICKS.values() for offsets in kicks.values() for kick in offsets)
+_SOFT_DROPS = [(DOWN,) * rows for rows in range(HEIGHT + FITTING_BB_X_OFFSET)]
+
+# How a column's new states were reached: the mask of those states, the move, and what the move was made from,
+# the states it was soft dropped from for DOWN, or the (column, x offset) it was rotated from for ROTATE
+Arrival = Tuple[int, str, Union[int, Tuple[int, int]]]
+
+
+class Placement(NamedTuple):
+    """
+    A spot the active piece can lock at, and the inputs that lock it there
+    """
+
+    rotation_state: int
+    bb_x: int
+    bb_y: int
+    actions: Tuple[str, ...]  # Action names of the action map, the last one being DROP
+
+
+def _rotation_kicks(piece_key: str) -> Tuple[Tuple[Tuple[int, int], ...], ...]:
+    """
+    :return: For every column of states, the (x offset, column) of the states a clockwise rotation tries, in order
+    """
+    columns = []
+    for rotation_state in range(ROTATION_STATES):
+        new_rotation_state = (rotation_state + 1) % ROTATION_STATES
+        kicks = WALL_KICKS[piece_key][(rotation_state, new_rotation_state)]
+        for y in range(_Y_STATES):
+            columns.append(
+                tuple(
+                    (x_offset, new_rotation_state * _Y_STATES + y + y_offset)
+                    for x_offset, y_offset in kicks
+                    if 0 <= y + y_offset < _Y_STATES
+                )
+            )
+    return tuple(columns)
+
+
+def _locked_shapes(piece_key: str) -> Tuple[Tuple[int, int], ...]:
+    """
+    :return: For every column of states, an id of the piece's row masks shifted to its bb_y from its lowest row up,
+        and the row of that lowest row in the bounding box, so placements leaving the same cells DEAD are told apart
+        without building their cells
+    """
+    shape_ids = {}  # type: Dict[Tuple[Tuple[int, int], ...], int]
+    columns = []
+    for piece in PIECE_ROTATIONS[piece_key]:
+        lowest_row = piece.row_masks[0][0]
+        for bb_y in range(-_Y_OFFSET, WIDTH):
+            shape = tuple(
+                (x - lowest_row, mask << bb_y if bb_y >= 0 else mask >> -bb_y) for x, mask in piece.row_masks
+            )
+            columns.append((shape_ids.setdefault(shape, len(shape_ids)), lowest_row))
+    return tuple(columns)
+
+
+_ROTATION_KICKS = {piece_key: _rotation_kicks(piece_key) for piece_key in SHAPES_DICT}
+# The (column, rotation, bb_y) of the columns of states where the piece is within the board's width, the piece fits
+# nowhere in the others
+_IN_WIDTH_COLUMNS = {
+    piece_key: tuple(
+        (rotation_state * _Y_STATES + bb_y + _Y_OFFSET, piece, bb_y)
+        for rotation_state, piece in enumerate(PIECE_ROTATIONS[piece_key])
+        for bb_y in range(-_Y_OFFSET, WIDTH)
+        if fitting_rows([0] * WIDTH, piece, bb_y)
+    )
+    for piece_key in SHAPES_DICT
+}
+_LOCKED_SHAPES = {piece_key: _locked_shapes(piece_key) for piece_key in SHAPES_DICT}
+
+
+def _fitting_states(game_player: Player) -> List[int]:
+    """
+    :return: For every column of states, a bitmask of the bb_x + FITTING_BB_X_OFFSET the active piece fits at
+    """
+    column_masks = game_player.board.column_masks()
+    fitting = [0] * (ROTATION_STATES * _Y_STATES)
+    for column, piece, bb_y in _IN_WIDTH_COLUMNS[game_player.active_piece_key]:
+        fitting[column] = fitting_rows(column_masks, piece, bb_y)
+    return fitting
+
+
+def _soft_drops(states: int, fitting: int) -> int:
+    """
+    :return: The states of a column that soft dropping the given ones reaches, them included
+    """
+    # An occluded fill, moving every state down through the fitting states 1, 2, 4, 8 and 16 rows at a time
+    states |= states >> 1 & fitting
+    fitting &= fitting >> 1
+    states |= states >> 2 & fitting
+    fitting &= fitting >> 2
+    states |= states >> 4 & fitting
+    fitting &= fitting >> 4
+    states |= states >> 8 & fitting
+    fitting &= fitting >> 8
+    return states | states >> 16 & fitting
+
+
+def _search(
+        fitting: List[int], rotation_kicks: Tuple[Tuple[Tuple[int, int], ...], ...], start_column: int, start_x: int
+) -> Tuple[List[int], List[List[Arrival]]]:
+    """
+    Searches the states reachable from the start, a layer of LEFT, RIGHT and ROTATE moves at a time, with every
+    state reached soft dropped as far as it goes right away. Each move is made for a whole column of states at once
+    The columns where the piece fits never touch the ends of a rotation state's columns, so LEFT and RIGHT never
+    cross into another rotation state
+    :return: For every column of states, the states reached, and how they were reached
+    """
+    reached = [0] * len(fitting)
+    arrivals = [[] for _ in fitting]  # type: List[List[Arrival]]
+    next_layer = {}  # type: Dict[int, int]
+
+    def arrive(column: int, states: int, move: str, source: Union[int, Tuple[int, int]]):
+        """
+        Adds the new states among the given ones to the next layer, along with every state they soft drop to
+        """
+        states &= ~reached[column]
+        if states:
+            arrivals[column].append((states, move, source))
+            dropped = _soft_drops(states, fitting[column]) & ~states & ~reached[column]
+            if dropped:
+                arrivals[column].append((dropped, DOWN, states))
+            reached[column] |= states | dropped
+            next_layer[column] = next_layer.get(column, 0) | states | dropped
+
+    # The start is never walked back from, as its inputs are known to be empty, so how it is said to arrive is moot
+    arrive(start_column, 1 << start_x, DROP, start_column)
+    layer, next_layer = next_layer, {}
+    while layer:
+        for column, states in layer.items():
+            arrive(column - 1, states & fitting[column - 1], LEFT, column)
+            arrive(column + 1, states & fitting[column + 1], RIGHT, column)
+            for x_offset, new_column in rotation_kicks[column]:  # Every state takes the first kick that fits it
+                new_fitting = fitting[new_column]
+                # Shifted by x_offset, up first so that negative offsets need no other shift
+                kicked = states << _KICK_REACH + x_offset >> _KICK_REACH & new_fitting
+                arrive(new_column, kicked, ROTATE, (column, x_offset))
+                states &= ~(new_fitting << _KICK_REACH >> _KICK_REACH + x_offset)
+                if not states:
+                    break
+        layer, next_layer = next_layer, {}
+    return reached, arrivals
+
+
+def _actions_to(arrivals: List[List[Arrival]], paths: Dict[Tuple[int, int], Tuple[str, ...]], column: int, x: int):
+    """
+    Rebuilds the inputs that reach a state from the start of the search, by walking back the way it was reached
+    :param paths: The inputs of the states rebuilt so far by (column, x), holding the start's empty inputs at first.
+        The states walked through are added to it, as placements share most of their inputs
+    :return: The inputs, a tuple of action names
+    """
+    walked = []  # type: List[Tuple[Tuple[int, int], Tuple[str, ...]]]
+    while (column, x) not in paths:
+        state = column, x
+        _, move, source = next(arrival for arrival in arrivals[column] if arrival[0] >> x & 1)
+        if move == DOWN:  # Dropped from the nearest state above it that the drop started at
+            above = source >> x + 1
+            rows = (above & -above).bit_length()
+            walked.append((state, _SOFT_DROPS[rows]))
+            x += rows
+        elif move == ROTATE:
+            column, x_offset = source
+            x -= x_offset
+            walked.append((state, (ROTATE,)))
+        else:
+            column = source
+            walked.append((state, (move,)))
+    actions = paths[column, x]
+    for state, move_actions in reversed(walked):
+        actions += move_actions
+        paths[state] = actions
+    return actions
+
+
+def reachable_placements(game_player: Player) -> List[Placement]:
+    """
+    Searches every placement of the player's active piece reachable from its current state
+    :param game_player: The player whose active piece to place, it is only read
+    :return: The placements, by rotation state, bb_y and bb_x
+    """
+    piece_key = game_player.active_piece_key
+    if game_player.active_piece_rotation is None:
+        return []
+    fitting = _fitting_states(game_player)
+    start_column = game_player.rotation_state * _Y_STATES + game_player.bb_y + _Y_OFFSET
+    start_x = game_player.bb_x + FITTING_BB_X_OFFSET
+    if not fitting[start_column] >> start_x & 1:
+        return []
+    reached, arrivals = _search(fitting, _ROTATION_KICKS[piece_key], start_column, start_x)
+
+    placements = []
+    locked_shapes = _LOCKED_SHAPES[piece_key]
+    placed = set()
+    paths = {(start_column, start_x): ()}  # type: Dict[Tuple[int, int], Tuple[str, ...]]
+    for column, states in enumerate(reached):
+        resting = states & ~(fitting[column] << 1)  # Where moving down doesn't fit
+        while resting:
+            x = (resting & -resting).bit_length() - 1
+            resting &= resting - 1
+            shape_id, lowest_row = locked_shapes[column]
+            if (shape_id, x + lowest_row) in placed:
+                continue
+            placed.add((shape_id, x + lowest_row))
+            rotation_state, y = divmod(column, _Y_STATES)
+            placements.append(
+                Placement(
+                    rotation_state,
+                    x - FITTING_BB_X_OFFSET,
+                    y - _Y_OFFSET,
+                    _actions_to(arrivals, paths, column, x) + (DROP,),
+                )
+            )
+    return placements
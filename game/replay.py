@@ -0,0 +1,147 @@
+"""
+This is the replay module, recording games to a compact binary log and playing them back headlessly.
+A log is a header holding the game seed, players count and versus mode, followed by fixed size
+(tick, player_id, action) events.
+Gravity steps are recorded as GRAVITY actions, so playback doesn't depend on timing at all, and ticks
+(milliseconds since the recording started) are only used to play back at real speed.
+"""
+import struct
+import time
+from typing import Callable, List, NamedTuple, Optional
+
+from game.game_consts import (
+    REPLAY_ACTIONS,
+    REPLAY_EVENT_FORMAT,
+    REPLAY_HEADER_FORMAT,
+    REPLAY_MAGIC,
+    REPLAY_VERSION,
+)
+from game.headless import HeadlessGame
+from player.garbage import GarbageRouter
+
+_ACTION_IDS = {action: action_id for action_id, action in enumerate(REPLAY_ACTIONS)}
+_HEADER = struct.Struct(REPLAY_HEADER_FORMAT)
+_EVENT = struct.Struct(REPLAY_EVENT_FORMAT)
+
+
+class ReplayEvent(NamedTuple):
+    tick: int
+    player_id: int
+    action: str
+
+
+class Replay(NamedTuple):
+    seed: int
+    players_count: int
+    events: List[ReplayEvent]
+    versus: bool = False  # Whether the players sent each other garbage
+
+
+class InvalidReplay(Exception):
+    """
+    This is raised when decoding something that isn't a replay log of a supported version
+    """
+
+    pass
+
+
+def player_seed(seed: int, player_id: int):
+    """
+    Derives the piece order seed of a player from the seed of the game
+    """
+    return seed + player_id
+
+
+def encode_replay(replay: Replay) -> bytes:
+    """
+    Encodes a replay to its binary log
+    """
+    return _HEADER.pack(
+        REPLAY_MAGIC, REPLAY_VERSION, replay.seed, replay.players_count, replay.versus
+    ) + b"".join(
+        _EVENT.pack(event.tick, event.player_id, _ACTION_IDS[event.action])
+        for event in replay.events
+    )
+
+
+def decode_replay(data: bytes) -> Replay:
+    """
+    Decodes a binary log back to a replay
+    Raises InvalidReplay if data isn't a replay log of a supported version
+    """
+    try:
+        magic, version, seed, players_count, versus = _HEADER.unpack_from(data)
+    except struct.error:
+        raise InvalidReplay
+    if magic != REPLAY_MAGIC or version != REPLAY_VERSION:
+        raise InvalidReplay
+    events = [
+        ReplayEvent(tick=tick, player_id=player_id, action=REPLAY_ACTIONS[action_id])
+        for tick, player_id, action_id in _EVENT.iter_unpack(data[_HEADER.size:])
+    ]
+    return Replay(seed=seed, players_count=players_count, events=events, versus=versus)
+
+
+class ReplayRecorder:
+    """
+    This records the actions applied to the players of a game, to be saved as a replay log
+    """
+
+    def __init__(
+            self,
+            seed: int,
+            players_count: int,
+            clock: Callable[[], float] = time.monotonic,
+            versus: bool = False,
+    ):
+        """
+        :param seed: The seed of the recorded game
+        :param players_count: The amount of players in the recorded game
+        :param clock: A clock in seconds, ticks are counted from its value on init
+        :param versus: Whether the players of the recorded game send each other garbage
+        """
+        self.clock = clock
+        self.start_time = self.clock()
+        self.replay = Replay(seed=seed, players_count=players_count, events=[], versus=versus)
+
+    def record(self, player_id: int, action: str):
+        """
+        Records an action, should be called right before it's applied
+        Actions that don't affect the player (restart, quit) are ignored
+        """
+        if action not in _ACTION_IDS:
+            return
+        tick = int((self.clock() - self.start_time) * 1000)
+        self.replay.events.append(ReplayEvent(tick=tick, player_id=player_id, action=action))
+
+    def save(self, path: str):
+        with open(path, "wb") as replay_file:
+            replay_file.write(encode_replay(self.replay))
+
+
+def play_replay(
+        replay: Replay,
+        real_speed: Optional[bool] = False,
+        sleep: Callable[[float], None] = time.sleep,
+) -> List[HeadlessGame]:
+    """
+    Plays a replay back on headless games
+    :param replay: The replay to play
+    :param real_speed: If true, waits between events like in the recorded game. Else runs at full CPU speed
+    :param sleep: The function used to wait when playing at real speed
+    :return: The headless games of all players, in their state at the end of the replay
+    """
+    games = [
+        HeadlessGame(player_id=player_id, seed=player_seed(replay.seed, player_id))
+        for player_id in range(replay.players_count)
+    ]
+    garbage_router = GarbageRouter([game.player for game in games]) if replay.versus else None
+    last_tick = 0
+    for event in replay.events:
+        if real_speed and event.tick > last_tick:
+            sleep((event.tick - last_tick) / 1000)
+        last_tick = event.tick
+        games[event.player_id].act(event.action)
+        if garbage_router is not None and games[event.player_id].game_over:
+            garbage_router.eliminate(event.player_id)
+    return games
@@ -3,12 +3,10 @@ This is the main code, called to run the server.
 It is not too complex and should not be. Logic should be implemented elsewhere
 """
 import argparse
-import curses
 from typing import Optional
 
-import app.app
 from mytyping import CursesWindow
-from server import server
+from server import server, workers
 
 
 def run_locally(stdscr: CursesWindow, debug: Optional[bool] = False):
@@ -17,6 +15,8 @@ def run_locally(stdscr: CursesWindow, debug: Optional[bool] = False):
     :param stdscr: The curses window that every graphic will be done in relation to it.
     :param debug: Start the app in debug mode.
     """
+    import app.app  # Loads curses, so only imported when running locally
+
     a = app.app.App(stdscr=stdscr, debug=debug)
     a.main()
 
@@ -25,8 +25,19 @@ parser = argparse.ArgumentParser(description="Run a MATTETRIS server")
 parser.add_argument("-port", action="store")
 parser.add_argument("--run-locally", action="store_true", help="Don't open a telnet server")
 parser.add_argument("--debug", action="store_true", help="Don't suppress warning prints")
+parser.add_argument(
+    "--workers",
+    action="store",
+    type=int,
+    default=1,
+    help="Serve from this many processes sharing the port, usually the amount of cores",
+)
 
 if parser.parse_args().run_locally:
+    import curses
+
     curses.wrapper(run_locally, parser.parse_args().debug)
+elif parser.parse_args().workers > 1:
+    workers.run_workers(workers=parser.parse_args().workers, port=parser.parse_args().port)
 else:
     server.run_server(port=parser.parse_args().port)
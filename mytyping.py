@@ -1,15 +1,19 @@
 """
 Here complex types are defined for type hints later on
+Nothing here should have side effects on import, as every module (headless ones included) imports it
 """
-import curses
-from typing import Any, Callable, Dict, List, Tuple, Union
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Tuple, Union
+
+if TYPE_CHECKING:
+    from curses import window as CursesWindow
+else:
+    CursesWindow = Any
 
 Keymap = Dict[str, int]
 ActionMap = Dict[str, Callable[[], None]]
 OptionMap = List[List[Tuple[str, Union[str, int, None], Callable[[], None]]]]
 OptionMapGenerator = Callable[[], OptionMap]
 StatsDict = Dict[str, Callable[[Any], int]]
-CursesWindow = type(curses.initscr())
 BoundingBox = List[List[int]]
 PieceCoordinates = BoundingBox
 OffsetData = List[List[Tuple[int, int]]]
@@ -0,0 +1,409 @@
+"""
+This is the board module, holding the different storage backends of a player's board.
+A board only holds locked (DEAD) pixels, the active piece is kept by the player and overlaid when viewing.
+Every backend exposes the same interface, so the player module doesn't care which one it runs on:
+    - Indexing (board[x][y]) and len() behave like the original HEIGHT x WIDTH array
+    - fits() tests a piece placement without raising, and placement_error() tells why one doesn't fit
+    - lock() turns a piece placement into DEAD pixels
+    - clear_full_rows() removes full rows and returns their indices
+    - insert_garbage() pushes rows in from the bottom
+    - to_list(), row_masks() and copy() are for views and snapshots, and from_row_masks() rebuilds a board from one
+    - write_row_masks() writes the row masks into a preallocated array instead, for observations taken every step
+    - column_masks() is the board by columns, from which fitting_rows() tells every bb_x a piece fits at in one go,
+      with the exact rules of fits(), for searches over many placements
+    - heights holds the skyline of the board, the height of every column's highest DEAD pixel, and drop_row() uses
+      it to find where a piece lands without moving it down row by row
+Placements are given as a piece_tables.PieceRotation and the board index of its bounding box's bottom left corner.
+Heights are updated by lock() in a few ops, and rebuilt from scratch by the rarer line clears and garbage.
+"""
+from typing import List, Optional, Type
+
+import numpy as np  # type: ignore
+
+from player.exceptions import BlockOverlapException, OutOfBoundsException
+from player.player_consts import (
+    BITBOARD,
+    DEAD,
+    EMPTY,
+    FITTING_BB_X_OFFSET,
+    FULL_COLUMN_MASK,
+    FULL_ROW_MASK,
+    HEIGHT,
+    NUMPY_BOARD,
+    WIDTH,
+)
+from player.piece_tables import PieceRotation
+
+_ROW_BITS = 1 << np.arange(WIDTH)  # The bit of every column in a row mask
+_COLUMN_BITS = 1 << np.arange(HEIGHT)  # The bit of every row in a column mask
+_SET_BITS = [tuple(y for y in range(WIDTH) if row >> y & 1) for row in range(1 << WIDTH)]  # For every row mask
+
+
+def _skyline(row_masks: List[int]) -> List[int]:
+    """
+    :return: The height of every column's highest set bit in the row bitmasks, 0 for empty columns
+    """
+    heights = [0] * WIDTH
+    seen = 0
+    for x in range(len(row_masks) - 1, -1, -1):
+        new = row_masks[x] & ~seen
+        if new:
+            seen |= new
+            for y in range(WIDTH):
+                if new >> y & 1:
+                    heights[y] = x + 1
+            if seen == FULL_ROW_MASK:
+                break
+    return heights
+
+
+def _raise_heights(heights: List[int], piece: PieceRotation, bb_bot_left_x: int, bb_bot_left_y: int):
+    """
+    Updates the heights of a board to a piece locked on it
+    """
+    for x, y in piece.cells:
+        if heights[y + bb_bot_left_y] <= x + bb_bot_left_x:
+            heights[y + bb_bot_left_y] = x + bb_bot_left_x + 1
+
+
+def _column_masks(row_masks: List[int]) -> List[int]:
+    """
+    :return: The columns of the row bitmasks, where bit x of column y is set if bit y of row x is
+    """
+    columns = [0] * WIDTH
+    for x, row in enumerate(row_masks):
+        for y in _SET_BITS[row]:
+            columns[y] |= 1 << x
+    return columns
+
+
+def fitting_rows(column_masks: List[int], piece: PieceRotation, bb_bot_left_y: int) -> int:
+    """
+    Tests the placements of a piece in every row at once, by the rules of fits()
+    :param column_masks: The columns of the board, as column_masks() returns
+    :param bb_bot_left_y: the y index of the bottom left bounding box placement on the board
+    :return: A bitmask where bit bb_x + FITTING_BB_X_OFFSET is set if the piece fits at (bb_x, bb_bot_left_y)
+    """
+    fitting = -1
+    for x, mask in piece.row_masks:
+        if bb_bot_left_y >= 0:
+            mask <<= bb_bot_left_y
+            if mask & ~FULL_ROW_MASK:
+                return 0
+        else:
+            if mask & ((1 << -bb_bot_left_y) - 1):
+                return 0
+            mask >>= -bb_bot_left_y
+        blocked = 0
+        for y in _SET_BITS[mask]:
+            blocked |= column_masks[y]
+        # Row x of the piece is free where its board row is in bounds and not blocked
+        fitting &= (~blocked & FULL_COLUMN_MASK) << FITTING_BB_X_OFFSET >> x
+    return fitting
+
+
+def _drop_row(board, piece: PieceRotation, bb_bot_left_x: int, bb_bot_left_y: int) -> int:
+    """
+    :param board: The board to drop on, of any backend
+    :return: The lowest x index the piece can fall to from bb_bot_left_x, where it is assumed to fit
+    """
+    heights = board.heights
+    # Where the piece lands on the skyline, which it can fall straight to if it is above it
+    landing_x = max(heights[y + bb_bot_left_y] - x for y, x in piece.column_bottoms)
+    if landing_x <= bb_bot_left_x:
+        return landing_x
+    # Under an overhang of the skyline, only moving down row by row tells where the piece lands
+    while board.fits(piece, bb_bot_left_x - 1, bb_bot_left_y):
+        bb_bot_left_x -= 1
+    return bb_bot_left_x
+
+
+class NumpyBoard:
+    """
+    This is the original board backend, a HEIGHT x WIDTH NumPy array of pixels.
+    """
+
+    def __init__(self):
+        self.cells = np.array([[EMPTY] * WIDTH for _ in range(HEIGHT)])
+        self.heights = [0] * WIDTH  # type: List[int]
+
+    def __len__(self):
+        return HEIGHT
+
+    def __getitem__(self, x: int):
+        return self.cells[x]
+
+    def fits(self, piece: PieceRotation, bb_bot_left_x: int, bb_bot_left_y: int) -> bool:
+        """
+        Tests the placement of a piece over the board, without changing it
+        :return: Whether the placement is valid, in bounds and over no DEAD pixels
+        """
+        cells = self.cells
+        for x, y in piece.cells:
+            board_x, board_y = x + bb_bot_left_x, y + bb_bot_left_y
+            if not (0 <= board_x < HEIGHT and 0 <= board_y < WIDTH) or cells[board_x, board_y] == DEAD:
+                return False
+        return True
+
+    def placement_error(
+            self, piece: PieceRotation, bb_bot_left_x: int, bb_bot_left_y: int
+    ) -> Optional[Type[Exception]]:
+        """
+        Tests the placement of a piece over the board, without changing it
+        :return: None if the placement is valid, else the exception class describing why it isn't
+        """
+        for x, y in piece.cells:
+            board_x, board_y = x + bb_bot_left_x, y + bb_bot_left_y
+            if not (0 <= board_x < HEIGHT and 0 <= board_y < WIDTH):
+                return OutOfBoundsException
+            if self.cells[board_x][board_y] == DEAD:
+                return BlockOverlapException
+        return None
+
+    def lock(self, piece: PieceRotation, bb_bot_left_x: int, bb_bot_left_y: int):
+        """
+        Turns the pixels of a piece placement to DEAD. Assumes the placement is valid.
+        """
+        for x, y in piece.cells:
+            self.cells[x + bb_bot_left_x][y + bb_bot_left_y] = DEAD
+        _raise_heights(self.heights, piece, bb_bot_left_x, bb_bot_left_y)
+
+    def drop_row(self, piece: PieceRotation, bb_bot_left_x: int, bb_bot_left_y: int) -> int:
+        """
+        :return: The lowest x index a fitting piece placement can fall to, where it would lock
+        """
+        return _drop_row(self, piece, bb_bot_left_x, bb_bot_left_y)
+
+    def _update_heights(self):
+        filled = self.cells == DEAD
+        self.heights = np.where(filled.any(axis=0), HEIGHT - filled[::-1].argmax(axis=0), 0).tolist()
+
+    def to_list(self) -> List[List[int]]:
+        return self.cells.tolist()
+
+    def row_masks(self) -> List[int]:
+        """
+        :return: The rows of the board as bitmasks, where bit y is set if pixel y is DEAD
+        """
+        return ((self.cells == DEAD) @ _ROW_BITS).tolist()
+
+    def write_row_masks(self, out: np.ndarray):
+        """
+        :param out: A row of HEIGHT ints, filled with the masks row_masks() would return
+        """
+        np.matmul(self.cells == DEAD, _ROW_BITS, out=out, casting="unsafe")
+
+    def column_masks(self) -> List[int]:
+        """
+        :return: The columns of the board as bitmasks, where bit x is set if pixel x is DEAD
+        """
+        return (_COLUMN_BITS @ (self.cells == DEAD)).tolist()
+
+    @classmethod
+    def from_row_masks(cls, masks: List[int]):
+        """
+        :param masks: HEIGHT row bitmasks, like row_masks() returns
+        :return: A board holding DEAD pixels where the bits are set
+        """
+        board = cls.__new__(cls)
+        board.cells = (np.array(masks)[:, None] >> np.arange(WIDTH) & 1) * DEAD
+        board.heights = _skyline(masks)
+        return board
+
+    def copy(self):
+        board = NumpyBoard.__new__(NumpyBoard)
+        board.cells = self.cells.copy()
+        board.heights = list(self.heights)
+        return board
+
+    def clear_full_rows(self) -> List[int]:
+        """
+        Removes every full row, shifting the rows above it down
+        Full rows are found in one vectorized pass, and the board is compacted in place with a single copy
+        :return: The indices of the cleared rows, as they were before clearing
+        """
+        full_rows = (self.cells == DEAD).all(axis=1)
+        cleared_rows = np.flatnonzero(full_rows)
+        if len(cleared_rows):
+            kept_rows = self.cells[~full_rows]
+            self.cells[:len(kept_rows)] = kept_rows
+            self.cells[len(kept_rows):] = EMPTY
+            self._update_heights()
+        return cleared_rows.tolist()
+
+    def insert_garbage(self, rows: List[int]) -> bool:
+        """
+        Pushes rows in from the bottom, shifting the whole board up in a single copy
+        :param rows: Row bitmasks, bottom first
+        :return: Whether DEAD pixels were pushed out of the top
+        """
+        count = min(len(rows), HEIGHT)
+        if not count:
+            return False
+        overflow = bool((self.cells[HEIGHT - count:] == DEAD).any())
+        self.cells[count:] = self.cells[: HEIGHT - count]
+        self.cells[:count] = (np.array(rows[:count])[:, None] >> np.arange(WIDTH) & 1) * DEAD
+        self._update_heights()
+        return overflow
+
+
+class BitBoard:
+    """
+    This is the bitboard backend, storing every row as an int where bit y is set if pixel y is DEAD.
+    This way collision, lock and full-row checks are a few bitwise ops per row of the piece.
+    """
+
+    def __init__(self):
+        self.rows = [0] * HEIGHT  # type: List[int]
+        self.heights = [0] * WIDTH  # type: List[int]
+
+    def __len__(self):
+        return HEIGHT
+
+    def __getitem__(self, x: int):
+        row = self.rows[x]
+        return [DEAD if row >> y & 1 else EMPTY for y in range(WIDTH)]
+
+    @staticmethod
+    def _shifted_masks(piece: PieceRotation, bb_bot_left_x: int, bb_bot_left_y: int):
+        """
+        Generates the (board row, shifted mask) pairs of a piece placement, or None if it's out of bounds
+        """
+        shifted = []
+        for x, mask in piece.row_masks:
+            board_x = x + bb_bot_left_x
+            if not 0 <= board_x < HEIGHT:
+                return None
+            if bb_bot_left_y >= 0:
+                mask <<= bb_bot_left_y
+                if mask & ~FULL_ROW_MASK:
+                    return None
+            else:
+                if mask & ((1 << -bb_bot_left_y) - 1):
+                    return None
+                mask >>= -bb_bot_left_y
+            shifted.append((board_x, mask))
+        return shifted
+
+    def fits(self, piece: PieceRotation, bb_bot_left_x: int, bb_bot_left_y: int) -> bool:
+        """
+        Tests the placement of a piece over the board, without changing it
+        Unlike placement_error(), it builds nothing and stops at the first row that doesn't fit, as it's the hot path
+        of every move
+        :return: Whether the placement is valid, in bounds and over no DEAD pixels
+        """
+        rows = self.rows
+        for x, mask in piece.row_masks:
+            board_x = x + bb_bot_left_x
+            if not 0 <= board_x < HEIGHT:
+                return False
+            if bb_bot_left_y >= 0:
+                mask <<= bb_bot_left_y
+                if mask & ~FULL_ROW_MASK:
+                    return False
+            else:
+                if mask & ((1 << -bb_bot_left_y) - 1):
+                    return False
+                mask >>= -bb_bot_left_y
+            if rows[board_x] & mask:
+                return False
+        return True
+
+    def placement_error(
+            self, piece: PieceRotation, bb_bot_left_x: int, bb_bot_left_y: int
+    ) -> Optional[Type[Exception]]:
+        """
+        Tests the placement of a piece over the board, without changing it
+        :return: None if the placement is valid, else the exception class describing why it isn't
+        """
+        shifted = self._shifted_masks(piece, bb_bot_left_x, bb_bot_left_y)
+        if shifted is None:
+            return OutOfBoundsException
+        for board_x, mask in shifted:
+            if self.rows[board_x] & mask:
+                return BlockOverlapException
+        return None
+
+    def lock(self, piece: PieceRotation, bb_bot_left_x: int, bb_bot_left_y: int):
+        """
+        Turns the pixels of a piece placement to DEAD. Assumes the placement is valid.
+        """
+        for x, mask in self._shifted_masks(piece, bb_bot_left_x, bb_bot_left_y) or []:
+            self.rows[x] |= mask
+        _raise_heights(self.heights, piece, bb_bot_left_x, bb_bot_left_y)
+
+    def drop_row(self, piece: PieceRotation, bb_bot_left_x: int, bb_bot_left_y: int) -> int:
+        """
+        :return: The lowest x index a fitting piece placement can fall to, where it would lock
+        """
+        return _drop_row(self, piece, bb_bot_left_x, bb_bot_left_y)
+
+    def to_list(self) -> List[List[int]]:
+        return [self[x] for x in range(HEIGHT)]
+
+    def row_masks(self) -> List[int]:
+        """
+        :return: The rows of the board as bitmasks, where bit y is set if pixel y is DEAD
+        """
+        return list(self.rows)
+
+    def write_row_masks(self, out: np.ndarray):
+        """
+        :param out: A row of HEIGHT ints, filled with the masks row_masks() would return
+        """
+        out[:] = self.rows
+
+    def column_masks(self) -> List[int]:
+        """
+        :return: The columns of the board as bitmasks, where bit x is set if pixel x is DEAD
+        """
+        return _column_masks(self.rows)
+
+    @classmethod
+    def from_row_masks(cls, masks: List[int]):
+        """
+        :param masks: HEIGHT row bitmasks, like row_masks() returns
+        :return: A board holding DEAD pixels where the bits are set
+        """
+        board = cls.__new__(cls)
+        board.rows = list(masks)
+        board.heights = _skyline(board.rows)
+        return board
+
+    def copy(self):
+        board = BitBoard.__new__(BitBoard)
+        board.rows = list(self.rows)
+        board.heights = list(self.heights)
+        return board
+
+    def clear_full_rows(self) -> List[int]:
+        """
+        Removes every full row, shifting the rows above it down
+        :return: The indices of the cleared rows, as they were before clearing
+        """
+        cleared_rows = [i for i, row in enumerate(self.rows) if row == FULL_ROW_MASK]
+        if cleared_rows:
+            self.rows = [row for row in self.rows if row != FULL_ROW_MASK]
+            self.rows += [0] * len(cleared_rows)
+            self.heights = _skyline(self.rows)
+        return cleared_rows
+
+    def insert_garbage(self, rows: List[int]) -> bool:
+        """
+        Pushes rows in from the bottom, shifting the whole board up in a single list concatenation
+        :param rows: Row bitmasks, bottom first
+        :return: Whether DEAD pixels were pushed out of the top
+        """
+        count = min(len(rows), HEIGHT)
+        if not count:
+            return False
+        overflow = any(self.rows[HEIGHT - count:])
+        self.rows = rows[:count] + self.rows[: HEIGHT - count]
+        self.heights = _skyline(self.rows)
+        return overflow
+
+
+BOARD_BACKENDS = {
+    NUMPY_BOARD: NumpyBoard,
+    BITBOARD: BitBoard,
+}
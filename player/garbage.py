@@ -0,0 +1,125 @@
+"""
+This is the garbage module, the attacks players of a versus game send each other.
+Clearing rows sends garbage lines, by the guideline attack tables, and the sender's own incoming lines cancel first.
+Incoming lines wait in the target's GarbageQueue, and rise from the bottom of its board the next time it locks
+a piece without clearing rows. Every line of a single attack shares one hole column.
+Everything here runs inside the game's asyncio loop callbacks, which never interleave, so no locks are needed.
+"""
+import random
+from collections import deque
+from functools import partial
+from typing import TYPE_CHECKING, List, Optional
+
+from player.player_consts import (
+    ATTACK,
+    BACK_TO_BACK_BONUS,
+    COMBO_ATTACK,
+    FULL_ROW_MASK,
+    PERFECT_CLEAR_ATTACK,
+    WIDTH,
+)
+
+if TYPE_CHECKING:
+    from player.player import Player
+
+
+def attack_lines(cleared_rows: int, combo: int, back_to_back: bool, perfect_clear: bool) -> int:
+    """
+    :param cleared_rows: The amount of rows cleared by the lock
+    :param combo: How many locks in a row cleared rows before this one
+    :param back_to_back: Whether this is a tetris right after a tetris
+    :param perfect_clear: Whether the clear left the board empty
+    :return: The amount of garbage lines the clear sends
+    """
+    if not cleared_rows:
+        return 0
+    if perfect_clear:
+        return PERFECT_CLEAR_ATTACK
+    lines = ATTACK[cleared_rows] + COMBO_ATTACK[min(combo, len(COMBO_ATTACK) - 1)]
+    if back_to_back:
+        lines += BACK_TO_BACK_BONUS
+    return lines
+
+
+class GarbageQueue:
+    """
+    This holds the garbage lines sent to a player that didn't rise yet, as [lines, hole column] attacks, oldest first
+    """
+
+    def __init__(self, rng: Optional[random.Random] = None):
+        """
+        :param rng: The random generator of the hole columns, seed it for reproducible garbage
+        """
+        self.rng = rng if rng is not None else random.Random()
+        self.lines = 0
+        self._attacks = deque()  # type: deque[List[int]]
+
+    def push(self, lines: int):
+        """
+        Queues an attack, with a random hole column
+        """
+        self._attacks.append([lines, self.rng.randrange(WIDTH)])
+        self.lines += lines
+
+    def cancel(self, lines: int) -> int:
+        """
+        Cancels queued lines with the lines of a counter attack, oldest first
+        :return: The lines of the counter attack that are left to send
+        """
+        while lines and self._attacks:
+            cancelled = min(lines, self._attacks[0][0])
+            self._attacks[0][0] -= cancelled
+            self.lines -= cancelled
+            lines -= cancelled
+            if not self._attacks[0][0]:
+                self._attacks.popleft()
+        return lines
+
+    def take(self, max_lines: int) -> List[int]:
+        """
+        Takes the oldest queued lines, splitting an attack if it doesn't fit
+        :return: The row bitmasks of the lines, bottom first, as board.insert_garbage() takes them
+        """
+        rows = []  # type: List[int]
+        while self._attacks and len(rows) < max_lines:
+            attack = self._attacks[0]
+            taken = min(attack[0], max_lines - len(rows))
+            rows = [FULL_ROW_MASK & ~(1 << attack[1])] * taken + rows  # Older lines end up higher
+            attack[0] -= taken
+            if not attack[0]:
+                self._attacks.popleft()
+        self.lines -= len(rows)
+        return rows
+
+
+class GarbageRouter:
+    """
+    This connects the players of a versus game, sending every attack to the next opponent still playing, in turns
+    """
+
+    def __init__(self, players: List["Player"]):
+        """
+        :param players: The players of the game, indexed by player id
+        """
+        self.players = players
+        self.alive = [game_player.player_id for game_player in players]
+        self.lines_sent = 0
+        self._turns = {game_player.player_id: 0 for game_player in players}  # type: dict[int, int]
+        for game_player in players:
+            game_player.on_attack = partial(self.send, game_player.player_id)
+
+    def send(self, attacker_id: int, lines: int):
+        targets = [player_id for player_id in self.alive if player_id != attacker_id]
+        if not targets:
+            return
+        target_id = targets[self._turns[attacker_id] % len(targets)]
+        self._turns[attacker_id] += 1
+        self.players[target_id].incoming_garbage.push(lines)
+        self.lines_sent += lines
+
+    def eliminate(self, player_id: int):
+        """
+        Stops sending attacks to a player whose game is over
+        """
+        if player_id in self.alive:
+            self.alive.remove(player_id)
@@ -0,0 +1,73 @@
+"""
+This is the piece queue module, in charge of the order in which pieces are given to the player.
+It implements the 7-bag randomizer: every piece is dealt once, in a random order, before the next bag is shuffled.
+"""
+import random
+from collections import deque
+from itertools import islice
+from typing import Iterator, List, Optional
+
+from player.player_consts import PIECE_IDS, PIECE_KEYS, PREVIEW_SIZE
+
+
+class PieceQueue:
+    """
+    This is a queue of upcoming pieces, stored as small integer piece ids (indices of PIECE_KEYS).
+    Bags are only shuffled when the queue runs shorter than the preview window, and nothing is ever copied.
+    """
+
+    def __init__(
+            self, rng: Optional[random.Random] = None, preview_size: int = PREVIEW_SIZE
+    ):
+        """
+        :param rng: The random generator to shuffle bags with, seed it for a reproducible piece order
+        :param preview_size: How many upcoming pieces should always be available for peeking
+        """
+        self.rng = rng if rng is not None else random.Random()
+        self.preview_size = preview_size
+        self._queue = deque()  # type: deque[int]
+
+    def __len__(self):
+        return len(self._queue)
+
+    def _fill(self, size: int):
+        while len(self._queue) < size:
+            bag = list(range(len(PIECE_KEYS)))
+            self.rng.shuffle(bag)
+            self._queue.extend(bag)
+
+    def pop(self) -> str:
+        """
+        Takes the next piece out of the queue
+        :return: The key of the piece, as in SHAPES_DICT
+        """
+        self._fill(self.preview_size + 1)
+        return PIECE_KEYS[self._queue.popleft()]
+
+    def push_front(self, piece_key: str):
+        """
+        Puts a piece back at the front of the queue, so it's the next one to be popped (used by hold)
+        """
+        self._queue.appendleft(PIECE_IDS[piece_key])
+
+    def peek(self, index: int = 0) -> str:
+        """
+        :param index: How many pieces ahead to look, 0 being the next piece
+        :return: The key of the piece
+        """
+        self._fill(max(self.preview_size, index + 1))
+        return PIECE_KEYS[self._queue[index]]
+
+    def preview_ids(self) -> Iterator[int]:
+        """
+        :return: The ids of the next preview_size pieces, without building their keys
+        """
+        self._fill(self.preview_size)
+        return islice(self._queue, self.preview_size)
+
+    def preview(self) -> List[str]:
+        """
+        :return: The keys of the next preview_size pieces
+        """
+        self._fill(self.preview_size)
+        return [PIECE_KEYS[piece_id] for piece_id in islice(self._queue, self.preview_size)]
@@ -0,0 +1,119 @@
+"""
+Here are the lookup tables of the tetrominoes, built once at import from SHAPES_DICT and the wall kick offset data.
+For every piece and every one of its 4 rotation states, they hold the bounding box, its LIVE cells and row bitmasks,
+its lowest cell in every column, and for every pair of rotation states, the SRS wall kick offsets already subtracted.
+"""
+from typing import Dict, NamedTuple, Tuple
+
+from mytyping import BoundingBox, OffsetData
+from player.player_consts import (
+    GENERAL_BLOCK_OFFSET_DATA,
+    I_BLOCK,
+    I_BLOCK_OFFSET_DATA,
+    LIVE,
+    O_BLOCK,
+    O_BLOCK_OFFSET_DATA,
+    ROTATION_STATES,
+    SHAPES_DICT,
+)
+
+Cells = Tuple[Tuple[int, int], ...]
+RowMasks = Tuple[Tuple[int, int], ...]
+ColumnBottoms = Tuple[Tuple[int, int], ...]
+WallKicks = Dict[Tuple[int, int], Tuple[Tuple[int, int], ...]]
+
+
+class PieceRotation(NamedTuple):
+    """
+    A bounding box in a given rotation state, with everything the board needs to place it precomputed
+    cells are the (x, y) indices of its LIVE pixels
+    row_masks are (x, mask) pairs for the rows with LIVE pixels, where bit y is set if bb[x][y] is LIVE
+    column_bottoms are (y, x) pairs for the columns with LIVE pixels, x being the lowest LIVE pixel of column y
+    """
+
+    bounding_box: BoundingBox
+    cells: Cells
+    row_masks: RowMasks
+    column_bottoms: ColumnBottoms
+
+
+def rotate_bounding_box(bounding_box: BoundingBox) -> BoundingBox:
+    """
+    Rotates a bounding box clockwise once, around its center
+    """
+    size = len(bounding_box)
+    center = int(size / 2)
+    new_bounding_box = [[0] * size for _ in range(size)]
+    for x in range(size):
+        for y in range(size):
+            new_x = center - (y - center)
+            new_y = center + (x - center)
+            new_bounding_box[new_x][new_y] = bounding_box[x][y]
+    return new_bounding_box
+
+
+def piece_rotation_from_bounding_box(bounding_box: BoundingBox) -> PieceRotation:
+    """
+    Builds the PieceRotation of any bounding box, for placements not coming from the tables
+    """
+    key = tuple(tuple(row) for row in bounding_box)
+    try:
+        return _piece_rotations_cache[key]
+    except KeyError:
+        pass
+    cells = tuple(
+        (x, y) for x, row in enumerate(key) for y, pixel in enumerate(row) if pixel == LIVE
+    )
+    row_masks = []
+    for x, row in enumerate(key):
+        mask = sum(1 << y for y, pixel in enumerate(row) if pixel == LIVE)
+        if mask:
+            row_masks.append((x, mask))
+    column_bottoms = {}  # type: Dict[int, int]
+    for x, y in cells:
+        column_bottoms.setdefault(y, x)  # Cells go bottom up
+    _piece_rotations_cache[key] = PieceRotation(
+        bounding_box=[list(row) for row in key],
+        cells=cells,
+        row_masks=tuple(row_masks),
+        column_bottoms=tuple(sorted(column_bottoms.items())),
+    )
+    return _piece_rotations_cache[key]
+
+
+def _offset_data(piece_key: str) -> OffsetData:
+    if piece_key == O_BLOCK:
+        return O_BLOCK_OFFSET_DATA
+    elif piece_key == I_BLOCK:
+        return I_BLOCK_OFFSET_DATA
+    return GENERAL_BLOCK_OFFSET_DATA
+
+
+def _wall_kicks(offset_data: OffsetData) -> WallKicks:
+    """
+    To understand better, read https://tetris.wiki/Super_Rotation_System#How_Guideline_SRS_Really_Works
+    :return: For every (from_state, to_state), the ordered (x, y) shifts to try on the bounding box
+    """
+    return {
+        (from_state, to_state): tuple(
+            (from_x - to_x, from_y - to_y)
+            for (from_x, from_y), (to_x, to_y) in zip(
+                offset_data[from_state], offset_data[to_state]
+            )
+        )
+        for from_state in range(ROTATION_STATES)
+        for to_state in range(ROTATION_STATES)
+    }
+
+
+_piece_rotations_cache = {}  # type: Dict[Tuple[Tuple[int, ...], ...], PieceRotation]
+
+PIECE_ROTATIONS = {}  # type: Dict[str, Tuple[PieceRotation, ...]]
+WALL_KICKS = {}  # type: Dict[str, WallKicks]
+for _piece_key, _bounding_box in SHAPES_DICT.items():
+    _rotations = []
+    for _ in range(ROTATION_STATES):
+        _rotations.append(piece_rotation_from_bounding_box(_bounding_box))
+        _bounding_box = rotate_bounding_box(_bounding_box)
+    PIECE_ROTATIONS[_piece_key] = tuple(_rotations)
+    WALL_KICKS[_piece_key] = _wall_kicks(_offset_data(_piece_key))
@@ -1,30 +1,27 @@
 """
 This is the player module, in charge of actual game logic and the way tetris behaves and is played.
 """
-from typing import List, Optional, Tuple
-
-import numpy as np  # type: ignore
+import random
+from typing import Callable, List, Optional, Tuple
 
 from mytyping import BoundingBox
-from player.exceptions import (
-    BlockOverlapException,
-    GameOverException,
-    NoWallKickOffsetData,
-    OutOfBoundsException,
+from player.board import BOARD_BACKENDS
+from player.exceptions import GameOverException
+from player.garbage import GarbageQueue, attack_lines
+from player.piece_queue import PieceQueue
+from player.piece_tables import (
+    PIECE_ROTATIONS,
+    WALL_KICKS,
+    PieceRotation,
+    piece_rotation_from_bounding_box,
 )
 from player.player_consts import (
-    DEAD,
-    EMPTY,
-    GENERAL_BLOCK_OFFSET_DATA,
-    HEIGHT,
-    I_BLOCK,
-    I_BLOCK_OFFSET_DATA,
+    DEFAULT_BOARD_BACKEND,
     LIVE,
-    O_BLOCK,
-    O_BLOCK_OFFSET_DATA,
+    MAX_GARBAGE_PER_LOCK,
+    ROTATION_STATES,
     SCORE,
     SHAPES_DICT,
-    WIDTH,
 )
 from utils import log
 
@@ -34,71 +31,124 @@ class Player:
     This is the player class, which implement the backbone of the tetris logic. Here all actual logic should be defined.
     """
 
-    def __init__(self, player_id: int):
+    def __init__(
+            self,
+            player_id: int,
+            board_backend: str = DEFAULT_BOARD_BACKEND,
+            seed: Optional[int] = None,
+    ):
+        """
+        :param player_id: The id of the player, reported back on game over
+        :param board_backend: Which board storage to use, one of player_consts.BOARD_BACKENDS keys
+        :param seed: The seed of the piece order, random if not given
+        """
         # Variable initializations #
         self.player_id = player_id
         self.score = 0
         self.level = 1.0
         self.rotation_state = 0
         self.bounding_box = []  # type: BoundingBox
+        self.active_piece_rotation = None  # type: Optional[PieceRotation]
         self.bb_x = 0  # The x index of the bottom left corner of the bounding box
         self.bb_y = 0  # The x index of the bottom left corner of the bounding box
-        self.next_pieces = []
+        self.next_pieces = PieceQueue(rng=random.Random(seed))
         self.held_piece = None
         self.held_piece_key = None
         self.active_piece_key = None
-        self.board = np.array([[0] * WIDTH for _ in range(HEIGHT)])
-        # Actions to be run on init #
-        self._random_generator()
+        self.board = BOARD_BACKENDS[board_backend]()
+        # Lets observers, like board streams, tell which piece locked since they last looked, as
+        # (key, rotation_state, bb_x, bb_y)
+        self.pieces_locked = 0
+        self.last_locked_piece = None  # type: Optional[Tuple[str, int, int, int]]
+        # Versus games #
+        self.incoming_garbage = GarbageQueue(
+            rng=random.Random("garbage-{0}".format(seed)) if seed is not None else None
+        )
+        # Called with the lines of every attack, by the GarbageRouter of the game
+        self.on_attack = None  # type: Optional[Callable[[int], None]]
+        self.combo = -1  # How many locks in a row cleared rows, minus one
+        self.back_to_back = False  # Whether the last clear was a tetris
+        self.lines_sent = 0
+
+    def fits(self, piece_key: str, rotation_state: int, bb_x: int, bb_y: int) -> bool:
+        """
+        Tests the placement of a piece on the board, without raising
+        This is what all the movement of the active piece is tested with, failed moves being part of normal play
+        :param piece_key: The key of the piece, in SHAPES_DICT
+        :param rotation_state: The rotation state of the piece
+        :param bb_x: the x index of the bottom left bounding box placement on the board
+        :param bb_y: the y index of the bottom left bounding box placement on the board
+        :return: Whether the piece fits there
+        """
+        return self.board.fits(PIECE_ROTATIONS[piece_key][rotation_state], bb_x, bb_y)
 
     def move(self, x_diff: Optional[int] = 0, y_diff: Optional[int] = 0):
         """
         Moves the current bounding box on the board.
-        Doesn't catch, and thus raises, BlockOverlapException and OutOfBoundsException on failures
+        Raises BlockOverlapException or OutOfBoundsException on failures, telling why the move didn't fit
+        The game's own moves don't go through here, they use try_move() instead, which doesn't raise
         :param x_diff: How much to move it x-wise
         :param y_diff: How much to move it y-wise
         """
-        self.place_bounding_box_on_board(
-            bb=self.bounding_box,
-            bb_bot_left_x=self.bb_x + x_diff,
-            bb_bot_left_y=self.bb_y + y_diff,
-        )
-        # If no exception is thrown #
+        if not self.try_move(x_diff, y_diff):
+            self._check_placement_on_board(
+                self.active_piece_rotation, self.bb_x + x_diff, self.bb_y + y_diff
+            )
+
+    def try_move(self, x_diff: int = 0, y_diff: int = 0) -> bool:
+        """
+        Moves the current bounding box on the board, if it fits there
+        :param x_diff: How much to move it x-wise
+        :param y_diff: How much to move it y-wise
+        :return: Whether it moved
+        """
+        if not self.fits(self.active_piece_key, self.rotation_state, self.bb_x + x_diff, self.bb_y + y_diff):
+            return False
         self.bb_x += x_diff
         self.bb_y += y_diff
-
-    def _random_generator(self):
-        self.next_pieces = np.random.permutation(list(SHAPES_DICT.items()))
+        return True
 
     def spawn_first_piece(self):
         if self.active_piece_key is None:
             self._end_round()  # Called to spawn first piece
 
     def _end_round(self):
-        self._kill_active()
-        self._clear_rows()
+        locked = self._kill_active()
+        if not self._clear_rows() and locked:
+            self.combo = -1
+            self._raise_garbage()
         self._spawn_piece()
 
-    def _kill_active(self):
-        for x in reversed(range(HEIGHT)):
-            for y in range(WIDTH):
-                if self.board[x][y] == LIVE:
-                    self.board[x][y] = DEAD
+    def _kill_active(self) -> bool:
+        """
+        :return: Whether there was an active piece to lock
+        """
+        if self.active_piece_rotation is None:
+            return False
+        self.board.lock(self.active_piece_rotation, self.bb_x, self.bb_y)
+        # Not overlaid by the views anymore, as garbage may shift the board under it before the next piece spawns
+        self._clear_active_piece()
+        self.pieces_locked += 1
+        self.last_locked_piece = (self.active_piece_key, self.rotation_state, self.bb_x, self.bb_y)
+        return True
 
-    def _spawn_piece(self):
-        piece, self.next_pieces = self.next_pieces[-1], self.next_pieces[:-1]
-        if len(self.next_pieces) == 0:
-            self._random_generator()
+    def _raise_garbage(self):
+        """
+        Pushes the incoming garbage lines in from the bottom of the board, up to MAX_GARBAGE_PER_LOCK of them
+        """
+        if not self.incoming_garbage.lines:
+            return
+        if self.board.insert_garbage(self.incoming_garbage.take(MAX_GARBAGE_PER_LOCK)):
+            raise GameOverException(player_id=self.player_id)  # Pushed out of the top
 
-        self.active_piece_key, self.bounding_box = piece
+    def _spawn_piece(self):
+        self.active_piece_key = self.next_pieces.pop()
+        self.rotation_state = 0
+        self.active_piece_rotation = PIECE_ROTATIONS[self.active_piece_key][0]
+        self.bounding_box = self.active_piece_rotation.bounding_box
         self.bb_x = len(self.board) - len(self.bounding_box)
         self.bb_y = int((len(self.board[0]) - len(self.bounding_box[0])) / 2)
-        self.rotation_state = 0
-        try:
-            self.place_bounding_box_on_board(
-                bb=self.bounding_box, bb_bot_left_x=self.bb_x, bb_bot_left_y=self.bb_y
-            )
-        except BlockOverlapException:  # Dead piece in spawn area
+        if not self.fits(self.active_piece_key, 0, self.bb_x, self.bb_y):  # Dead piece in spawn area
             raise GameOverException(player_id=self.player_id)
 
     def cycle(self, hard_drop: Optional[bool] = False):
@@ -106,191 +156,144 @@ class Player:
         Handle the end of a game cycle (aka drop the block and check if it should lock).
         :param hard_drop: If this is called by the player dropping the block, it might do a hard drop (i.e. all the way)
         """
-        try:
-            self.move(x_diff=-1)
-            while hard_drop:
-                self.move(x_diff=-1)
+        if hard_drop:
+            self.bb_x = self.landing_bb_x()
+        elif self.try_move(x_diff=-1):
+            return
+        # Changes object to DEAD once it can't fall any further
+        self._end_round()
 
-        # Changes object to DEAD if any move is invalid
-        except (OutOfBoundsException, BlockOverlapException, IndexError):
-            self._end_round()
+    def landing_bb_x(self) -> int:
+        """
+        :return: The bb_x the active piece would lock at if it was hard dropped, as the board's skyline tells
+        """
+        return self.board.drop_row(self.active_piece_rotation, self.bb_x, self.bb_y)
 
     def move_sideways(self, diff: int):
         """
-        This moved the active block sideways, using self._move that also handles invalid move checks.
+        This moved the active block sideways, using self.try_move that also handles invalid move checks.
         :param diff: How much to move it. A negative number moves it to the left, and a positive to the right.
         """
-        try:
-            self.move(y_diff=diff)
-        except (IndexError, OutOfBoundsException, BlockOverlapException):
-            pass
-
-    @staticmethod
-    def _rotate_bounding_box(bounding_box: BoundingBox):
-        size = len(bounding_box)
-        center = int(size / 2)
-        new_bounding_box = []
-        [new_bounding_box.append([0] * size) for _ in range(size)]
-        for x in range(size):
-            for y in range(size):
-                pixel = bounding_box[x][y]
-                rel_x = x - center
-                rel_y = y - center
-                new_rel_x = -1 * rel_y
-                new_rel_y = rel_x
-                new_x = new_rel_x + center
-                new_y = new_rel_y + center
-                new_bounding_box[new_x][new_y] = pixel
-        return new_bounding_box
+        self.try_move(y_diff=diff)
 
     def _check_placement_on_board(
-            self, bb: BoundingBox, bb_bot_left_x: int, bb_bot_left_y: int
+            self, piece: PieceRotation, bb_bot_left_x: int, bb_bot_left_y: int
     ):
-        size = len(bb)
-        new_positions = []  # type: List[Tuple[int, int]]
-        # Check that all placements are okay
-        for x in range(size):
-            for y in range(size):
-                if bb[x][y] != LIVE:
-                    continue
-                if (x + bb_bot_left_x) < 0 or (y + bb_bot_left_y) < 0:
-                    raise OutOfBoundsException
-                try:
-                    if self.board[x + bb_bot_left_x][y + bb_bot_left_y] == DEAD:
-                        raise BlockOverlapException
-                except IndexError:
-                    raise OutOfBoundsException
-                new_positions.append((x + bb_bot_left_x, y + bb_bot_left_y))
-        return new_positions
+        error = self.board.placement_error(piece, bb_bot_left_x, bb_bot_left_y)
+        if error is not None:
+            raise error
 
     def place_bounding_box_on_board(
             self, bb: BoundingBox, bb_bot_left_x: int, bb_bot_left_y: int
     ):
         """
         Tests the placement of a bounding box in a given index over the board
+        The board itself only holds DEAD pixels, so nothing is written to it until the piece is locked
         On failure, raises BlockOverlapException or OutOfBoundsException
         :param bb: the bounding box to place
         :param bb_bot_left_x: the x index of the bottom left bounding box placement on the board
         :param bb_bot_left_y: the y index of the bottom left bounding box placement on the board
         """
-        new_positions = self._check_placement_on_board(bb, bb_bot_left_x, bb_bot_left_y)
-        # If no exception was raised, modify the board
-        self._clear_active_piece()
-        for x, y in new_positions:
-            self.board[x][y] = LIVE
-
-    def _get_wall_kick_offset(self, kick_try: int, rotation_state: int):
-        """
-        To understand better, read https://tetris.wiki/Super_Rotation_System#How_Guideline_SRS_Really_Works
-        :return: x: int, y: int - Values to shift the bounding box by
-        """
-        try:
-            if self.active_piece_key == O_BLOCK:
-                return tuple(
-                    np.subtract(
-                        O_BLOCK_OFFSET_DATA[self.rotation_state][kick_try],
-                        O_BLOCK_OFFSET_DATA[rotation_state][kick_try],
-                    )
-                )
-            elif self.active_piece_key == I_BLOCK:
-                return tuple(
-                    np.subtract(
-                        I_BLOCK_OFFSET_DATA[self.rotation_state][kick_try],
-                        I_BLOCK_OFFSET_DATA[rotation_state][kick_try],
-                    )
-                )
-            else:
-                return tuple(
-                    np.subtract(
-                        GENERAL_BLOCK_OFFSET_DATA[self.rotation_state][kick_try],
-                        GENERAL_BLOCK_OFFSET_DATA[rotation_state][kick_try],
-                    )
-                )
-        except IndexError:
-            raise NoWallKickOffsetData
+        self._check_placement_on_board(
+            piece_rotation_from_bounding_box(bb), bb_bot_left_x, bb_bot_left_y
+        )
 
     def rotate(self, clockwise_rotations: int):
         """
-        Rotates a piece, according to the current bounding box and the amount of desired rotations
+        Rotates a piece, according to the current rotation state and the amount of desired rotations
+        Tries the SRS wall kicks of the piece in order, and leaves it in place if none of them fit
         :param clockwise_rotations: How many clockwise rotations to imply on the piece
         """
-        kick_try = 0
-        x_offset = 0
-        y_offset = 0
-        new_rotation_state = self.rotation_state
-        new_bounding_box = self.bounding_box
-        # Generate the new bounding box values #
-        for i in range(clockwise_rotations):
-            new_bounding_box = self._rotate_bounding_box(new_bounding_box)
-            new_rotation_state += 1
-            new_rotation_state = (
-                    new_rotation_state % 4
-            )  # Because the are only 4 possible states
-        # Applies the offset and tries placing the bb on the board #
-        while True:
-            try:
-                x_offset, y_offset = self._get_wall_kick_offset(
-                    kick_try=kick_try, rotation_state=new_rotation_state
-                )
-
-                log.warning("New bounding box")
-                log.warning(str(new_bounding_box))
-                log.info("Applying wall kick offsets")
-                log.info(str([x_offset, y_offset]))
-                self.place_bounding_box_on_board(
-                    bb=new_bounding_box,
-                    bb_bot_left_x=self.bb_x + x_offset,
-                    bb_bot_left_y=self.bb_y + y_offset,
-                )
+        new_rotation_state = (self.rotation_state + clockwise_rotations) % ROTATION_STATES
+        kicks = WALL_KICKS[self.active_piece_key][(self.rotation_state, new_rotation_state)]
+        for x_offset, y_offset in kicks:
+            if self.fits(self.active_piece_key, new_rotation_state, self.bb_x + x_offset, self.bb_y + y_offset):
+                log.info("Applying wall kick offsets %s", (x_offset, y_offset))
                 break
-            except (BlockOverlapException, OutOfBoundsException):
-                kick_try += 1
-                continue
-            except NoWallKickOffsetData:
-                return
+        else:
+            return
         # If successful #
-        self.bounding_box = new_bounding_box
+        new_rotation = PIECE_ROTATIONS[self.active_piece_key][new_rotation_state]
+        self.active_piece_rotation = new_rotation
+        self.bounding_box = new_rotation.bounding_box
         self.rotation_state = new_rotation_state
         self.bb_x += x_offset
         self.bb_y += y_offset
 
     def _clear_active_piece(self):
-        for i in range(len(self.board)):
-            for j in range(len(self.board[i])):
-                self.board[i][j] = (
-                    EMPTY if self.board[i][j] == LIVE else self.board[i][j]
+        self.active_piece_rotation = None
+        self.bounding_box = []
+
+    @property
+    def active_piece(self) -> Tuple[BoundingBox, int, int, int]:
+        """
+        The active piece, as (bounding_box, bb_x, bb_y, rotation_state)
+        """
+        return self.bounding_box, self.bb_x, self.bb_y, self.rotation_state
+
+    def get_board_view(self) -> List[List[int]]:
+        """
+        Generates the board as it should be seen, with the active piece overlaid as LIVE pixels
+        :return: A HEIGHT x WIDTH list of pixels
+        """
+        view = self.board.to_list()
+        if self.active_piece_rotation is not None:
+            for x, y in self.active_piece_rotation.cells:
+                view[x + self.bb_x][y + self.bb_y] = LIVE
+        return view
+
+    def get_board_masks(self) -> List[int]:
+        """
+        Generates the board as it should be seen, like get_board_view, in the compact bitmask form of the board rows
+        :return: HEIGHT row bitmasks, where bit y is set if the pixel is DEAD or LIVE
+        """
+        masks = self.board.row_masks()
+        if self.active_piece_rotation is not None:
+            for x, mask in self.active_piece_rotation.row_masks:
+                masks[x + self.bb_x] |= (
+                    mask << self.bb_y if self.bb_y >= 0 else mask >> -self.bb_y
                 )
+        return masks
 
     def hold(self):
         """
         Hold a piece in the piece bank, and release the currently held piece.
         """
         if self.held_piece_key is not None:
-            piece_to_append = [self.held_piece_key, SHAPES_DICT[self.held_piece_key]]
-            self.next_pieces = np.append(self.next_pieces, [piece_to_append], axis=0)
+            self.next_pieces.push_front(self.held_piece_key)
         self.held_piece_key = self.active_piece_key
         self.held_piece = SHAPES_DICT[self.held_piece_key]
         self._clear_active_piece()
         self._end_round()
 
-    def _is_row_clearable(self, i: int):
-        for j in range(WIDTH):
-            if self.board[i][j] != DEAD:
-                return False
-        return True
-
-    def _clear_rows(self):
-        cleared_rows = 0
-        i = 0
-        while i < HEIGHT:
-            if self._is_row_clearable(i):
-                self.board = np.delete(self.board, i, 0)
-                self.board = np.insert(self.board, len(self.board), [EMPTY] * WIDTH, 0)
-                i -= 1  # Because the whole board just shifted
-                cleared_rows += 1
-            i += 1
+    def _clear_rows(self) -> List[int]:
+        """
+        Clears the full rows of the board and scores them
+        :return: The indices of the cleared rows, as they were before clearing, for animations and garbage logic
+        """
+        cleared_rows = self.board.clear_full_rows()
+        self._scorer(len(cleared_rows))
+        if cleared_rows:
+            self._attack(len(cleared_rows))
+        return cleared_rows
 
-        self._scorer(cleared_rows)
+    def _attack(self, cleared_rows: int):
+        """
+        Sends the garbage lines of a clear, after they cancel the player's own incoming lines
+        """
+        self.combo += 1
+        tetris = cleared_rows == 4
+        lines = attack_lines(
+            cleared_rows,
+            combo=self.combo,
+            back_to_back=tetris and self.back_to_back,
+            perfect_clear=not any(self.board.row_masks()),
+        )
+        self.back_to_back = tetris
+        lines = self.incoming_garbage.cancel(lines)
+        if lines and self.on_attack is not None:
+            self.lines_sent += lines
+            self.on_attack(lines)
 
     def _scorer(self, cleared_rows: int):
         self.level += 0.1 * cleared_rows
@@ -26,8 +26,19 @@ SHAPES_DICT = {
     Z_BLOCK: [[0, 0, 0], [0, 1, 1], [1, 1, 0]],
     T_BLOCK: [[0, 0, 0], [1, 1, 1], [0, 1, 0]],
 }
+PIECE_KEYS = tuple(SHAPES_DICT)  # The index of a key is its piece id
+PIECE_IDS = {piece_key: piece_id for piece_id, piece_key in enumerate(PIECE_KEYS)}
+PREVIEW_SIZE = 5
 SCORE = {0: 0, 1: 40, 2: 100, 3: 300, 4: 1200}
 
+# Garbage lines of versus games, after the guideline attack tables
+ATTACK = {0: 0, 1: 0, 2: 1, 3: 2, 4: 4}  # Lines sent by the amount of rows cleared at once
+BACK_TO_BACK_BONUS = 1  # Extra line for a tetris right after a tetris
+COMBO_ATTACK = (0, 0, 1, 1, 2, 2, 3, 3, 4, 4, 4, 5)  # Extra lines by the combo count, the last one for longer combos
+PERFECT_CLEAR_ATTACK = 10  # Lines sent instead, when a clear leaves the board empty
+MAX_GARBAGE_PER_LOCK = 8  # The most incoming lines that rise at once, the rest wait for the next lock
+ROTATION_STATES = 4
+
 # Wall kick offset data
 # Taken from https://tetris.wiki/Super_Rotation_System#How_Guideline_SRS_Really_Works
 # The x and y displayed there should be inverted
@@ -58,3 +69,13 @@ DEAD = 2
 # Board indices
 HEIGHT = 22
 WIDTH = 10
+FULL_ROW_MASK = (1 << WIDTH) - 1
+FULL_COLUMN_MASK = (1 << HEIGHT) - 1
+# Bit bb_x + FITTING_BB_X_OFFSET of a board.fitting_rows() mask stands for bb_x, so that the bb_x below the board that
+# bounding boxes with empty bottom rows fit at have bits too
+FITTING_BB_X_OFFSET = 4
+
+# Board backends
+NUMPY_BOARD = "numpy"
+BITBOARD = "bitboard"
+DEFAULT_BOARD_BACKEND = BITBOARD
@@ -0,0 +1,71 @@
+"""
+This is the render scheduler, decoupling the drawing of screens from the game logic.
+Instead of printing a screen whenever its state changes, the logic marks it as dirty, and the scheduler
+draws every dirty screen at most once per frame, ending the frame with a single terminal update.
+"""
+import asyncio
+from typing import Callable, Optional
+
+from screen.screen import Screen
+from screen.screen_consts import TARGET_FPS
+
+
+class RenderScheduler:
+    """
+    This is a render loop shared by all the screens of a game, flushing them at a capped frame rate.
+    """
+
+    def __init__(
+            self,
+            fps: Optional[int] = None,
+            update: Optional[Callable[[], None]] = None,
+    ):
+        """
+        :param fps: The maximum amount of frames to draw per second, defaults to TARGET_FPS
+        :param update: Called once per frame after the dirty screens were staged, defaults to curses.doupdate
+        """
+        if update is None:
+            import curses
+
+            update = curses.doupdate
+        self.frame_time = 1 / (fps or TARGET_FPS)
+        self.update = update
+        self.frames = 0
+        self._dirty = {}  # type: dict[Screen, dict]
+        self._dirty_event = None  # type: Optional[asyncio.Event]
+
+    def mark_dirty(self, dirty_screen: Screen, **kwargs):
+        """
+        Asks for a screen to be drawn in the next frame. Never blocks on terminal output.
+        :param dirty_screen: The screen to draw
+        :param kwargs: Keyword arguments to pass to its print_screen(), the last ones given in a frame win
+        """
+        self._dirty[dirty_screen] = kwargs
+        if self._dirty_event is not None:
+            self._dirty_event.set()
+
+    def flush(self):
+        """
+        Draws every dirty screen, and updates the terminal once
+        """
+        dirty, self._dirty = self._dirty, {}
+        if self._dirty_event is not None:
+            self._dirty_event.clear()
+        for dirty_screen, kwargs in dirty.items():
+            dirty_screen.print_screen(stage_only=True, **kwargs)
+        self.update()
+        self.frames += 1
+
+    async def run(self):
+        """
+        The render loop, flushing dirty screens and then sleeping for the rest of the frame
+        """
+        loop = asyncio.get_running_loop()
+        self._dirty_event = asyncio.Event()  # Created here, as it's bound to the running loop on older pythons
+        if self._dirty:
+            self._dirty_event.set()
+        while True:
+            await self._dirty_event.wait()
+            frame_start = loop.time()
+            self.flush()
+            await asyncio.sleep(max(0.0, self.frame_time - (loop.time() - frame_start)))
@@ -0,0 +1,217 @@
+"""
+This is the renderers module, the output backends of the screens.
+A Screen builds every frame as a list of rows once, and hands the rows to whichever renderer is attached to it:
+    CursesRenderer - a curses window, as for local games
+    AnsiRenderer - a stream of ANSI / VT100 bytes, only sending the cells that changed, as for network sessions
+    NullRenderer - nothing at all, as for headless benchmarks
+"""
+from abc import ABC, abstractmethod
+from typing import Callable, Tuple, Union
+
+from mytyping import CursesWindow
+from screen.screen_consts import (
+    ANSI_CLEAR,
+    ANSI_CURSOR_POSITION,
+    ANSI_ERASE_LINE_END,
+    DEFAULT_TERMINAL_SIZE,
+)
+
+
+class Renderer(ABC):
+    """
+    This is the base class of an output backend
+    Rows are written, and then either presented right away or staged to be presented by a later update()
+    """
+
+    @abstractmethod
+    def size(self) -> Tuple[int, int]:
+        """
+        :return: The (rows, cols) available for drawing
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def clear(self):
+        raise NotImplementedError
+
+    @abstractmethod
+    def write_row(self, y: int, row: str):
+        """
+        Writes a row of the frame, from the first column
+        :param y: The index of the row, rows that don't fit are ignored
+        :param row: The text of the row
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def stage(self):
+        """
+        Marks the rows written so far to be presented by the next update()
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def update(self):
+        """
+        Presents everything that was staged
+        """
+        raise NotImplementedError
+
+    def present(self):
+        """
+        Presents the rows written so far right away
+        """
+        self.stage()
+        self.update()
+
+
+class CursesRenderer(Renderer):
+    """
+    This draws to a curses window
+    """
+
+    def __init__(self, window: CursesWindow):
+        self.window = window
+
+    def size(self) -> Tuple[int, int]:
+        return self.window.getmaxyx()
+
+    def clear(self):
+        self.window.clear()
+
+    def write_row(self, y: int, row: str):
+        self.window.insstr(y, 0, row)
+
+    def stage(self):
+        self.window.noutrefresh()
+
+    def update(self):
+        import curses
+
+        curses.doupdate()
+
+    def present(self):
+        self.window.refresh()
+
+
+class AnsiRenderer(Renderer):
+    """
+    This writes ANSI escape sequences to a byte stream.
+    It remembers what the terminal shows, and only sends the span of every row that changed, cursor-addressed.
+    """
+
+    def __init__(
+            self,
+            write: Callable[[bytes], None],
+            size: Tuple[int, int] = DEFAULT_TERMINAL_SIZE,
+    ):
+        """
+        :param write: Sends bytes to the terminal, e.g. an asyncio StreamWriter's write
+        :param size: The (rows, cols) of the terminal
+        """
+        self.write = write
+        self.rows, self.cols = size
+        self.bytes_written = 0
+        self._shown = {}  # type: dict[int, str]
+        self._pending = []
+        self._staged = []
+
+    def size(self) -> Tuple[int, int]:
+        return self.rows, self.cols
+
+    def resize(self, rows: int, cols: int):
+        """
+        Changes the size of the terminal, clearing it on the next update
+        Screens redraw every row on their next print_screen(), as the size changed
+        """
+        self.rows, self.cols = rows, cols
+        self.clear()
+
+    def clear(self):
+        self._pending = [ANSI_CLEAR]
+        self._shown = {}
+
+    def write_row(self, y: int, row: str):
+        if not 0 <= y < self.rows:
+            return
+        row = row[: self.cols]
+        shown = self._shown.get(y, "")
+        if row == shown:
+            return
+        self._shown[y] = row
+        start = 0
+        while start < min(len(row), len(shown)) and row[start] == shown[start]:
+            start += 1
+        end = len(row)
+        if len(row) == len(shown):
+            while end > start and row[end - 1] == shown[end - 1]:
+                end -= 1
+        text = ANSI_CURSOR_POSITION.format(row=y + 1, col=start + 1) + row[start:end]
+        if len(row) < len(shown):
+            text += ANSI_ERASE_LINE_END  # The cursor is never past the last column here, as the row got shorter
+        self._pending.append(text)
+
+    def keyframe(self) -> bytes:
+        """
+        :return: The bytes that draw everything the terminal shows from scratch, e.g. for a new spectator
+            The rows written since the last update are included, resending them later changes nothing
+        """
+        return (
+            ANSI_CLEAR
+            + "".join(
+                ANSI_CURSOR_POSITION.format(row=y + 1, col=1) + row
+                for y, row in sorted(self._shown.items())
+            )
+        ).encode("utf-8")
+
+    def stage(self):
+        self._staged += self._pending
+        self._pending = []
+
+    def update(self):
+        """
+        Sends every staged write to the terminal, in one chunk
+        """
+        if not self._staged:
+            return
+        data = "".join(self._staged).encode("utf-8")
+        self._staged = []
+        self.bytes_written += len(data)
+        self.write(data)
+
+
+class NullRenderer(Renderer):
+    """
+    This draws nothing, only counting what it was asked to draw
+    """
+
+    def __init__(self, size: Tuple[int, int] = DEFAULT_TERMINAL_SIZE):
+        self.rows, self.cols = size
+        self.rows_written = 0
+        self.updates = 0
+
+    def size(self) -> Tuple[int, int]:
+        return self.rows, self.cols
+
+    def clear(self):
+        pass
+
+    def write_row(self, y: int, row: str):
+        self.rows_written += 1
+
+    def stage(self):
+        pass
+
+    def update(self):
+        self.updates += 1
+
+
+ScreenOutput = Union[CursesWindow, Renderer]
+
+
+def as_renderer(output: ScreenOutput) -> Renderer:
+    """
+    :param output: A renderer, or a curses window to draw to
+    :return: The renderer drawing to output
+    """
+    return output if isinstance(output, Renderer) else CursesRenderer(output)
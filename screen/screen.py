@@ -3,13 +3,15 @@ This is the base graphics module for the project
 To use this with an existing view, one must call print_screen()
 To create a new view, one must inherit from the class Screen
 and implement the view logic in _generate_view
+Views that redraw often can set incremental to only write the rows that changed since the last frame
+Screens draw through a renderer (see screen.renderers), so the same views can target curses, ANSI streams or nothing
 """
 
 import time
 from typing import Optional
 
 import screen.screen_utils
-from mytyping import CursesWindow
+from screen.renderers import ScreenOutput, as_renderer
 from screen.screen_consts import ROW_LOADING_TIMEOUT
 
 
@@ -18,23 +20,45 @@ class Screen:
     This is the graphics handler for the game. This prints stuff, and is overridden by the different views
     """
 
-    def __init__(self, stdscr: CursesWindow):
+    incremental = False  # Whether to diff every frame against current_screen and only write changed rows
+
+    def __init__(self, stdscr: ScreenOutput):
+        """
+        :param stdscr: The curses window to draw to, or any other renderer
+        """
         self.stdscr = stdscr
+        self.renderer = as_renderer(stdscr)
         self.rows, self.cols = 0, 0
         self.graphics = []
         self.current_screen = []
+        self.current_screen_size = (0, 0)
         self.retro_next_time = False
 
     def init_graphics(self):
         """
         Initialises the graphics buffer and a few parameters
         """
-        self.rows, self.cols = self.stdscr.getmaxyx()
+        self.rows, self.cols = self.renderer.size()
         self.graphics = []
 
     def _generate_view(self, **kwargs):
         raise NotImplementedError("_generate_view needs to be implemented by the view")
 
+    def invalidate(self):
+        """
+        Forces the next print_screen() to write every row, e.g. after the window was cleared by someone else
+        """
+        self.current_screen = []
+
+    def _changed_rows(self):
+        if not self.incremental or self.current_screen_size != (self.rows, self.cols):
+            return range(len(self.graphics))
+        return [
+            i
+            for i in range(len(self.graphics))
+            if i >= len(self.current_screen) or self.graphics[i] != self.current_screen[i]
+        ]
+
     def retro_ok(self):
         """
         Print using "retro style" next time you call print_screen()
@@ -48,6 +72,7 @@ class Screen:
         retro_style: Optional[bool] = False,
         wrap_screen: Optional[bool] = False,
         wrapper_text: Optional[str] = "",
+        stage_only: Optional[bool] = False,
         **kwargs
     ):
         """
@@ -56,6 +81,7 @@ class Screen:
         :param retro_style: bool, If true waits for ROW_LOADING_TIMEOUT before printing the next row
         :param wrap_screen: bool, If true wraps the screen with a border
         :param wrapper_text: str, Is the text to be displayed in the screen wrapper
+        :param stage_only: bool, If true only stages the frame, for a later update of the renderer (curses.doupdate())
         :param kwargs: Keyword arguments to be passed onwards to self.generate_view
         """
         if not wrap_screen and wrapper_text != "":
@@ -76,14 +102,20 @@ class Screen:
                 self.graphics, self.cols, wrapper_text
             )
         if retro_style or self.retro_next_time:
-            self.stdscr.clear()
+            self.renderer.clear()
             for i in range(len(self.graphics)):
                 time.sleep(ROW_LOADING_TIMEOUT)
-                self.stdscr.insstr(i, 0, self.graphics[i])
-                self.stdscr.refresh()
+                self.renderer.write_row(i, self.graphics[i])
+                self.renderer.present()
             self.retro_next_time = False
         else:
-            for i in range(len(self.graphics)):
-                self.stdscr.insstr(i, 0, self.graphics[i])
-            self.stdscr.refresh()
+            changed_rows = self._changed_rows()
+            for i in changed_rows:
+                self.renderer.write_row(i, self.graphics[i])
+            if changed_rows:
+                if stage_only:
+                    self.renderer.stage()
+                else:
+                    self.renderer.present()
         self.current_screen = self.graphics
+        self.current_screen_size = (self.rows, self.cols)
@@ -1,32 +1,40 @@
 """
 Here are consts relating to the general operation of graphics, as in the screen module
 """
-from curses import (
-    KEY_BACKSPACE,
-    KEY_DC,
-    KEY_DOWN,
-    KEY_END,
-    KEY_F1,
-    KEY_F2,
-    KEY_F3,
-    KEY_F4,
-    KEY_F5,
-    KEY_F6,
-    KEY_F7,
-    KEY_F8,
-    KEY_F9,
-    KEY_F10,
-    KEY_F12,
-    KEY_HOME,
-    KEY_IC,
-    KEY_LEFT,
-    KEY_NPAGE,
-    KEY_PPAGE,
-    KEY_RIGHT,
-    KEY_UP,
-)
+# curses key codes, spelled out so that ANSI renderers and the telnet server can be imported without loading curses
+KEY_DOWN = 258
+KEY_UP = 259
+KEY_LEFT = 260
+KEY_RIGHT = 261
+KEY_HOME = 262
+KEY_BACKSPACE = 263
+KEY_F1 = 265
+KEY_F2 = 266
+KEY_F3 = 267
+KEY_F4 = 268
+KEY_F5 = 269
+KEY_F6 = 270
+KEY_F7 = 271
+KEY_F8 = 272
+KEY_F9 = 273
+KEY_F10 = 274
+KEY_F12 = 276
+KEY_DC = 330
+KEY_IC = 331
+KEY_NPAGE = 338
+KEY_PPAGE = 339
+KEY_END = 360
 
 ROW_LOADING_TIMEOUT = 0.05
+TARGET_FPS = 30  # Shared by every screen drawn through a RenderScheduler
+# ANSI / VT100 terminals, as drawn to by the AnsiRenderer
+DEFAULT_TERMINAL_SIZE = (24, 80)  # (rows, cols)
+ANSI_CLEAR = "\x1b[2J"
+ANSI_HIDE_CURSOR = "\x1b[?25l"
+ANSI_SHOW_CURSOR = "\x1b[?25h"
+ANSI_RESET = "\x1b[0m"
+ANSI_CURSOR_POSITION = "\x1b[{row};{col}H"  # 1-based
+ANSI_ERASE_LINE_END = "\x1b[K"
 BORDER = "┃"
 PRETTY_KEYS = {
     KEY_LEFT: "←",
@@ -1,7 +1,6 @@
 """
 Here are various utility functions useful for the graphics of the project
 """
-from curses import newwin
 from typing import List, Optional
 
 import screen.screen_consts as consts
@@ -72,6 +71,8 @@ def get_partial_screen(
     :param splits_counts: the amount of splits to do
     :return: curses new win which is that split window
     """
+    from curses import newwin  # Only split screens need curses, so that ANSI views are importable without it
+
     total_rows, total_cols = stdscr.getmaxyx()
     rows_per_screen = total_rows
     cols_per_screen = int(
@@ -4,13 +4,15 @@ Here are various views of app_views.py screens, all inheriting from AppScreenLaz
 from abc import ABC
 from typing import List
 
-from mytyping import CursesWindow, Keymap, OptionMap
+from mytyping import Keymap, OptionMap
+from screen.renderers import ScreenOutput
 from screen.screen import Screen
 from screen.screen_utils import prettify_key
 from screen.views.app_views_consts import (
     ACTIVE_OPTION,
     EMPTY_OPTION,
     LOGO_DISTANCE_FROM_TOP,
+    LOBBY_TEXT_DISTANCE_FROM_LOGO,
     LOGO_GRAPHICS,
     OPTIONS_DISTANCE_FROM_BOTTOM,
     SETTINGS_HEADER_DISTANCE_FROM_TOP,
@@ -24,7 +26,7 @@ class AppScreenLazyClass(Screen, ABC):
     This is the base class of an app menu view
     """
 
-    def __init__(self, stdscr: CursesWindow):
+    def __init__(self, stdscr: ScreenOutput):
         super().__init__(stdscr)
         self.active_option_row = 0  # type: int
         self.active_option_col = 0  # type: int
@@ -93,7 +95,7 @@ class MainAppScreen(AppScreenLazyClass):
     This is the view of the main screen of the app module
     """
 
-    def __init__(self, stdscr: CursesWindow):
+    def __init__(self, stdscr: ScreenOutput):
         super().__init__(stdscr=stdscr)
 
     @staticmethod
@@ -129,7 +131,7 @@ class SettingsAppScreen(AppScreenLazyClass):
     This is the view of the settings screen of the app module
     """
 
-    def __init__(self, stdscr: CursesWindow):
+    def __init__(self, stdscr: ScreenOutput):
         super().__init__(stdscr=stdscr)
 
     @staticmethod
@@ -155,3 +157,20 @@ class SettingsAppScreen(AppScreenLazyClass):
             options=option_map,
             distance_from_bottom=OPTIONS_DISTANCE_FROM_BOTTOM,
         )
+
+
+class LobbyScreen(AppScreenLazyClass):
+    """
+    This is the view of the lobby of online sessions, a text under the logo
+    """
+
+    def __init__(self, stdscr: ScreenOutput):
+        super().__init__(stdscr=stdscr)
+
+    def _generate_view(self, text: List[str]):
+        self._print_logo(
+            logo_graphics=LOGO_GRAPHICS, distance_from_top=LOGO_DISTANCE_FROM_TOP
+        )
+        for _ in range(LOBBY_TEXT_DISTANCE_FROM_LOGO):
+            self.graphics.append("")
+        self.graphics += text
@@ -18,6 +18,7 @@ SETTINGS_LOGO_GRAPHICS = [
     "╚══════╝╚══════╝   ╚═╝      ╚═╝   ╚═╝╚═╝  ╚═══╝ ╚═════╝ ╚══════╝",
 ]
 LOGO_DISTANCE_FROM_TOP = 1
+LOBBY_TEXT_DISTANCE_FROM_LOGO = 3
 OPTIONS_DISTANCE_FROM_BOTTOM = 5
 SETTINGS_HEADER_DISTANCE_FROM_TOP = 5
 SETTINGS_OPTION_COLUMN_WIDTH = 15
@@ -1,16 +1,19 @@
 """
 This module defines the view of the main game, and is used by game_views.py
 """
-from typing import Optional, Union
+from collections import Counter
+from typing import Callable, Dict, Hashable, List, Optional, Tuple, Union
 
 import player.player
-from mytyping import CursesWindow, Keymap, PieceCoordinates, StatsDict
+from mytyping import Keymap, PieceCoordinates, StatsDict
+from screen.renderers import ScreenOutput
 from screen.screen import Screen
 from screen.screen_utils import border_wrapper, prettify_key
 from screen.views.game_views_consts import (
     BOARD_BORDER_TEXT,
     BORDER,
     DISPLAYED_HEIGHT,
+    DISPLAYED_WIDTH,
     EMPTY,
     EMPTY_PIECE,
     EMPTY_PIXEL,
@@ -18,9 +21,14 @@ from screen.views.game_views_consts import (
     FULL_PIXEL,
     GAME_OVER_OPTIONS,
     GAME_OVER_TEXT,
+    GHOST,
+    GHOST_PIXEL,
     HELP_BORDER_TEXT,
     HOLD_BORDER_TEXT,
     NEXT_BORDER_TEXT,
+    OPPONENT_BORDER_TEXT,
+    OPPONENT_EMPTY_PIXEL,
+    OPPONENT_FULL_PIXEL,
     PIXEL_SIZE,
     RIGHT_SIDE_GRAPHICS_WIDTH,
     SHAPES_VIEWS,
@@ -35,17 +43,29 @@ class GameScreen(Screen):
     This implements the view of the game module
     """
 
+    incremental = True
+
     def __init__(
             self,
-            stdscr: CursesWindow,
+            stdscr: ScreenOutput,
             game_player: player.player.Player,
             keymap: Keymap,
             stats_map: StatsDict,
+            opponents: Optional[Dict[int, player.player.Player]] = None,
     ):
+        """
+        :param opponents: The opponents whose boards to draw next to the player's, by player id
+            Their boards are read with Player.get_board_masks() on every frame, so they are always the live ones
+        """
         super().__init__(stdscr)
         self.player = game_player
         self.keymap = keymap
         self.stats_map = stats_map
+        self.opponents = opponents
+        # Side panels are only redrawn when their inputs change
+        self._panel_cache = {}  # type: Dict[str, Tuple[Hashable, List[str]]]
+        self.panel_hits = Counter()  # type: Counter
+        self.panel_misses = Counter()  # type: Counter
 
     @staticmethod
     def _get_piece_view(piece_key):
@@ -73,8 +93,9 @@ class GameScreen(Screen):
         for i in reversed(range(x_size)):
             row = ""
             for j in range(y_size):
+                pixel = piece_coord[i][j]
                 block = (
-                    FULL_PIXEL if piece_coord[i][j] != EMPTY else EMPTY_PIXEL_PRE_CENTER
+                    EMPTY_PIXEL_PRE_CENTER if pixel == EMPTY else GHOST_PIXEL if pixel == GHOST else FULL_PIXEL
                 )
                 row += block
             row = row.center(centering_width).replace("  ", EMPTY_PIXEL)
@@ -82,6 +103,19 @@ class GameScreen(Screen):
 
         return border_wrapper(graphics=box, width=centering_width + 2, text=text)
 
+    def _board_view(self) -> List[List[int]]:
+        """
+        Generates the player's board view, with the ghost piece showing where the active piece would land
+        """
+        view = self.player.get_board_view()
+        piece = self.player.active_piece_rotation
+        if piece is not None:
+            ghost_x, ghost_y = self.player.landing_bb_x(), self.player.bb_y
+            for x, y in piece.cells:
+                if view[x + ghost_x][y + ghost_y] == EMPTY:
+                    view[x + ghost_x][y + ghost_y] = GHOST
+        return view
+
     def _draw_stats(self):
         stats = []
         for stat in self.stats_map:
@@ -107,28 +141,91 @@ class GameScreen(Screen):
             keys, width=RIGHT_SIDE_GRAPHICS_WIDTH + 2, text=HELP_BORDER_TEXT
         )
 
+    @staticmethod
+    def _draw_opponent(player_id: int, row_masks: List[int]):
+        rows = [
+            "".join(
+                OPPONENT_FULL_PIXEL if row_masks[x] >> y & 1 else OPPONENT_EMPTY_PIXEL
+                for y in range(DISPLAYED_WIDTH)
+            )
+            for x in reversed(range(DISPLAYED_HEIGHT))
+        ]
+        return border_wrapper(
+            rows, width=DISPLAYED_WIDTH + 2, text=OPPONENT_BORDER_TEXT.format(number=player_id + 1)
+        )
+
+    def _draw_opponents(self):
+        opponents_graphics = []
+        for player_id, opponent_player in sorted(self.opponents.items()):
+            row_masks = opponent_player.get_board_masks()
+            opponent = self._cached_panel(
+                OPPONENT_BORDER_TEXT.format(number=player_id + 1),
+                tuple(row_masks),
+                lambda: self._draw_opponent(player_id, row_masks),
+            )
+            if not opponents_graphics:
+                opponents_graphics = list(opponent)
+            else:
+                opponents_graphics = [
+                    left + " " + right for left, right in zip(opponents_graphics, opponent)
+                ]
+        return opponents_graphics
+
+    def _cached_panel(self, name: str, key: Hashable, draw: Callable[[], List[str]]):
+        """
+        Returns the graphics of a side panel, only drawing them if key changed since the last time
+        The returned graphics are shared with the cache, and should not be modified
+        :param name: The name of the panel, used for the cache and the hit/miss counters
+        :param key: The inputs of the panel
+        :param draw: Draws the panel
+        """
+        cached = self._panel_cache.get(name)
+        if cached is not None and cached[0] == key:
+            self.panel_hits[name] += 1
+            return cached[1]
+        self.panel_misses[name] += 1
+        graphics = draw()
+        self._panel_cache[name] = (key, graphics)
+        return graphics
+
     def _generate_view(self, text_over_board: Optional[str] = None):
+        next_piece_key = self.player.next_pieces.peek()
+        held_piece_key = self.player.held_piece_key
         right_side_graphics = (
             #  Next piece
-            self._draw_piece(
-                piece_coord=self._get_piece_view(self.player.next_pieces[-1][0]),
-                text=NEXT_BORDER_TEXT,
-                centering_width=RIGHT_SIDE_GRAPHICS_WIDTH,
+            self._cached_panel(
+                NEXT_BORDER_TEXT,
+                next_piece_key,
+                lambda: self._draw_piece(
+                    piece_coord=self._get_piece_view(next_piece_key),
+                    text=NEXT_BORDER_TEXT,
+                    centering_width=RIGHT_SIDE_GRAPHICS_WIDTH,
+                ),
             )
             #  Held piece
-            + self._draw_piece(
-            piece_coord=self._get_piece_view(self.player.held_piece_key),
-            text=HOLD_BORDER_TEXT,
-            centering_width=RIGHT_SIDE_GRAPHICS_WIDTH,
-        )
+            + self._cached_panel(
+                HOLD_BORDER_TEXT,
+                held_piece_key,
+                lambda: self._draw_piece(
+                    piece_coord=self._get_piece_view(held_piece_key),
+                    text=HOLD_BORDER_TEXT,
+                    centering_width=RIGHT_SIDE_GRAPHICS_WIDTH,
+                ),
+            )
             #  Game stats
-            + self._draw_stats()
+            + self._cached_panel(
+                STATS_BORDER_TEXT,
+                tuple(stat(self.player) for stat in self.stats_map.values()),
+                self._draw_stats,
+            )
             #  Keymap and help
-            + self._draw_help()
+            + self._cached_panel(
+                HELP_BORDER_TEXT, tuple(self.keymap.items()), self._draw_help
+            )
         )
         # Game board
         board = self._draw_piece(
-            piece_coord=self.player.board,
+            piece_coord=self._board_view(),
             text=BOARD_BORDER_TEXT,
             x_size=DISPLAYED_HEIGHT,
         )
@@ -140,17 +237,27 @@ class GameScreen(Screen):
                 text = BORDER + text.center(len(board[start_row + i]) - 2) + BORDER
                 board[start_row + i] = text
 
+        if self.opponents:
+            right_side_width = RIGHT_SIDE_GRAPHICS_WIDTH + 2
+            right_side_graphics = [
+                row.ljust(right_side_width) + " " + opponents_row
+                for row, opponents_row in zip(
+                    right_side_graphics + [""] * len(board), self._draw_opponents()
+                )
+            ]
+
         for i in range(len(board)):
             try:
                 self.graphics.append(board[i] + " " + right_side_graphics[i])
             except IndexError:
                 self.graphics.append(board[i])
 
-    def display_game_over(
-            self, victory: Union[bool, None], quit_key: int, restart_key: int
-    ):
+    @staticmethod
+    def game_over_text(
+            victory: Union[bool, None], quit_key: int, restart_key: int
+    ) -> List[str]:
         """
-        This is how you init the game over graphics.
+        Generates the rows of the game over text, to be displayed over the board.
         :param victory: Whether to display a winning or losing text. Displays neutral text when None.
         :param quit_key: The index of the key used to quit.
         :param restart_key: The index of the key used to restart.
@@ -165,4 +272,17 @@ class GameScreen(Screen):
         game_over_text += GAME_OVER_OPTIONS.format(
             restart=prettify_key(restart_key), quit=prettify_key(quit_key)
         )
-        self.print_screen(text_over_board=game_over_text.splitlines())
+        return game_over_text.splitlines()
+
+    def display_game_over(
+            self, victory: Union[bool, None], quit_key: int, restart_key: int
+    ):
+        """
+        This is how you init the game over graphics.
+        :param victory: Whether to display a winning or losing text. Displays neutral text when None.
+        :param quit_key: The index of the key used to quit.
+        :param restart_key: The index of the key used to restart.
+        """
+        self.print_screen(
+            text_over_board=self.game_over_text(victory, quit_key, restart_key)
+        )
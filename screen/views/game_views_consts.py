@@ -11,6 +11,7 @@ from player.player_consts import (
     O_BLOCK,
     S_BLOCK,
     T_BLOCK,
+    WIDTH,
     Z_BLOCK,
 )
 
@@ -30,9 +31,11 @@ EMPTY_PIECE = [[0, 0, 0, 0], [0, 0, 0, 0]]
 EMPTY = EMPTY
 LIVE = LIVE
 DEAD = DEAD
+GHOST = 3  # Only in views, where the active piece would land if it was dropped
 
 # Board indices
 DISPLAYED_HEIGHT = 20
+DISPLAYED_WIDTH = WIDTH
 
 # Aesthetic things
 BOARD_BORDER_TEXT = "Tetris"
@@ -40,6 +43,7 @@ HOLD_BORDER_TEXT = "Hold"
 NEXT_BORDER_TEXT = "Next"
 STATS_BORDER_TEXT = "Stats"
 HELP_BORDER_TEXT = "Help"
+OPPONENT_BORDER_TEXT = "P{number}"
 
 # SEPARATOR = "-" * 30
 PIXEL_SIZE = 2
@@ -50,6 +54,10 @@ BORDER = "┃"
 FULL_PIXEL = "█" * PIXEL_SIZE
 EMPTY_PIXEL_PRE_CENTER = " " * PIXEL_SIZE
 EMPTY_PIXEL = "".join("·".ljust(PIXEL_SIZE))
+GHOST_PIXEL = "░" * PIXEL_SIZE
+# Opponents' boards are drawn at one character per pixel, so that a few fit next to the player's own board
+OPPONENT_FULL_PIXEL = "█"
+OPPONENT_EMPTY_PIXEL = "·"
 
 # Graphical displays
 GAME_OVER_TEXT = "G A M E   O V E R\n"
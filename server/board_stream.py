@@ -0,0 +1,330 @@
+"""
+This is the board stream module, a compact binary protocol of a player's board for remote clients and spectators.
+A stream starts with a snapshot of the whole state, and then only sends what happened to it:
+    MOVE - the active piece moved, rotated or spawned
+    LOCK - a piece locked to the board
+    CLEAR - full rows were cleared
+    GARBAGE - rows were pushed in from the bottom
+Every packet is a (type, player id, sequence number) header and a small fixed payload, so an action costs a few bytes
+instead of a rendered frame. A client that misses a packet asks for a snapshot again, see BoardDecoder.needs_resync.
+The telnet server doesn't use it: telnet clients and spectators are plain terminals, so they need the ANSI frames of
+the session's renderer, and the players of a match share a process, so their screens read each other's live boards.
+It is for clients that draw boards on their own, and for boards shared between processes.
+"""
+import struct
+from typing import List, Optional, Tuple
+
+from player.board import BOARD_BACKENDS, BitBoard
+from player.piece_tables import PIECE_ROTATIONS
+from player.player import Player
+from player.player_consts import (
+    DEFAULT_BOARD_BACKEND,
+    FULL_ROW_MASK,
+    HEIGHT,
+    PIECE_IDS,
+    PIECE_KEYS,
+    ROTATION_STATES,
+)
+from server.server_consts import (
+    BOARD_CLEAR_FORMAT,
+    BOARD_GARBAGE_FORMAT,
+    BOARD_GARBAGE_ROW_FORMAT,
+    BOARD_PACKET_HEADER_FORMAT,
+    BOARD_PIECE_FORMAT,
+    BOARD_REORDER_WINDOW,
+    BOARD_SNAPSHOT_FORMAT,
+    CLEAR_PACKET,
+    GARBAGE_PACKET,
+    LOCK_PACKET,
+    MOVE_PACKET,
+    NO_PIECE,
+    SNAPSHOT_PACKET,
+)
+
+_HEADER = struct.Struct(BOARD_PACKET_HEADER_FORMAT)
+_PIECE = struct.Struct(BOARD_PIECE_FORMAT)
+_SNAPSHOT = struct.Struct(BOARD_SNAPSHOT_FORMAT)
+_CLEAR = struct.Struct(BOARD_CLEAR_FORMAT)
+_GARBAGE = struct.Struct(BOARD_GARBAGE_FORMAT)
+_GARBAGE_ROW = struct.Struct(BOARD_GARBAGE_ROW_FORMAT)
+_PAYLOADS = {
+    SNAPSHOT_PACKET: _SNAPSHOT,
+    MOVE_PACKET: _PIECE,
+    LOCK_PACKET: _PIECE,
+    CLEAR_PACKET: _CLEAR,
+    GARBAGE_PACKET: _GARBAGE,
+}
+_EMPTY_BOARD = BitBoard()
+
+PieceState = Tuple[int, int, int, int]  # (piece id, rotation state, bb_x, bb_y), NO_PIECE as id if there is none
+
+
+def player_piece_state(game_player: Player) -> PieceState:
+    """
+    :return: The active piece of a player, as sent in MOVE packets
+    """
+    if game_player.active_piece_rotation is None:
+        return NO_PIECE, 0, 0, 0
+    return (
+        PIECE_IDS[game_player.active_piece_key],
+        game_player.rotation_state,
+        game_player.bb_x,
+        game_player.bb_y,
+    )
+
+
+def lock_and_clear(rows: List[int], piece: PieceState) -> Tuple[List[int], List[int]]:
+    """
+    Locks a piece to row bitmasks of a board, and clears the full rows, like Player._end_round does
+    :return: The rows afterwards, and the indices of the cleared rows
+    """
+    piece_id, rotation_state, bb_x, bb_y = piece
+    board = BitBoard.from_row_masks(rows)
+    board.lock(PIECE_ROTATIONS[PIECE_KEYS[piece_id]][rotation_state], bb_x, bb_y)
+    cleared_rows = board.clear_full_rows()
+    return board.row_masks(), cleared_rows
+
+
+def _valid_rows(rows: List[int]) -> bool:
+    """
+    :return: Whether row bitmasks received fit a board, at most HEIGHT of them with no pixels past WIDTH
+    """
+    return len(rows) <= HEIGHT and all(row & ~FULL_ROW_MASK == 0 for row in rows)
+
+
+def _valid_piece(piece: PieceState) -> bool:
+    """
+    :return: Whether a piece state received is NO_PIECE, or a piece within the board's bounds
+        DEAD pixels aren't checked, as the active piece overlaps them once the game is over
+    """
+    piece_id, rotation_state, bb_x, bb_y = piece
+    if piece_id == NO_PIECE:
+        return True
+    if piece_id >= len(PIECE_KEYS) or rotation_state >= ROTATION_STATES:
+        return False
+    return _EMPTY_BOARD.fits(PIECE_ROTATIONS[PIECE_KEYS[piece_id]][rotation_state], bb_x, bb_y)
+
+
+def garbage_between(before: List[int], after: List[int]) -> Optional[List[int]]:
+    """
+    :return: The rows that were pushed in from the bottom of before to make after, bottom first,
+        or None if after isn't before with rows pushed in
+    """
+    for count in range(HEIGHT):
+        if after[count:] == before[: HEIGHT - count]:
+            return after[:count]
+    return None
+
+
+class BoardEncoder:
+    """
+    This follows a player, and encodes the changes to its board and active piece as packets
+    It compares states, so it can be called after any amount of actions, e.g. from GameLazyClass's on_change.
+    Only one piece may lock between two calls, else the change is sent as a snapshot.
+    """
+
+    def __init__(self, game_player: Player):
+        self.player = game_player
+        self.seq = 0
+        self._rows = None  # type: Optional[List[int]]
+        self._piece = None  # type: Optional[PieceState]
+        self._pieces_locked = 0
+
+    def _packet(self, packet_type: int, payload: bytes) -> bytes:
+        packet = _HEADER.pack(packet_type, self.player.player_id, self.seq) + payload
+        self.seq += 1
+        return packet
+
+    def snapshot(self) -> bytes:
+        """
+        :return: A SNAPSHOT packet of the player's state, the first packet of a stream and the answer to a resync
+        """
+        self._rows = self.player.board.row_masks()
+        self._piece = player_piece_state(self.player)
+        self._pieces_locked = self.player.pieces_locked
+        return self._packet(
+            SNAPSHOT_PACKET, _SNAPSHOT.pack(self.player.score, *self._rows, *self._piece)
+        )
+
+    def update(self) -> List[bytes]:
+        """
+        :return: The packets of everything that changed since the last call, a snapshot on the first call
+        """
+        if self._rows is None:
+            return [self.snapshot()]
+        packets = []
+        rows = self.player.board.row_masks()
+        if rows != self._rows or self.player.pieces_locked != self._pieces_locked:
+            board_packets = self._board_packets(rows)
+            if board_packets is None:  # Not something the events describe, send it all
+                return [self.snapshot()]
+            packets += board_packets
+            self._rows = rows
+            self._pieces_locked = self.player.pieces_locked
+        piece = player_piece_state(self.player)
+        if piece != self._piece:
+            packets.append(self._packet(MOVE_PACKET, _PIECE.pack(*piece)))
+            self._piece = piece
+        return packets
+
+    def _board_packets(self, rows: List[int]) -> Optional[List[bytes]]:
+        """
+        Explains the change of the board from the last rows sent to rows, as LOCK, CLEAR and GARBAGE packets
+        :return: The packets, or None if the change can't be explained by them
+        """
+        events = []  # type: List[Tuple[int, bytes]]
+        locked_rows = self._rows
+        if self.player.pieces_locked == self._pieces_locked + 1:
+            piece_key, rotation_state, bb_x, bb_y = self.player.last_locked_piece
+            locked_piece = (PIECE_IDS[piece_key], rotation_state, bb_x, bb_y)
+            locked_rows, cleared_rows = lock_and_clear(self._rows, locked_piece)
+            events.append((LOCK_PACKET, _PIECE.pack(*locked_piece)))
+            if cleared_rows:
+                cleared_mask = sum(1 << x for x in cleared_rows)
+                events.append((CLEAR_PACKET, _CLEAR.pack(cleared_mask, self.player.score)))
+        elif self.player.pieces_locked != self._pieces_locked:
+            return None
+        garbage = garbage_between(locked_rows, rows)
+        if garbage is None:
+            return None
+        if garbage:
+            events.append(
+                (
+                    GARBAGE_PACKET,
+                    _GARBAGE.pack(len(garbage))
+                    + b"".join(_GARBAGE_ROW.pack(row) for row in garbage),
+                )
+            )
+        return [self._packet(packet_type, payload) for packet_type, payload in events]
+
+
+def split_packets(data: bytes) -> Tuple[List[bytes], Optional[bytes]]:
+    """
+    Splits a chunk of a byte stream into whole packets
+    :return: The packets, and the bytes of a packet that didn't fully arrive yet, or None if the stream reached a
+        packet of an unknown type, after which nothing can be split anymore
+    """
+    packets = []
+    offset = 0
+    while offset + _HEADER.size <= len(data):
+        payload = _PAYLOADS.get(data[offset])
+        if payload is None:
+            return packets, None
+        packet_type = data[offset]
+        size = _HEADER.size + payload.size
+        if packet_type == GARBAGE_PACKET and offset + size <= len(data):
+            size += data[offset + _HEADER.size] * _GARBAGE_ROW.size
+        if offset + size > len(data):
+            break
+        packets.append(data[offset: offset + size])
+        offset += size
+    return packets, data[offset:]
+
+
+class BoardDecoder:
+    """
+    This is the reference client of a board stream, rebuilding the player's board from its packets
+    Packets are applied in sequence order: late duplicates are ignored, and early ones are kept until the missing
+    ones arrive. After a gap of BOARD_REORDER_WINDOW packets, or a packet that doesn't fit the board, the decoder
+    waits for a snapshot, and needs_resync tells the client to ask for one.
+    """
+
+    def __init__(self, board_backend: str = DEFAULT_BOARD_BACKEND):
+        """
+        :param board_backend: Which board storage to rebuild the board in
+        """
+        self.board_backend = board_backend
+        self.board = BOARD_BACKENDS[board_backend]()
+        self.piece = (NO_PIECE, 0, 0, 0)  # type: PieceState
+        self.score = 0
+        self.player_id = None  # type: Optional[int]
+        self.needs_resync = True  # Nothing can be applied before the first snapshot
+        self.next_seq = 0
+        self._early_packets = {}  # type: dict[int, bytes]
+        self._buffer = b""
+
+    def feed(self, data: bytes):
+        """
+        Applies a chunk of a byte stream, packets may be split between chunks
+        """
+        packets, rest = split_packets(self._buffer + data)
+        self._buffer = rest if rest is not None else b""
+        for packet in packets:
+            self.receive(packet)
+        if rest is None:  # A corrupt stream, the next snapshot starts it over
+            self._resync()
+
+    def receive(self, packet: bytes):
+        """
+        Applies a single packet, or keeps it until its turn comes
+        """
+        packet_type, player_id, seq = _HEADER.unpack_from(packet)
+        if packet_type == SNAPSHOT_PACKET:
+            if seq < self.next_seq and not self.needs_resync:  # A late snapshot, older than the board
+                return
+            self._early_packets = {
+                early_seq: early_packet
+                for early_seq, early_packet in self._early_packets.items()
+                if early_seq > seq
+            }
+            self.needs_resync = False
+        elif self.needs_resync or seq < self.next_seq:
+            return
+        elif seq > self.next_seq:
+            self._early_packets[seq] = packet
+            if len(self._early_packets) > BOARD_REORDER_WINDOW:
+                self._resync()
+            return
+        self.player_id = player_id
+        self.next_seq = seq + 1
+        if not self._apply(packet_type, packet[_HEADER.size:]):
+            self._resync()
+            return
+        while self.next_seq in self._early_packets:
+            self.receive(self._early_packets.pop(self.next_seq))
+
+    def _resync(self):
+        self.needs_resync = True
+        self._early_packets = {}
+
+    def _apply(self, packet_type: int, payload: bytes) -> bool:
+        """
+        :return: Whether the payload fit the board
+        """
+        rows = self.board.row_masks()
+        if packet_type == SNAPSHOT_PACKET:
+            values = _SNAPSHOT.unpack(payload)
+            rows = list(values[1: HEIGHT + 1])
+            piece = values[HEIGHT + 1:]
+            if not _valid_rows(rows) or not _valid_piece(piece):
+                return False
+            self.score = values[0]
+            self.piece = piece
+        elif packet_type == MOVE_PACKET:
+            piece = _PIECE.unpack(payload)
+            if not _valid_piece(piece):
+                return False
+            self.piece = piece
+            return True
+        elif packet_type == LOCK_PACKET:
+            piece_id, rotation_state, bb_x, bb_y = _PIECE.unpack(payload)
+            if piece_id == NO_PIECE or not _valid_piece((piece_id, rotation_state, bb_x, bb_y)):
+                return False
+            piece_rotation = PIECE_ROTATIONS[PIECE_KEYS[piece_id]][rotation_state]
+            # The board's lock() assumes a valid placement, so a corrupt packet, or a board out of sync with the
+            # player's, could lock pixels out of the board or over DEAD ones
+            if not self.board.fits(piece_rotation, bb_x, bb_y):
+                return False
+            self.board.lock(piece_rotation, bb_x, bb_y)
+            return True
+        elif packet_type == CLEAR_PACKET:
+            cleared_mask, self.score = _CLEAR.unpack(payload)
+            cleared_rows = self.board.clear_full_rows()
+            return cleared_mask == sum(1 << x for x in cleared_rows)
+        elif packet_type == GARBAGE_PACKET:
+            garbage = [row for row, in _GARBAGE_ROW.iter_unpack(payload[_GARBAGE.size:])]
+            if not _valid_rows(garbage):
+                return False
+            rows = garbage + rows[: HEIGHT - len(garbage)]
+        self.board = BOARD_BACKENDS[self.board_backend].from_row_masks(rows)
+        return True
@@ -0,0 +1,78 @@
+"""
+This is the handoff module, moving telnet sessions from one worker process to another.
+Rooms and spectators only see the sessions of their own process, so when the server runs several workers, one of
+them, the match worker, serves every online match and spectator. The other workers hand it the sessions choosing
+those from the lobby: the connection's socket is sent over a unix datagram link (SCM_RIGHTS), along with what the
+session knows of its client and what the client typed ahead, and the match worker serves it from there.
+"""
+import socket
+import struct
+from typing import List, NamedTuple, Optional, Tuple
+
+from server.server_consts import HANDOFF_HEADER_FORMAT, HANDOFF_KEY_FORMAT, HANDOFF_MESSAGE_SIZE, HANDOFF_MODES
+
+_HEADER = struct.Struct(HANDOFF_HEADER_FORMAT)
+_KEY = struct.Struct(HANDOFF_KEY_FORMAT)
+
+
+class HandedOffSession(NamedTuple):
+    sock: socket.socket
+    mode: str  # The lobby choice of the session, one of HANDOFF_MODES
+    window_size: Optional[Tuple[int, int]]  # (rows, cols), None if the client never reported it
+    keys: List[int]  # Keys typed ahead, not dispatched yet
+    data: bytes  # Bytes received but not decoded yet, e.g. the start of an escape sequence
+
+
+def handoff_supported() -> bool:
+    """
+    :return: Whether sockets can be sent to other processes on this platform
+    """
+    return hasattr(socket, "send_fds") and hasattr(socket, "AF_UNIX")
+
+
+def handoff_links() -> Tuple[socket.socket, socket.socket]:
+    """
+    :return: The (sending, receiving) ends of a link handing sessions over, shared by the processes of the server
+    """
+    sending, receiving = socket.socketpair(socket.AF_UNIX, socket.SOCK_DGRAM)
+    # A full link, e.g. while the match worker restarts, fails the handoff instead of stalling the worker's loop
+    sending.setblocking(False)
+    receiving.setblocking(False)
+    return sending, receiving
+
+
+def send_session(link: socket.socket, session: HandedOffSession):
+    """
+    Sends a session over a link. The socket still has to be closed, without shutting the connection down
+    :raise OSError: If the link is full or closed
+    """
+    rows, cols = session.window_size if session.window_size is not None else (0, 0)
+    keys = session.keys[: (HANDOFF_MESSAGE_SIZE - _HEADER.size) // _KEY.size]
+    message = _HEADER.pack(HANDOFF_MODES.index(session.mode), rows, cols, len(keys))
+    message += b"".join(_KEY.pack(key) for key in keys) + session.data
+    socket.send_fds(link, [message[:HANDOFF_MESSAGE_SIZE]], [session.sock.fileno()])
+
+
+def receive_sessions(link: socket.socket) -> List[HandedOffSession]:
+    """
+    Receives every session waiting on a link, without blocking
+    """
+    sessions = []
+    while True:
+        try:
+            message, fds, _, _ = socket.recv_fds(link, HANDOFF_MESSAGE_SIZE, 1)
+        except BlockingIOError:
+            return sessions
+        if not fds:
+            continue
+        mode_index, rows, cols, keys_count = _HEADER.unpack_from(message)
+        keys_end = _HEADER.size + keys_count * _KEY.size
+        sessions.append(
+            HandedOffSession(
+                sock=socket.socket(fileno=fds[0]),
+                mode=HANDOFF_MODES[mode_index],
+                window_size=(rows, cols) if rows and cols else None,
+                keys=[key for key, in _KEY.iter_unpack(message[_HEADER.size: keys_end])],
+                data=message[keys_end:],
+            )
+        )
@@ -0,0 +1,174 @@
+"""
+This is the match module, pairing telnet sessions into rooms of online multiplayer games.
+The server is the authority: every player of a room is a Player running in the server's loop, fed by its session's keys.
+Clearing rows sends garbage lines to an opponent, like local versus games.
+As the players of a room share the server's process, each member's screen draws its opponents' live boards, and a
+change to a board only asks for the opponents' screens to be drawn in their next frame.
+"""
+import asyncio
+import random
+from functools import partial
+from typing import TYPE_CHECKING, List, Optional, Tuple
+
+from game.game import GameLazyClass, game_over_victories
+from game.replay import player_seed
+from player.garbage import GarbageRouter
+from screen.render_scheduler import RenderScheduler
+from server.server_consts import MATCH_SIZE, MATCH_WAIT_TIMEOUT
+from utils import log
+
+if TYPE_CHECKING:
+    from server.server import ServerInstance
+
+
+class Room:
+    """
+    This is a single online match, between 2 or more sessions
+    """
+
+    def __init__(self, sessions: List["ServerInstance"], seed: Optional[int] = None):
+        """
+        :param sessions: The members of the room, their index in it is their player id
+        :param seed: The seed of the match, random if not given
+        """
+        self.sessions = sessions
+        self.players_count = len(sessions)
+        self.seed = seed if seed is not None else random.getrandbits(32)
+        self.finished_players = []  # type: List[int]
+        self.victories = {}  # type: dict[int, Optional[bool]]
+        self._decided = [asyncio.Event() for _ in sessions]
+        self.render_schedulers = [
+            RenderScheduler(update=session.renderer.update) for session in sessions
+        ]
+        self.games = [
+            GameLazyClass(
+                stdscr=session.renderer,
+                keymap=session.keymap,
+                player_id=player_id,
+                seed=player_seed(self.seed, player_id),
+                render_scheduler=self.render_schedulers[player_id],
+                on_change=partial(self._player_changed, player_id),
+            )
+            for player_id, session in enumerate(sessions)
+        ]
+        # Every member's screen draws its opponents' live boards, which only exist once their games do
+        for player_id, game in enumerate(self.games):
+            game.screen.opponents = {
+                opponent_id: opponent.player
+                for opponent_id, opponent in enumerate(self.games)
+                if opponent_id != player_id
+            }
+        self.garbage_router = GarbageRouter([game.player for game in self.games])
+
+    def _player_changed(self, player_id: int):
+        """
+        Asks for the screens of a player's opponents to be drawn, as they show its board
+        Their render schedulers draw them once per frame at most, however many actions the player made in it
+        """
+        for opponent_id in range(self.players_count):
+            if opponent_id != player_id:
+                self.games[opponent_id].request_render()
+
+    def player_lost(self, player_id: int) -> Optional[bool]:
+        """
+        Ends the game of a player that lost or left, deciding the winner once a single player is left
+        :return: The victory to display to the player
+        """
+        self.garbage_router.eliminate(player_id)
+        victories = game_over_victories(self.players_count, self.finished_players, player_id)
+        self.victories.update(victories)
+        for decided_player_id in victories:
+            self._decided[decided_player_id].set()
+        return victories[player_id]
+
+    async def _wait_decided(self, player_id: int) -> Optional[bool]:
+        await self._decided[player_id].wait()
+        return self.victories[player_id]
+
+    async def play(self, player_id: int) -> bool:
+        """
+        Plays the game of a member, until it chooses to restart or quit
+        :return: Whether the member asked to restart
+        """
+        try:
+            return await self.sessions[player_id].play_game(
+                self.games[player_id],
+                self.render_schedulers[player_id],
+                decided=partial(self._wait_decided, player_id),
+                lost=partial(self.player_lost, player_id),
+            )
+        finally:
+            if player_id not in self.victories:  # Left before the game was decided
+                self.player_lost(player_id)
+
+
+class Matchmaker:
+    """
+    This pairs waiting sessions into rooms, as soon as a room is full,
+    or MATCH_WAIT_TIMEOUT after at least two of them are waiting
+    """
+
+    def __init__(self, room_size: int = MATCH_SIZE, wait_timeout: float = MATCH_WAIT_TIMEOUT):
+        """
+        :param room_size: The most players in a room, at least 2
+        :param wait_timeout: How long to wait for more players before opening a room that isn't full
+        """
+        self.room_size = room_size
+        self.wait_timeout = wait_timeout
+        self.waiting = []  # type: List[Tuple[ServerInstance, asyncio.Future]]
+        self.rooms_opened = 0
+        self._timer = None  # type: Optional[asyncio.TimerHandle]
+
+    async def join(self, session: "ServerInstance") -> Tuple[Room, int]:
+        """
+        Waits for a room for the session
+        :return: The room, and the player id of the session in it
+        """
+        room_future = asyncio.get_running_loop().create_future()
+        self.waiting.append((session, room_future))
+        self._waiting_changed()
+        try:
+            return await room_future
+        except asyncio.CancelledError:
+            if (session, room_future) in self.waiting:
+                self.waiting.remove((session, room_future))
+                self._waiting_changed()
+            elif room_future.done() and not room_future.cancelled():
+                room, player_id = room_future.result()
+                room.player_lost(player_id)  # Got a room, but left before playing
+            raise
+
+    def _drop_left(self):
+        """
+        Drops the sessions that left while waiting. Cancelling a join cancels its future right away, but the session
+        only leaves the waiting list once its join resumes, and other joins or the wait timer may run in between
+        """
+        self.waiting = [(session, room_future) for session, room_future in self.waiting if not room_future.done()]
+
+    def _waiting_changed(self):
+        self._drop_left()
+        if len(self.waiting) >= self.room_size:
+            self._open_room()
+        elif len(self.waiting) >= 2 and self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.wait_timeout, self._open_room)
+        elif len(self.waiting) < 2 and self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        for session, _ in self.waiting:
+            session.show_waiting(len(self.waiting), self.room_size)
+
+    def _open_room(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        self._drop_left()
+        if len(self.waiting) < 2:  # Not enough players are left to play a match
+            self._waiting_changed()
+            return
+        members, self.waiting = self.waiting[: self.room_size], self.waiting[self.room_size:]
+        room = Room([session for session, _ in members])
+        self.rooms_opened += 1
+        log.info("Opening room %d with %d players", self.rooms_opened, len(members))
+        for player_id, (_, room_future) in enumerate(members):
+            room_future.set_result((room, player_id))
+        self._waiting_changed()
@@ -1,36 +1,510 @@
 """
 This is the module that implements the online serving of the app.
+Every telnet connection is a ServerInstance session, and all of them share one asyncio loop.
+Sessions start in a lobby, from which they play single player games, online matches against other sessions,
+or watch the games of other sessions.
+Games run the same GameLazyClass logic as local games, drawn as ANSI to the client's terminal.
+Matches and spectators only see the sessions of their own server, so with several worker processes, sessions choosing
+them are handed to a single match worker, see the handoff module.
 """
+import asyncio
+import itertools
 import socket
-import threading
-from typing import Optional, Tuple
+from typing import Awaitable, Callable, List, Optional, Set
 
-from server.server_consts import TELNET_PORT, MAX_CONNECTIONS
+import player.exceptions
+from game.game import GameLazyClass, game_over_player_key_hook, player_key_hook
+from game.game_consts import DEFAULT_KEYMAP, GAME_OVER_TIMEOUT, QUIT, RESTART
+from game.key_reader import KeyReader
+from mytyping import Keymap
+from screen.render_scheduler import RenderScheduler
+from screen.renderers import AnsiRenderer
+from screen.screen_utils import prettify_key
+from screen.views.app_views import LobbyScreen
+from screen.screen_consts import (
+    ANSI_CLEAR,
+    ANSI_CURSOR_POSITION,
+    ANSI_HIDE_CURSOR,
+    ANSI_RESET,
+    ANSI_SHOW_CURSOR,
+)
+from server.handoff import HandedOffSession, receive_sessions, send_session
+from server.match import Matchmaker
+from server.server_consts import (
+    ESCAPE_TIMEOUT,
+    HANDOFF_FAILED_TEXT,
+    HANDOFF_MODES,
+    LISTEN_BACKLOG,
+    LOBBY_KEYMAP,
+    LOBBY_TEXT,
+    MATCH_SIZE,
+    MAX_CONNECTIONS,
+    NEGOTIATION_TIMEOUT,
+    NEXT_GAME,
+    NO_GAMES_TEXT,
+    ONLINE_MATCH,
+    READ_SIZE,
+    SERVER_FULL_TEXT,
+    SINGLE_PLAYER,
+    TELNET_NEGOTIATION,
+    TELNET_PORT,
+    WAITING_KEYMAP,
+    WAITING_TEXT,
+    WATCH,
+    WATCHING_KEYMAP,
+)
+from server.spectators import Broadcaster
+from server.telnet import TelnetDecoder, escape_iac
+from utils import log, run_until_first_done
 
+_session_ids = itertools.count()
 
-class ServerInstance(threading.Thread):
-    def __init__(self, socket_address_tuple: Tuple[socket.socket, Tuple[int, int]]):
-        super(ServerInstance, self).__init__()
-        self.socket = socket_address_tuple[0]
-        self.address = socket_address_tuple[1]
 
-    def run(self):
-        print('{} connected.'.format(self.address))
+class ServerInstance:
+    """
+    This is a telnet session, playing games for one connection until it quits or disconnects
+    """
+
+    def __init__(
+            self,
+            reader: asyncio.StreamReader,
+            writer: asyncio.StreamWriter,
+            matchmaker: Matchmaker,
+            sessions: Optional[Set["ServerInstance"]] = None,
+            keymap: Keymap = DEFAULT_KEYMAP,
+            handoff_link: Optional[socket.socket] = None,
+            handed_off: Optional[HandedOffSession] = None,
+    ):
+        """
+        :param matchmaker: Pairs the session with others for online matches
+        :param sessions: The live sessions of the server, whose games can be watched
+        :param handoff_link: If given, choosing one of HANDOFF_MODES hands the session over to the match worker
+            through it, instead of serving it here
+        :param handed_off: If the session was handed over by another worker, what it knew of the client
+        """
+        self.reader = reader
+        self.writer = writer
+        self.address = writer.get_extra_info("peername")
+        self.session_id = next(_session_ids)
+        self.matchmaker = matchmaker
+        self.sessions = sessions if sessions is not None else set()
+        self.keymap = keymap
+        self.playing = False
+        self.renderer = AnsiRenderer(write=self._write)
+        self.broadcaster = Broadcaster(
+            keyframe=lambda: escape_iac(self.renderer.keyframe())
+        )
+        self.lobby_screen = LobbyScreen(self.renderer)
+        self.decoder = TelnetDecoder(on_resize=self._on_resize, reply=self.writer.write)
+        self.key_reader = None  # type: Optional[KeyReader]
+        self._pending_keys = []  # type: List[int]
+        self._window_size_known = asyncio.Event()
+        self.handoff_link = handoff_link
+        self.handed_off = handed_off is not None
+        self._first_mode = None  # type: Optional[str]
+        if handed_off is not None:
+            self._first_mode = handed_off.mode
+            if handed_off.window_size is not None:
+                self._on_resize(*handed_off.window_size)
+            self._pending_keys = list(handed_off.keys)
+            self._dispatch_keys(self.decoder.feed(handed_off.data))
+
+    def _write(self, data: bytes):
+        data = escape_iac(data)
+        self.writer.write(data)
+        self.broadcaster.publish(data)
+
+    def _on_resize(self, rows: int, cols: int):
+        self.renderer.resize(rows, cols)
+        self._window_size_known.set()
+
+    async def run(self):
+        """
+        Serves the connection until the player quits or the client disconnects
+        """
+        log.info("%s connected", self.address)
+        # The client of a session handed over already agreed to the options
+        negotiation = b"" if self.handed_off else TELNET_NEGOTIATION
+        self.writer.write(negotiation + (ANSI_HIDE_CURSOR + ANSI_CLEAR).encode())
+        tasks = [asyncio.ensure_future(self._read_keys()), asyncio.ensure_future(self._play())]
+        handoff_mode = None
+        try:
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if not task.cancelled() and task.exception() is not None:
+                    log.error("Session %s crashed", self.address, exc_info=task.exception())
+                elif task is tasks[1] and not task.cancelled():
+                    handoff_mode = task.result()
+        finally:
+            for task in tasks:
+                task.cancel()
+            self.broadcaster.close()
+            if handoff_mode is not None:
+                await asyncio.wait(tasks)  # Nothing reads from the connection anymore
+                await self._hand_off(handoff_mode)
+            else:
+                await self._close()
+                log.info("%s disconnected", self.address)
+
+    async def _read_keys(self):
+        """
+        Dispatches the keys the client types, and an ESC that nothing followed within ESCAPE_TIMEOUT as a key of its own
+        """
+        read = None  # type: Optional[asyncio.Future]
+        try:
+            while True:
+                if read is None:
+                    read = asyncio.ensure_future(self.reader.read(READ_SIZE))
+                # The read is kept across timeouts rather than cancelled, so that no data is lost
+                done, _ = await asyncio.wait([read], timeout=ESCAPE_TIMEOUT if self.decoder.pending_escape else None)
+                if not done:
+                    self._dispatch_keys(self.decoder.flush())
+                    continue
+                try:
+                    data = read.result()
+                except ConnectionError:
+                    return
+                read = None
+                if not data:
+                    return
+                self._dispatch_keys(self.decoder.feed(data))
+        finally:
+            if read is not None and read.done() and not read.cancelled() and read.exception() is None:
+                self._dispatch_keys(self.decoder.feed(read.result()))  # Read, but cancelled before it was decoded
+            elif read is not None:
+                read.cancel()
+
+    def _dispatch_keys(self, keys: List[int]):
+        for key in keys:
+            if self.key_reader is not None:
+                self.key_reader.dispatch(key)
+            else:
+                self._pending_keys.append(key)
+
+    def _listen(self, keymap: Keymap) -> KeyReader:
+        """
+        Starts reading the keys of a keymap, including the ones typed since the last reader stopped,
+        e.g. a lobby choice sent along with the window size
+        """
+        self.key_reader = KeyReader(None, [keymap])
+        for key in self._pending_keys:
+            self.key_reader.dispatch(key)
+        self._pending_keys = []
+        return self.key_reader
+
+    async def _next_action(self, keymap: Keymap) -> str:
+        """
+        Waits for a key of a keymap
+        :return: The action of the key
+        """
+        try:
+            return await self._listen(keymap).queues[0].get()
+        finally:
+            self.key_reader = None
+
+    def _show_text(self, text: str):
+        self.lobby_screen.print_screen(wrap_screen=True, text=text.splitlines())
+
+    async def _play(self) -> Optional[str]:
+        """
+        Serves the lobby and the games chosen from it, until the player quits
+        :return: The mode chosen, if the session has to be handed over to the match worker for it
+        """
+        try:
+            await asyncio.wait_for(self._window_size_known.wait(), NEGOTIATION_TIMEOUT)
+        except asyncio.TimeoutError:
+            log.info("%s did not report its window size", self.address)
         while True:
-            data = self.socket.recv(1024)
-            print(data)
+            mode, self._first_mode = self._first_mode, None
+            if mode is None:
+                self.renderer.clear()
+                self._show_text(
+                    LOBBY_TEXT.format(
+                        single=prettify_key(LOBBY_KEYMAP[SINGLE_PLAYER]),
+                        match=prettify_key(LOBBY_KEYMAP[ONLINE_MATCH]),
+                        watch=prettify_key(LOBBY_KEYMAP[WATCH]),
+                        quit=prettify_key(LOBBY_KEYMAP[QUIT]),
+                    )
+                )
+                mode = await self._next_action(LOBBY_KEYMAP)
+            if mode == QUIT:
+                return None
+            if mode in HANDOFF_MODES and self.handoff_link is not None:
+                return mode
+            if mode == WATCH:
+                await self._watch()
+                continue
+            should_restart = True
+            while should_restart:
+                if mode == SINGLE_PLAYER:
+                    should_restart = await self._play_single_player()
+                else:
+                    should_restart = await self._play_match()
+
+    async def _play_single_player(self) -> bool:
+        render_scheduler = RenderScheduler(update=self.renderer.update)
+        game_lazy_class = GameLazyClass(
+            stdscr=self.renderer, keymap=self.keymap, render_scheduler=render_scheduler
+        )
+        return await self.play_game(game_lazy_class, render_scheduler)
+
+    def _next_watched(self, watched: Optional["ServerInstance"]) -> Optional["ServerInstance"]:
+        """
+        :param watched: The session watched so far, if any
+        :return: The next session playing a game, by connection order, or None if no session is
+        """
+        playing = sorted(
+            (session for session in self.sessions if session.playing and session is not self),
+            key=lambda session: session.session_id,
+        )
+        if not playing:
+            return None
+        if watched is not None:
+            for session in playing:
+                if session.session_id > watched.session_id:
+                    return session
+        return playing[0]
+
+    async def _watch(self):
+        """
+        Watches the games of other sessions, until the spectator goes back to the lobby
+        """
+        watched = None
+        while True:
+            watched = self._next_watched(watched)
+            if watched is None:
+                self.renderer.clear()
+                self._show_text(
+                    NO_GAMES_TEXT.format(
+                        next=prettify_key(WATCHING_KEYMAP[NEXT_GAME]),
+                        quit=prettify_key(WATCHING_KEYMAP[QUIT]),
+                    )
+                )
+                if await self._next_action(WATCHING_KEYMAP) == QUIT:
+                    return
+                continue
+            watcher = watched.broadcaster.attach(self.writer)
+            try:
+                action = await run_until_first_done(
+                    self._next_action(WATCHING_KEYMAP), watcher.detached.wait()
+                )
+            finally:
+                watched.broadcaster.detach(watcher)
+            if action == QUIT:
+                return
+
+    def show_waiting(self, waiting: int, room_size: int):
+        """
+        Shows how many players are waiting for a match, called by the matchmaker
+        """
+        self._show_text(
+            WAITING_TEXT.format(
+                waiting=waiting, room_size=room_size, quit=prettify_key(WAITING_KEYMAP[QUIT])
+            )
+        )
+
+    async def _play_match(self) -> bool:
+        """
+        Waits for a room, and plays its match
+        :return: Whether the player asked to play another match, False if it left the waiting room
+        """
+        self.renderer.clear()
+        joined = await run_until_first_done(
+            self.matchmaker.join(self), self._next_action(WAITING_KEYMAP)
+        )
+        if joined == QUIT:
+            return False
+        room, player_id = joined
+        return await room.play(player_id)
+
+    async def play_game(
+            self,
+            game_lazy_class: GameLazyClass,
+            render_scheduler: RenderScheduler,
+            decided: Optional[Callable[[], Awaitable[Optional[bool]]]] = None,
+            lost: Optional[Callable[[], Optional[bool]]] = None,
+    ) -> bool:
+        """
+        Plays a single game, from the countdown to the game over screen
+        :param game_lazy_class: The game, drawing to the session's renderer
+        :param render_scheduler: The scheduler of the game's screen
+        :param decided: In a match, waits until the game is over for another reason than this player losing,
+            e.g. every opponent lost, and returns the victory to display
+        :param lost: In a match, called when this player lost, returns the victory to display
+        :return: Whether the player asked to restart
+        """
+        self.renderer.clear()
+        render_loop = asyncio.ensure_future(render_scheduler.run())
+        self.playing = True
+        try:
+            try:
+                await game_lazy_class.start_countdown()
+                self._listen(self.keymap)
+                game = [
+                    game_lazy_class.cycle(),
+                    player_key_hook(game_lazy_class, self.key_reader.queues[0]),
+                ]
+                if decided is not None:
+                    game.append(decided())
+                victory = await run_until_first_done(*game)
+            except player.exceptions.GameOverException:
+                victory = lost() if lost is not None else None
+            self.key_reader = None
+            await game_lazy_class.game_over(victory=victory)
+            await asyncio.sleep(GAME_OVER_TIMEOUT)
+            self._pending_keys = []  # Keys typed during the game over timeout are not choices
+            self._listen({QUIT: self.keymap[QUIT], RESTART: self.keymap[RESTART]})
+            await game_over_player_key_hook(game_lazy_class, self.key_reader.queues[0])
+        except player.exceptions.EndGameException as e:
+            return e.should_restart
+        finally:
+            self.playing = False
+            self.key_reader = None
+            render_loop.cancel()
+        return False
+
+    async def _hand_off(self, mode: str):
+        """
+        Hands the connection over to the match worker, with the keys typed ahead. The session ends here, without
+        closing the connection
+        """
+        transport = self.writer.transport
+        transport.pause_reading()
+        self.reader.feed_eof()  # So that only what was already received is read
+        self._dispatch_keys(self.decoder.feed(await self.reader.read()))
+        # Everything written so far is sent before the match worker writes anything
+        transport.set_write_buffer_limits(high=0)
+        try:
+            await self.writer.drain()
+            send_session(
+                self.handoff_link,
+                HandedOffSession(
+                    sock=self.writer.get_extra_info("socket"),
+                    mode=mode,
+                    window_size=self.decoder.window_size,
+                    keys=self._pending_keys,
+                    data=self.decoder.take_pending(),
+                ),
+            )
+        except (ConnectionError, OSError):
+            log.warning("Could not hand %s over to the match worker", self.address, exc_info=True)
+            self.writer.write(HANDOFF_FAILED_TEXT.encode())
+            await self._close()
+            return
+        log.info("%s handed over to the match worker", self.address)
+        transport.abort()  # Closes this worker's copy of the socket, the connection goes on in the match worker
+
+    async def _close(self):
+        try:
+            self.writer.write(
+                (
+                    ANSI_RESET
+                    + ANSI_SHOW_CURSOR
+                    + ANSI_CLEAR
+                    + ANSI_CURSOR_POSITION.format(row=1, col=1)
+                ).encode()
+            )
+            self.writer.close()
+            await self.writer.wait_closed()
+        except (ConnectionError, OSError):
+            pass
+
+
+class GameServer:
+    """
+    This is the telnet server, running a ServerInstance per connection
+    """
+
+    def __init__(
+            self,
+            max_connections: int = MAX_CONNECTIONS,
+            match_size: int = MATCH_SIZE,
+            handoff_link: Optional[socket.socket] = None,
+            adopt_link: Optional[socket.socket] = None,
+    ):
+        """
+        :param max_connections: How many sessions to serve at once, the next connections are turned away
+        :param match_size: The most players in an online match
+        :param handoff_link: The sending end of a handoff link, if another server serves the matches and spectators
+        :param adopt_link: The receiving end of a handoff link, if this server serves the other servers' matches and
+            spectators
+        """
+        self.max_connections = max_connections
+        self.matchmaker = Matchmaker(room_size=match_size)
+        self.sessions = set()  # type: Set[ServerInstance]
+        self.handoff_link = handoff_link
+        self.adopt_link = adopt_link
+        self._adoptions = set()  # type: Set[asyncio.Future]
+
+    async def handle_connection(
+            self,
+            reader: asyncio.StreamReader,
+            writer: asyncio.StreamWriter,
+            handed_off: Optional[HandedOffSession] = None,
+    ):
+        if len(self.sessions) >= self.max_connections:
+            log.warning("Turning away %s, the server is full", writer.get_extra_info("peername"))
+            writer.write(SERVER_FULL_TEXT.encode())
+            writer.close()
+            return
+        session = ServerInstance(
+            reader, writer, self.matchmaker, self.sessions, handoff_link=self.handoff_link, handed_off=handed_off
+        )
+        self.sessions.add(session)
+        try:
+            await session.run()
+        finally:
+            self.sessions.discard(session)
+
+    async def start(self, host: str = "", port: int = TELNET_PORT, **kwargs):
+        """
+        Starts listening, the connections are served once the loop runs
+        :param host: The address to bind, all interfaces if empty. Ignored if a listening sock is given
+        :param port: The port to bind, 0 picks a free one. Ignored if a listening sock is given
+        :param kwargs: Keyword arguments to be passed onwards to asyncio.start_server, e.g. sock or reuse_port
+        :return: The asyncio server
+        """
+        if kwargs.get("sock") is None:
+            kwargs.update(host=host, port=port, backlog=LISTEN_BACKLOG)
+        if self.adopt_link is not None:
+            asyncio.get_running_loop().add_reader(self.adopt_link.fileno(), self._adopt_sessions)
+        return await asyncio.start_server(self.handle_connection, **kwargs)
+
+    def _adopt_sessions(self):
+        for handed_off in receive_sessions(self.adopt_link):
+            adoption = asyncio.ensure_future(self._adopt(handed_off))
+            self._adoptions.add(adoption)  # The loop only keeps weak references to tasks
+            adoption.add_done_callback(self._adoptions.discard)
+
+    async def _adopt(self, handed_off: HandedOffSession):
+        reader, writer = await asyncio.open_connection(sock=handed_off.sock)
+        await self.handle_connection(reader, writer, handed_off=handed_off)
+
+
+async def serve_forever(
+        host: str,
+        port: int,
+        handoff_link: Optional[socket.socket] = None,
+        adopt_link: Optional[socket.socket] = None,
+        **kwargs
+):
+    """
+    Runs a GameServer until cancelled
+    :param handoff_link: See GameServer
+    :param adopt_link: See GameServer
+    :param kwargs: Keyword arguments to be passed onwards to GameServer.start
+    """
+    server = await GameServer(handoff_link=handoff_link, adopt_link=adopt_link).start(host=host, port=port, **kwargs)
+    log.info("Serving on %s", [sock.getsockname() for sock in server.sockets])
+    async with server:
+        await server.serve_forever()
 
 
 def run_server(port: Optional[int] = None, debug: Optional[bool] = False):
-    s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
     host = "127.0.0.1" if debug else ""
     if port is None:
         port = TELNET_PORT
-    s.bind((host, port))
-    s.listen(MAX_CONNECTIONS)
-
-    while True:
-        ServerInstance(s.accept()).start()
+    asyncio.run(serve_forever(host=host, port=int(port)))
 
 
 if __name__ == '__main__':
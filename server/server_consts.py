@@ -1,2 +1,94 @@
+"""
+Here are consts relating to the operation of the server module
+"""
+from game.game_consts import KEY_DOWN, KEY_LEFT, KEY_RIGHT, KEY_UP, QUIT, quit_key
+from player.player_consts import HEIGHT
+
 TELNET_PORT = 23
-MAX_CONNECTIONS = 20
+MAX_CONNECTIONS = 1024  # Sessions served at once by a single process, the next ones are turned away
+LISTEN_BACKLOG = MAX_CONNECTIONS  # So that a burst of connections is not reset by a full accept queue
+NEGOTIATION_TIMEOUT = 0.5  # How long to wait for the client's window size before drawing anything
+READ_SIZE = 1024
+WORKER_RESTART_DELAY = 1.0  # The least time between two starts of the same worker process, against crash loops
+
+# Telnet protocol (RFC 854), options and commands
+IAC = 255
+DONT = 254
+DO = 253
+WONT = 252
+WILL = 251
+SB = 250
+SE = 240
+NUL = 0
+LF = 10
+ECHO = 1
+SGA = 3  # Suppress go ahead
+NAWS = 31  # Negotiate about window size (RFC 1073)
+# Character mode: the server echoes (and then doesn't), and nobody waits for go aheads. Also asks for the window size
+TELNET_NEGOTIATION = bytes([IAC, WILL, ECHO, IAC, WILL, SGA, IAC, DO, SGA, IAC, DO, NAWS])
+SERVER_OPTIONS = {ECHO, SGA}  # Options the server agrees to do, other DO requests are refused with WONT
+CLIENT_OPTIONS = {SGA, NAWS}  # Options the server lets the client do, other WILL requests are refused with DONT
+
+# Keys sent by ANSI / VT100 terminals
+ESC = 27
+ESCAPE_TIMEOUT = 0.1  # How long a lone ESC waits for the rest of an escape sequence, before it is a key of its own
+ESCAPE_SEQUENCES = {
+    b"\x1b[A": KEY_UP,
+    b"\x1b[B": KEY_DOWN,
+    b"\x1b[C": KEY_RIGHT,
+    b"\x1b[D": KEY_LEFT,
+    b"\x1bOA": KEY_UP,  # Application cursor mode
+    b"\x1bOB": KEY_DOWN,
+    b"\x1bOC": KEY_RIGHT,
+    b"\x1bOD": KEY_LEFT,
+}
+SERVER_FULL_TEXT = "The server is full, try again later\r\n"
+
+# Lobby and matches
+SINGLE_PLAYER = "single player"
+ONLINE_MATCH = "online match"
+WATCH = "watch"
+NEXT_GAME = "next game"
+LOBBY_KEYMAP = {
+    SINGLE_PLAYER: ord("s"),
+    ONLINE_MATCH: ord("m"),
+    WATCH: ord("w"),
+    QUIT: quit_key,
+}
+WAITING_KEYMAP = {QUIT: quit_key}
+WATCHING_KEYMAP = {NEXT_GAME: ord("n"), QUIT: quit_key}
+LOBBY_TEXT = (
+    "Press {single} to play alone\nPress {match} to play against other players\n"
+    "Press {watch} to watch a game\nPress {quit} to quit"
+)
+NO_GAMES_TEXT = "No games to watch right now\nPress {next} to look again\nPress {quit} to go back"
+WAITING_TEXT = "Waiting for players... {waiting}/{room_size}\nPress {quit} to go back"
+MATCH_SIZE = 3  # The most players in a room, three boards fit in an 80 columns terminal
+MATCH_WAIT_TIMEOUT = 10.0  # How long at least two waiting players wait for more before their match starts
+
+# Handing sessions over to the match worker, see the handoff module
+MATCH_WORKER = 0  # The worker serving every online match and spectator, when there are several workers
+HANDOFF_MODES = [ONLINE_MATCH, WATCH]  # The lobby choices served by the match worker
+HANDOFF_HEADER_FORMAT = "<BHHH"  # Mode index in HANDOFF_MODES, window rows and cols (0 if unknown), keys count
+HANDOFF_KEY_FORMAT = "<H"  # The keys typed ahead follow the header, then the bytes not decoded yet
+HANDOFF_MESSAGE_SIZE = 64 * 1024  # The most bytes of a handoff message, typed ahead bytes past it are dropped
+HANDOFF_FAILED_TEXT = "Online games are unavailable right now, try again later\r\n"
+
+# Spectators
+SPECTATOR_BUFFER_LIMIT = 64 * 1024  # Unsent bytes a spectator may lag behind, before its frames are dropped
+SPECTATOR_RESUME_SIZE = 4 * 1024  # Unsent bytes below which a lagging spectator is sent a keyframe and resumes
+
+# Board streams, the binary protocol of boards for clients drawing boards on their own, see the board_stream module
+BOARD_PACKET_HEADER_FORMAT = "<BBI"  # Packet type, player id, sequence number
+BOARD_PIECE_FORMAT = "<BBbb"  # Piece id, rotation state, bounding box x, bounding box y
+BOARD_SNAPSHOT_FORMAT = "<I{rows}H{piece}".format(rows=HEIGHT, piece=BOARD_PIECE_FORMAT[1:])  # Score, rows, piece
+BOARD_CLEAR_FORMAT = "<II"  # Bitmask of the cleared row indices, score
+BOARD_GARBAGE_FORMAT = "<B"  # Rows count, followed by that many BOARD_GARBAGE_ROW_FORMAT rows, bottom first
+BOARD_GARBAGE_ROW_FORMAT = "<H"
+SNAPSHOT_PACKET = 0  # The whole state, sent on join and on resync
+MOVE_PACKET = 1  # The active piece moved, rotated or spawned
+LOCK_PACKET = 2  # A piece locked to the board
+CLEAR_PACKET = 3  # Full rows were cleared
+GARBAGE_PACKET = 4  # Rows were pushed in from the bottom
+NO_PIECE = 255
+BOARD_REORDER_WINDOW = 64  # How many packets a client keeps while waiting for a missing one, before it resyncs
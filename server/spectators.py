@@ -0,0 +1,105 @@
+"""
+This is the spectators module, letting telnet sessions watch the games of other sessions, read-only.
+Every session has a Broadcaster. The frames of the session's renderer are already ANSI bytes, so they are encoded
+once, by the session itself, and the broadcaster only fans them out. Fanning out is deferred to its own loop
+callback, so a frame costs the watched game the same whether 0 or 1000 spectators watch it.
+Spectators that don't read fast enough never stall anyone: once too many of their bytes are unsent, their frames are
+dropped, and when they catch up they get a keyframe of the current screen instead of the stale frames.
+"""
+import asyncio
+from typing import Callable
+
+from server.server_consts import SPECTATOR_BUFFER_LIMIT, SPECTATOR_RESUME_SIZE
+
+
+class Watcher:
+    """
+    This is a spectator's connection to a broadcaster
+    """
+
+    def __init__(self, writer: asyncio.StreamWriter):
+        self.writer = writer
+        self.lagging = False
+        self.frames_dropped = 0
+        self.detached = asyncio.Event()  # Set once the watched session ended
+
+
+class Broadcaster:
+    """
+    This fans the frames of a session out to the watchers attached to it
+    """
+
+    def __init__(
+            self,
+            keyframe: Callable[[], bytes],
+            buffer_limit: int = SPECTATOR_BUFFER_LIMIT,
+            resume_size: int = SPECTATOR_RESUME_SIZE,
+    ):
+        """
+        :param keyframe: Returns the bytes that draw the session's screen from scratch
+        :param buffer_limit: Unsent bytes a watcher may lag behind, before its frames are dropped
+        :param resume_size: Unsent bytes below which a lagging watcher is sent a keyframe and resumes
+        """
+        self.keyframe = keyframe
+        self.buffer_limit = buffer_limit
+        self.resume_size = resume_size
+        self.watchers = []  # type: list[Watcher]
+        self.frames_published = 0
+        self._pending = []  # type: list[bytes]
+        self._flush_handle = None  # type: asyncio.Handle | None
+
+    def attach(self, writer: asyncio.StreamWriter) -> Watcher:
+        """
+        Starts sending the session's frames to a spectator, starting with a keyframe
+        """
+        watcher = Watcher(writer)
+        writer.write(self.keyframe())
+        self.watchers.append(watcher)
+        return watcher
+
+    def detach(self, watcher: Watcher):
+        if watcher in self.watchers:
+            self.watchers.remove(watcher)
+
+    def publish(self, frame: bytes):
+        """
+        Queues a frame of the session to all watchers, they are sent once the current loop callback is done
+        """
+        if not self.watchers:
+            return
+        self.frames_published += 1
+        self._pending.append(frame)
+        if self._flush_handle is None:
+            self._flush_handle = asyncio.get_running_loop().call_soon(self._flush)
+
+    def _flush(self):
+        self._flush_handle = None
+        data = b"".join(self._pending)
+        self._pending = []
+        for watcher in list(self.watchers):
+            self._send(watcher, data)
+
+    def _send(self, watcher: Watcher, data: bytes):
+        if watcher.writer.is_closing():
+            self.detach(watcher)
+            return
+        unsent = watcher.writer.transport.get_write_buffer_size()
+        if watcher.lagging and unsent <= self.resume_size:
+            watcher.lagging = False
+            watcher.writer.write(self.keyframe())  # Includes this frame
+        elif watcher.lagging or unsent > self.buffer_limit:
+            watcher.lagging = True
+            watcher.frames_dropped += 1
+        else:
+            watcher.writer.write(data)
+
+    def close(self):
+        """
+        Detaches every watcher, as the session ended
+        """
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        for watcher in self.watchers:
+            watcher.detached.set()
+        self.watchers = []
@@ -0,0 +1,169 @@
+"""
+This is the telnet module, decoding what telnet clients send into key codes.
+It strips the option negotiation out of the stream, refusing the options the server doesn't support (RFC 855),
+tracks the window size the client reports with NAWS,
+and turns the terminal's escape sequences into the same key codes curses' getch() would return.
+"""
+from typing import Callable, List, Optional, Tuple
+
+from server.server_consts import (
+    CLIENT_OPTIONS,
+    DO,
+    DONT,
+    ESC,
+    ESCAPE_SEQUENCES,
+    IAC,
+    LF,
+    NAWS,
+    NUL,
+    SB,
+    SE,
+    SERVER_OPTIONS,
+    WILL,
+    WONT,
+)
+
+
+def escape_iac(data: bytes) -> bytes:
+    """
+    Escapes the data bytes that telnet would read as the start of a command
+    """
+    return data.replace(bytes([IAC]), bytes([IAC, IAC]))
+
+
+class TelnetDecoder:
+    """
+    This decodes a telnet client's byte stream, one chunk at a time.
+    Sequences split between chunks are kept until the rest of them arrives, see flush() for a lone ESC.
+    """
+
+    def __init__(
+            self,
+            on_resize: Optional[Callable[[int, int], None]] = None,
+            reply: Optional[Callable[[bytes], None]] = None,
+    ):
+        """
+        :param on_resize: Called with (rows, cols) whenever the client reports its window size
+        :param reply: Called with the commands to send back to the client, refusing the options it asks for
+        """
+        self.on_resize = on_resize
+        self.reply = reply
+        self.window_size = None  # type: Optional[Tuple[int, int]]
+        self._pending = b""
+
+    def feed(self, data: bytes) -> List[int]:
+        """
+        Decodes a chunk of the stream
+        :param data: The bytes received
+        :return: The key codes typed, in order
+        """
+        buffer = self._pending + data
+        keys = []
+        i = 0
+        while i < len(buffer):
+            byte = buffer[i]
+            if byte == IAC:
+                consumed = self._command(buffer, i)
+                if consumed is None:
+                    break
+                if consumed == 2 and buffer[i + 1] == IAC:
+                    keys.append(IAC)  # An escaped data byte
+                i += consumed
+            elif byte == ESC:
+                consumed, key = self._escape_sequence(buffer, i)
+                if consumed is None:
+                    break
+                keys.append(key)
+                i += consumed
+            else:
+                if byte not in (NUL, LF):  # Telnet sends return as CR NUL or CR LF
+                    keys.append(byte)
+                i += 1
+        self._pending = buffer[i:]
+        return keys
+
+    @property
+    def pending_escape(self) -> bool:
+        """
+        Whether the stream ends with an ESC that may be the start of an escape sequence
+        """
+        return self._pending[:1] == bytes([ESC])
+
+    def take_pending(self) -> bytes:
+        """
+        :return: The bytes kept for the rest of a sequence, which are then forgotten, e.g. to feed another decoder
+        """
+        pending, self._pending = self._pending, b""
+        return pending
+
+    def flush(self) -> List[int]:
+        """
+        Stops waiting for the rest of a pending escape sequence, for when nothing came after it for a while
+        :return: The key codes typed, starting with ESC, or nothing if no escape sequence is pending
+        """
+        if not self.pending_escape:
+            return []
+        buffer = self._pending
+        self._pending = b""
+        return [ESC] + self.feed(buffer[1:])
+
+    def _command(self, buffer: bytes, start: int) -> Optional[int]:
+        """
+        :return: The length of the command at start, or None if it isn't all there yet
+        """
+        if start + 1 >= len(buffer):
+            return None
+        command = buffer[start + 1]
+        if command in (WILL, WONT, DO, DONT):
+            if start + 2 >= len(buffer):
+                return None
+            self._negotiate(command, buffer[start + 2])
+            return 3
+        if command != SB:
+            return 2
+        # Subnegotiation data runs until IAC SE, with IAC bytes in it doubled
+        data = bytearray()
+        i = start + 2
+        while i + 1 < len(buffer):
+            if buffer[i] == IAC:
+                if buffer[i + 1] == SE:
+                    self._subnegotiation(bytes(data))
+                    return i + 2 - start
+                i += 1  # IAC IAC
+            data.append(buffer[i])
+            i += 1
+        return None
+
+    def _negotiate(self, command: int, option: int):
+        """
+        Refuses the options the client asks to enable that aren't supported, the supported ones are already agreed
+        to by the server's TELNET_NEGOTIATION, and acknowledging them again would loop
+        """
+        if self.reply is None:
+            return
+        if command == WILL and option not in CLIENT_OPTIONS:
+            self.reply(bytes([IAC, DONT, option]))
+        elif command == DO and option not in SERVER_OPTIONS:
+            self.reply(bytes([IAC, WONT, option]))
+
+    def _subnegotiation(self, data: bytes):
+        if len(data) >= 5 and data[0] == NAWS:
+            cols = (data[1] << 8) | data[2]
+            rows = (data[3] << 8) | data[4]
+            if rows and cols:
+                self.window_size = (rows, cols)
+                if self.on_resize is not None:
+                    self.on_resize(rows, cols)
+
+    @staticmethod
+    def _escape_sequence(buffer: bytes, start: int) -> Tuple[Optional[int], int]:
+        """
+        :return: (The length of the sequence at start, its key), with a None length if it might not be all there yet
+        """
+        rest = buffer[start:]
+        for sequence, key in ESCAPE_SEQUENCES.items():
+            if rest.startswith(sequence):
+                return len(sequence), key
+        if any(sequence.startswith(rest) for sequence in ESCAPE_SEQUENCES):
+            return None, ESC
+        return 1, ESC
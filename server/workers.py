@@ -0,0 +1,157 @@
+"""
+This is the workers module, sharding the telnet sessions of one server across processes.
+Game sessions are CPU bound Python, so a single process is limited to one core by the GIL.
+Instead, every worker process runs its own GameServer loop on the same listening port, and a supervisor
+restarts the workers that crash. The kernel spreads new connections between the workers:
+    With SO_REUSEPORT, every worker binds its own socket to the port, and the kernel balances between them
+    Without it, the supervisor binds the socket once, and hands it to every worker
+A worker only sees its own sessions, so one of them, MATCH_WORKER, serves every online match and spectator: the other
+workers hand it the sessions choosing those, through a link the supervisor keeps for restarted workers.
+Single player games are still served where they started, so spectators only see the ones played on the match
+worker. On platforms without socket.send_fds, nothing is handed over, and matches are only made within a worker.
+"""
+import asyncio
+import multiprocessing
+import multiprocessing.connection
+import socket
+import time
+from typing import Optional
+
+from server.handoff import handoff_links, handoff_supported
+from server.server import serve_forever
+from server.server_consts import LISTEN_BACKLOG, MATCH_WORKER, TELNET_PORT, WORKER_RESTART_DELAY
+from utils import log
+
+
+def serve_worker(
+        host: str,
+        port: int,
+        sock: Optional[socket.socket] = None,
+        handoff_link: Optional[socket.socket] = None,
+        adopt_link: Optional[socket.socket] = None,
+):
+    """
+    The main function of a worker process
+    :param host: The address to bind
+    :param port: The port to bind
+    :param sock: A listening socket to serve instead of binding one with SO_REUSEPORT
+    :param handoff_link: The link to hand matches and spectators over to the match worker, see GameServer
+    :param adopt_link: The link to adopt the other workers' matches and spectators from, for the match worker
+    """
+    links = dict(handoff_link=handoff_link, adopt_link=adopt_link)
+    try:
+        if sock is not None:
+            asyncio.run(serve_forever(host=host, port=port, sock=sock, **links))
+        else:
+            asyncio.run(serve_forever(host=host, port=port, reuse_port=True, **links))
+    except KeyboardInterrupt:
+        pass
+
+
+class WorkerSupervisor:
+    """
+    This starts the worker processes of a server, and keeps them running
+    """
+
+    def __init__(self, workers: int, host: str, port: int):
+        """
+        :param workers: The amount of worker processes
+        :param host: The address to bind, all interfaces if empty
+        :param port: The port to bind, 0 picks a free one
+        """
+        self.workers = workers
+        self.host = host
+        self.port = port
+        self.processes = []  # type: list[multiprocessing.Process]
+        self.restarts = 0
+        self._sock = None  # type: Optional[socket.socket]
+        self._handoff_links = None  # type: Optional[tuple[socket.socket, socket.socket]]
+        self._last_starts = []  # type: list[float]
+
+    def start(self):
+        """
+        Binds the port if needed, and starts every worker
+        """
+        if not hasattr(socket, "SO_REUSEPORT"):
+            self._sock = socket.create_server((self.host, self.port), backlog=LISTEN_BACKLOG)
+            self.port = self._sock.getsockname()[1]
+        elif self.port == 0:
+            # Every worker binds on its own, so they have to agree on a free port beforehand
+            with socket.socket() as probe:
+                probe.bind((self.host, 0))
+                self.port = probe.getsockname()[1]
+        if self.workers > 1 and handoff_supported():
+            self._handoff_links = handoff_links()
+        self.processes = [self._spawn(index) for index in range(self.workers)]
+        self._last_starts = [time.monotonic()] * self.workers
+        log.info("Started %d workers on port %d", self.workers, self.port)
+
+    def _spawn(self, index: int) -> multiprocessing.Process:
+        handoff_link = adopt_link = None
+        if self._handoff_links is not None and index == MATCH_WORKER:
+            adopt_link = self._handoff_links[1]
+        elif self._handoff_links is not None:
+            handoff_link = self._handoff_links[0]
+        process = multiprocessing.Process(
+            target=serve_worker, args=(self.host, self.port, self._sock, handoff_link, adopt_link), daemon=True
+        )
+        process.start()
+        return process
+
+    def restart_crashed(self, timeout: Optional[float] = None):
+        """
+        Waits for workers to exit, and restarts the ones that crashed
+        A worker that crashes right after starting is only restarted WORKER_RESTART_DELAY after its last start
+        :param timeout: How long to wait for a worker to exit, forever if None
+        """
+        exited = multiprocessing.connection.wait(
+            [process.sentinel for process in self.processes if process.is_alive()], timeout=timeout
+        )
+        for index, process in enumerate(self.processes):
+            if process.sentinel in exited:
+                process.join()  # The sentinel closes a moment before the process can be reaped
+            if process.is_alive() or process.exitcode == 0:
+                continue
+            log.error("Worker %d (pid %d) crashed with %s", index, process.pid, process.exitcode)
+            time.sleep(max(0.0, self._last_starts[index] + WORKER_RESTART_DELAY - time.monotonic()))
+            process.close()
+            self.processes[index] = self._spawn(index)
+            self._last_starts[index] = time.monotonic()
+            self.restarts += 1
+
+    def supervise(self):
+        """
+        Keeps the workers running, until interrupted
+        """
+        try:
+            while any(process.is_alive() for process in self.processes):
+                self.restart_crashed()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+
+    def stop(self):
+        for process in self.processes:
+            if process.is_alive():
+                process.terminate()
+            process.join()
+        if self._sock is not None:
+            self._sock.close()
+        for link in self._handoff_links or ():
+            link.close()
+
+
+def run_workers(workers: int, port: Optional[int] = None, debug: Optional[bool] = False):
+    """
+    Runs a server sharded across worker processes, like server.run_server
+    :param workers: The amount of worker processes, usually the amount of cores
+    :param port: The port to serve on
+    :param debug: Only serve on localhost
+    """
+    host = "127.0.0.1" if debug else ""
+    if port is None:
+        port = TELNET_PORT
+    supervisor = WorkerSupervisor(workers=workers, host=host, port=int(port))
+    supervisor.start()
+    supervisor.supervise()
@@ -9,3 +9,1040 @@ def func(x):
 
 def test_answer():
     assert func(3) == 4
+
+
+def _play_random_game(board_backend, seed, moves=400):
+    import random
+
+    from player.exceptions import GameOverException
+    from player.player import Player
+
+    rng = random.Random(seed)
+    game_player = Player(0, board_backend=board_backend, seed=seed)
+    game_player.spawn_first_piece()
+    actions = [
+        lambda: game_player.move_sideways(-1),
+        lambda: game_player.move_sideways(1),
+        lambda: game_player.rotate(clockwise_rotations=1),
+        lambda: game_player.cycle(),
+        lambda: game_player.cycle(hard_drop=True),
+        lambda: game_player.hold(),
+    ]
+    boards = []
+    try:
+        for _ in range(moves):
+            rng.choice(actions)()
+            boards.append(game_player.get_board_view())
+    except GameOverException:
+        pass
+    return boards, game_player.score
+
+
+def test_board_backends_match():
+    from player.player_consts import BITBOARD, NUMPY_BOARD
+
+    for seed in range(5):
+        assert _play_random_game(NUMPY_BOARD, seed) == _play_random_game(BITBOARD, seed)
+
+
+def test_board_backends_fit_like_placement_error():
+    from player.board import BOARD_BACKENDS, fitting_rows
+    from player.piece_tables import PIECE_ROTATIONS
+    from player.player_consts import FITTING_BB_X_OFFSET, I_BLOCK, T_BLOCK
+
+    row_masks = [0b1111011111, 0b0000010000] + [0] * 19 + [0b1000000001]
+    for backend in BOARD_BACKENDS.values():
+        board = backend.from_row_masks(row_masks)
+        column_masks = board.column_masks()
+        for piece in PIECE_ROTATIONS[T_BLOCK] + PIECE_ROTATIONS[I_BLOCK]:
+            for bb_y in range(-3, 11):
+                fitting = fitting_rows(column_masks, piece, bb_y)
+                for bb_x in range(-3, 23):
+                    fits = board.fits(piece, bb_x, bb_y)
+                    assert fits == (board.placement_error(piece, bb_x, bb_y) is None)
+                    assert fits == bool(fitting >> (bb_x + FITTING_BB_X_OFFSET) & 1)
+
+
+def test_board_heights_find_landing_rows():
+    import random
+
+    from player.board import BOARD_BACKENDS
+    from player.piece_tables import PIECE_ROTATIONS
+    from player.player import Player
+    from player.player_consts import T_BLOCK
+
+    for board_backend in BOARD_BACKENDS:
+        overhang_board = BOARD_BACKENDS[board_backend].from_row_masks([0, 0, 0, 0b1111] + [0] * 18)
+        assert overhang_board.heights == [4] * 4 + [0] * 6
+        assert overhang_board.drop_row(PIECE_ROTATIONS[T_BLOCK][0], 0, 0) == -1  # Under the overhang
+        assert overhang_board.drop_row(PIECE_ROTATIONS[T_BLOCK][0], 10, 0) == 3
+        rng = random.Random(0)
+        game_player = Player(0, board_backend=board_backend, seed=0)
+        game_player.spawn_first_piece()
+        for _ in range(150):
+            for _ in range(rng.randrange(12)):
+                rng.choice([game_player.move_sideways, game_player.rotate])(rng.choice([-1, 1]))
+                if rng.random() < 0.3:
+                    game_player.cycle()
+            landing_bb_x = game_player.bb_x
+            while game_player.board.fits(game_player.active_piece_rotation, landing_bb_x - 1, game_player.bb_y):
+                landing_bb_x -= 1
+            assert game_player.landing_bb_x() == landing_bb_x
+            game_player.cycle(hard_drop=True)
+            assert game_player.last_locked_piece[2] == landing_bb_x
+            masks = game_player.board.row_masks()
+            assert game_player.board.heights == [
+                max((x + 1 for x in range(22) if masks[x] >> y & 1), default=0) for y in range(10)
+            ]
+            if max(game_player.board.heights) > 16:
+                game_player.board = BOARD_BACKENDS[board_backend]()
+
+
+def test_board_backends_clear_rows():
+    from player.board import BOARD_BACKENDS
+    from player.piece_tables import piece_rotation_from_bounding_box
+    from player.player_consts import DEAD, EMPTY, WIDTH
+
+    bb = [[0] * WIDTH for _ in range(WIDTH)]
+    bb[0] = [1] * WIDTH
+    bb[1][3] = 1
+    bb[2] = [1] * WIDTH
+    for backend in BOARD_BACKENDS.values():
+        board = backend()
+        board.lock(piece_rotation_from_bounding_box(bb), 0, 0)
+        assert board.clear_full_rows() == [0, 2]
+        assert list(board[0]) == [DEAD if y == 3 else EMPTY for y in range(WIDTH)]
+        assert list(board[1]) == [EMPTY] * WIDTH
+
+
+def test_board_backends_insert_garbage():
+    import random
+
+    from player.board import BOARD_BACKENDS
+
+    rng = random.Random(0)
+    for _ in range(100):
+        masks = [rng.getrandbits(10) if x < rng.randint(0, 22) else 0 for x in range(22)]
+        garbage = [rng.getrandbits(10) for _ in range(rng.randint(0, 6))]
+        results = []
+        for board_class in BOARD_BACKENDS.values():
+            board = board_class.from_row_masks(masks)
+            overflow = board.insert_garbage(garbage)
+            results.append((overflow, board.row_masks()))
+        assert results[0] == results[1]
+        assert results[0][1] == (garbage + masks)[:22]
+        assert results[0][0] == any(masks[22 - len(garbage):])
+
+
+def test_versus_garbage_attacks_and_cancels():
+    import itertools
+
+    from player.board import BitBoard
+    from player.garbage import GarbageQueue, GarbageRouter
+    from player.player import Player
+    from player.player_consts import FULL_ROW_MASK, I_BLOCK, MAX_GARBAGE_PER_LOCK
+
+    queue = GarbageQueue()
+    queue.push(3)
+    queue.push(2)
+    assert queue.cancel(4) == 0 and queue.lines == 1
+    assert queue.cancel(3) == 2 and queue.lines == 0
+
+    for seed in itertools.count():  # A game that starts with an I piece
+        attacker = Player(0, seed=seed)
+        attacker.spawn_first_piece()
+        if attacker.active_piece_key == I_BLOCK:
+            break
+    target = Player(1, seed=0)
+    target.spawn_first_piece()
+    GarbageRouter([attacker, target])
+    # A well in the first column, and a block left over so that it isn't a perfect clear
+    attacker.board = BitBoard.from_row_masks([FULL_ROW_MASK & ~1] * 4 + [1 << 5] + [0] * 17)
+    attacker.rotate(1)
+    for _ in range(5):
+        attacker.move_sideways(-1)
+    attacker.cycle(hard_drop=True)  # Tetris
+    assert attacker.lines_sent == 4 and target.incoming_garbage.lines == 4
+    target.incoming_garbage.push(MAX_GARBAGE_PER_LOCK)
+    target.cycle(hard_drop=True)  # Locks without clearing, so the garbage rises
+    garbage = target.board.row_masks()[:MAX_GARBAGE_PER_LOCK]
+    assert target.incoming_garbage.lines == 4
+    assert all(bin(row).count("1") == 9 for row in garbage)
+    assert len(set(garbage[-4:])) == 1  # The oldest attack rose first, with a single hole
+
+
+def test_garbage_game_over_leaves_no_active_piece():
+    from player.board import BitBoard
+    from player.exceptions import GameOverException
+    from player.player import Player
+    from player.player_consts import HEIGHT, MAX_GARBAGE_PER_LOCK
+
+    game_player = Player(0, seed=0)
+    game_player.spawn_first_piece()
+    # A column high enough for the garbage to push it out of the top
+    game_player.board = BitBoard.from_row_masks([1] * (HEIGHT - MAX_GARBAGE_PER_LOCK + 1) + [0] * 7)
+    game_player.incoming_garbage.push(MAX_GARBAGE_PER_LOCK)
+    try:
+        game_player.cycle(hard_drop=True)
+        assert False, "The garbage should have ended the game"
+    except GameOverException:
+        pass
+    assert game_player.active_piece_rotation is None
+    # The locked piece rose with the board, and isn't drawn again where it locked
+    assert game_player.get_board_masks() == game_player.board.row_masks()
+
+
+def test_active_piece_is_not_on_board():
+    from player.player import Player
+    from player.player_consts import LIVE
+
+    game_player = Player(0)
+    game_player.spawn_first_piece()
+    assert all(LIVE not in row for row in game_player.board.to_list())
+    assert sum(row.count(LIVE) for row in game_player.get_board_view()) == 4
+
+
+def test_piece_tables_match_rotations():
+    from player.piece_tables import PIECE_ROTATIONS, WALL_KICKS, rotate_bounding_box
+    from player.player_consts import GENERAL_BLOCK_OFFSET_DATA, SHAPES_DICT, T_BLOCK
+
+    for piece_key, bounding_box in SHAPES_DICT.items():
+        for rotation in PIECE_ROTATIONS[piece_key]:
+            assert rotation.bounding_box == bounding_box
+            bounding_box = rotate_bounding_box(bounding_box)
+    assert WALL_KICKS[T_BLOCK][(0, 1)][2] == (
+        GENERAL_BLOCK_OFFSET_DATA[0][2][0] - GENERAL_BLOCK_OFFSET_DATA[1][2][0],
+        GENERAL_BLOCK_OFFSET_DATA[0][2][1] - GENERAL_BLOCK_OFFSET_DATA[1][2][1],
+    )
+
+
+def test_piece_queue_bags():
+    import random
+
+    from player.piece_queue import PieceQueue
+    from player.player_consts import PIECE_KEYS
+
+    queue = PieceQueue(rng=random.Random(1))
+    pieces = [queue.pop() for _ in range(len(PIECE_KEYS) * 3)]
+    for i in range(0, len(pieces), len(PIECE_KEYS)):
+        assert sorted(pieces[i:i + len(PIECE_KEYS)]) == sorted(PIECE_KEYS)
+    same_seed_queue = PieceQueue(rng=random.Random(1))
+    assert pieces == [same_seed_queue.pop() for _ in range(len(pieces))]
+    queue.push_front(PIECE_KEYS[0])
+    assert queue.peek() == PIECE_KEYS[0] == queue.preview()[0] == queue.pop()
+
+
+def test_headless_game_is_deterministic():
+    import random
+
+    from game.game_consts import DROP, LEFT, RIGHT, ROTATE
+    from game.headless import HeadlessGame
+
+    rng = random.Random(0)
+    inputs = [(i * 0.1, rng.choice([LEFT, RIGHT, ROTATE, DROP])) for i in range(300)]
+    games = [HeadlessGame(seed=7) for _ in range(2)]
+    for game in games:
+        game.run(inputs)
+    assert games[0].game_over and games[1].game_over
+    assert games[0].player.board.to_list() == games[1].player.board.to_list()
+    assert games[0].player.score == games[1].player.score
+
+
+def test_batch_env_observes_every_game():
+    import numpy as np
+
+    from game.batch_env import BatchEnv, ProcessBatchEnv
+    from game.game_consts import ENV_ACTIONS
+    from player.player_consts import NUMPY_BOARD, PIECE_IDS
+
+    rng = np.random.default_rng(0)
+    actions = [rng.integers(0, len(ENV_ACTIONS), 6, dtype=np.int8) for _ in range(200)]
+    env = BatchEnv(6, seed=3)
+    observation = env.reset()
+    boards, dones = [], 0
+    for step_actions in actions:
+        observation, rewards, step_dones = env.step(step_actions)
+        boards.append(observation.boards.copy())
+        dones += step_dones.sum()
+    assert observation.boards.shape == (6, 22, 10) and dones > 0
+    for index, game_player in enumerate(env.players):
+        assert observation.boards[index].tolist() == game_player.get_board_view()
+        assert observation.pieces[index] == PIECE_IDS[game_player.active_piece_key]
+        assert observation.positions[index].tolist() == [game_player.bb_x, game_player.bb_y]
+    with ProcessBatchEnv(6, workers=2, seed=3) as process_env:
+        process_env.reset()
+        for step_actions, board in zip(actions, boards):
+            observation, _, _ = process_env.step(step_actions)
+            assert (observation.boards == board).all()
+    numpy_env = BatchEnv(6, seed=3, board_backend=NUMPY_BOARD)  # Writes its row masks its own way
+    numpy_env.reset()
+    for step_actions, board in zip(actions, boards):
+        observation, _, _ = numpy_env.step(step_actions)
+        assert (observation.boards == board).all()
+
+
+def test_reachable_placements():
+    import copy
+
+    from game.game_consts import ROTATE
+    from game.headless import player_action_map
+    from game.placements import reachable_placements
+    from player.board import BitBoard
+    from player.piece_tables import PIECE_ROTATIONS, WALL_KICKS
+    from player.player import Player
+    from player.player_consts import J_BLOCK, O_BLOCK, ROTATION_STATES, T_BLOCK
+
+    def player_with(piece_key, row_masks):
+        game_player = Player(0, seed=0)
+        game_player.next_pieces.push_front(piece_key)
+        game_player.spawn_first_piece()
+        game_player.board = BitBoard.from_row_masks(row_masks)
+        return game_player
+
+    def locked_cells(piece_key, rotation_state, bb_x, bb_y):
+        return frozenset((x + bb_x, y + bb_y) for x, y in PIECE_ROTATIONS[piece_key][rotation_state].cells)
+
+    def searched_cells(game_player):
+        """
+        A plain search over Player.fits, one state at a time, for the cells of every placement
+        """
+        key = game_player.active_piece_key
+        states = [(game_player.rotation_state, game_player.bb_x, game_player.bb_y)]
+        cells = set()
+        for rotation_state, bb_x, bb_y in states:
+            if not game_player.fits(key, rotation_state, bb_x - 1, bb_y):
+                cells.add(locked_cells(key, rotation_state, bb_x, bb_y))
+            moves = [(rotation_state, bb_x - 1, bb_y)] + [(rotation_state, bb_x, bb_y + diff) for diff in (-1, 1)]
+            new_rotation_state = (rotation_state + 1) % ROTATION_STATES
+            for x_offset, y_offset in WALL_KICKS[key][(rotation_state, new_rotation_state)]:
+                if game_player.fits(key, new_rotation_state, bb_x + x_offset, bb_y + y_offset):
+                    moves.append((new_rotation_state, bb_x + x_offset, bb_y + y_offset))
+                    break
+            states += [move for move in moves if game_player.fits(key, *move) and move not in states]
+        return cells
+
+    empty_board = [0] * 22
+    assert len(reachable_placements(player_with(O_BLOCK, empty_board))) == 9
+    assert len(reachable_placements(player_with(T_BLOCK, empty_board))) == 34
+    # A roof over columns 0 to 3, that a J-Block can only be tucked under by soft dropping and sliding left
+    overhang_board = [0b0000000000, 0b0000000000, 0b0000001111] + [0] * 19
+    # A slot under a roof over column 3, that a T-Block only gets into by a rotation kicking it a row down
+    kick_board = [0b1111000111, 0b1111001111] + [0] * 20
+    for piece_key, row_masks in [(J_BLOCK, overhang_board), (T_BLOCK, kick_board), (T_BLOCK, empty_board)]:
+        game_player = player_with(piece_key, row_masks)
+        placements = reachable_placements(game_player)
+        cells = searched_cells(game_player)
+        assert len(placements) == len(cells)  # Once per set of locked cells
+        assert {locked_cells(piece_key, *placement[:3]) for placement in placements} == cells
+        for placement in placements:
+            placed_player = copy.deepcopy(game_player)
+            action_map = player_action_map(placed_player)
+            for action in placement.actions:
+                action_map[action]()
+            assert placed_player.last_locked_piece == (piece_key,) + placement[:3]
+    placements = reachable_placements(player_with(J_BLOCK, overhang_board))
+    tucked = [placement for placement in placements if placement.bb_x <= 0 and placement.bb_y <= 1]
+    assert tucked and "down" in tucked[0].actions
+    placements = reachable_placements(player_with(T_BLOCK, kick_board))
+    kicked = [placement for placement in placements if placement[:3] == (0, -1, 3)]
+    assert kicked and kicked[0].actions[-2] == ROTATE
+
+
+def test_game_logic_imports_without_curses():
+    import subprocess
+    import sys
+
+    code = "import sys, game.game, game.headless, server.server; print('_curses' in sys.modules)"
+    output = subprocess.run([sys.executable, "-c", code], stdout=subprocess.PIPE, check=True).stdout
+    assert output.strip() == b"False"
+
+
+def test_replay_round_trip():
+    import itertools
+    import random
+
+    from game.game_consts import DROP, GRAVITY, HOLD, LEFT, RIGHT, ROTATE
+    from game.headless import HeadlessGame
+    from game.replay import ReplayRecorder, decode_replay, encode_replay, play_replay, player_seed
+    from player.garbage import GarbageRouter
+
+    rng = random.Random(3)
+    ticks = itertools.count()
+    recorder = ReplayRecorder(seed=42, players_count=2, clock=lambda: next(ticks) / 100, versus=True)
+    games = [HeadlessGame(player_id=i, seed=player_seed(42, i)) for i in range(2)]
+    GarbageRouter([game.player for game in games])
+    for _ in range(400):
+        game = rng.choice(games)
+        action = rng.choice([LEFT, RIGHT, ROTATE, DROP, HOLD, GRAVITY])
+        recorder.record(game.player_id, action)
+        game.act(action)
+
+    replay = decode_replay(encode_replay(recorder.replay))
+    assert replay == recorder.replay
+    for game, played_game in zip(games, play_replay(replay)):
+        assert game.player.board.to_list() == played_game.player.board.to_list()
+        assert (game.player.score, game.game_over) == (played_game.player.score, played_game.game_over)
+
+
+class _FakeWindow:
+    """
+    A stand-in for a curses window, remembering the rows written to it
+    """
+
+    def __init__(self, rows=40, cols=60):
+        self.rows, self.cols = rows, cols
+        self.written_rows = []
+        self.refreshes = 0
+
+    def getmaxyx(self):
+        return self.rows, self.cols
+
+    def insstr(self, y, x, text):
+        self.written_rows.append(y)
+
+    def refresh(self):
+        self.refreshes += 1
+
+    def clear(self):
+        pass
+
+
+def _game_screen(window):
+    from game.game_consts import DEFAULT_KEYMAP
+    from player.player import Player
+    from screen.views.game_views import GameScreen
+
+    game_player = Player(0, seed=0)
+    game_player.spawn_first_piece()
+    stats = {"score": lambda p: p.score}
+    return game_player, GameScreen(stdscr=window, game_player=game_player, keymap=DEFAULT_KEYMAP, stats_map=stats)
+
+
+def test_game_screen_only_writes_changed_rows():
+    window = _FakeWindow()
+    game_player, game_screen = _game_screen(window)
+    game_screen.print_screen()
+    assert len(window.written_rows) == window.rows
+    window.written_rows = []
+    game_screen.print_screen()
+    assert window.written_rows == [] and window.refreshes == 1
+    game_player.cycle(hard_drop=True)
+    game_screen.print_screen()
+    # The ghost piece's rows locking, the new ghost piece's rows and the next piece's rows
+    assert 0 < len(window.written_rows) <= 6
+
+
+def test_game_screen_caches_side_panels():
+    from screen.views.game_views_consts import HELP_BORDER_TEXT, NEXT_BORDER_TEXT
+
+    game_player, game_screen = _game_screen(_FakeWindow())
+    for _ in range(3):
+        game_screen.print_screen()
+    assert game_screen.panel_misses[HELP_BORDER_TEXT] == 1
+    assert game_screen.panel_hits[HELP_BORDER_TEXT] == 2
+    game_player.cycle(hard_drop=True)
+    game_screen.print_screen()
+    assert game_screen.panel_misses[NEXT_BORDER_TEXT] == 2
+
+
+def test_key_reader_dispatches_on_readable_fd():
+    import asyncio
+    import os
+
+    from game.game_consts import DEFAULT_KEYMAP, DROP, LEFT, NO_KEY, QUIT, SECONDARY_KEYMAP
+    from game.key_reader import KeyReader
+
+    class KeysWindow:
+        def __init__(self):
+            self.keys = []
+
+        def getch(self):
+            return self.keys.pop(0) if self.keys else NO_KEY
+
+    async def read():
+        read_fd, write_fd = os.pipe()
+        window = KeysWindow()
+        key_reader = KeyReader(window, [DEFAULT_KEYMAP, SECONDARY_KEYMAP], fd=read_fd)
+        key_reader.start()
+        window.keys = [DEFAULT_KEYMAP[LEFT], SECONDARY_KEYMAP[DROP], DEFAULT_KEYMAP[QUIT]]
+        os.write(write_fd, b"x")
+        first_player = [await key_reader.queues[0].get() for _ in range(2)]
+        second_player = [await key_reader.queues[1].get() for _ in range(2)]
+        key_reader.stop()
+        os.close(read_fd)
+        os.close(write_fd)
+        return first_player, second_player
+
+    assert asyncio.run(read()) == ([LEFT, QUIT], [DROP, QUIT])
+
+
+def test_render_scheduler_caps_frames():
+    import asyncio
+
+    from screen.render_scheduler import RenderScheduler
+
+    class CountingScreen:
+        prints = 0
+
+        def print_screen(self, stage_only=False):
+            assert stage_only
+            CountingScreen.prints += 1
+
+    updates = []
+    scheduler = RenderScheduler(fps=20, update=lambda: updates.append(None))
+    screens = [CountingScreen(), CountingScreen()]
+
+    async def type_fast():
+        for _ in range(50):
+            for dirty_screen in screens:
+                scheduler.mark_dirty(dirty_screen)
+            await asyncio.sleep(0.002)
+
+    async def run():
+        start = asyncio.get_running_loop().time()
+        render_task = asyncio.ensure_future(scheduler.run())
+        await type_fast()
+        render_task.cancel()
+        return asyncio.get_running_loop().time() - start
+
+    duration = asyncio.run(run())
+    assert 1 <= len(updates) <= duration * 20 + 1 < 50
+    assert CountingScreen.prints == 2 * len(updates)
+
+
+def test_gravity_clock_catches_up():
+    from game.game_clock import GravityClock
+
+    now = [0.0]
+    clock = GravityClock(period=0.1, clock=lambda: now[0], max_catch_up=5)
+    assert clock.tick() == 1  # The first step is due right away
+    assert clock.tick() == 0
+    now[0] = 0.35  # The loop fell behind, and owes the steps of 0.1, 0.2 and 0.3
+    assert clock.tick() == 3
+    assert abs(clock.lag - 0.25) < 1e-9  # Late since the step of 0.1
+    assert abs(clock.time_until_next_step() - 0.05) < 1e-9
+    clock.set_period(0.05)  # The next step is now relative to the last one, at 0.35
+    now[0] = 0.36
+    assert clock.tick() == 1
+    now[0] = 10.0
+    assert clock.tick() == 5
+    assert clock.skipped_steps > 0
+
+
+def test_headless_game_gravity_runs_on_the_clock():
+    from game.game_consts import GRAVITY
+    from game.headless import HeadlessGame
+
+    game = HeadlessGame(seed=0)
+    gravity_times = []
+    fall = game.action_map[GRAVITY]
+    game.action_map[GRAVITY] = lambda: (gravity_times.append(game.time), fall())
+    game.advance(2.5 * game.fall_speed)
+    assert gravity_times == [0.0, game.fall_speed, 2 * game.fall_speed]  # Due right away, then every period
+    assert game.gravity_clock.skipped_steps == 0 and game.gravity_clock.max_lag == 0.0
+
+
+def test_telnet_decoder():
+    from game.game_consts import KEY_LEFT, KEY_UP
+    from server.server_consts import DO, DONT, ESC, IAC, NAWS, SB, SE, SGA, WILL, WONT
+    from server.telnet import TelnetDecoder
+
+    linemode, timing_mark = 34, 6  # Options the server doesn't support
+
+    sizes = []
+    decoder = TelnetDecoder(on_resize=lambda rows, cols: sizes.append((rows, cols)))
+    stream = (
+        bytes([IAC, DO, SGA])
+        + b"l\x1b[A"
+        + bytes([IAC, SB, NAWS, 0, IAC, IAC, 0, 30, IAC, SE])  # 255 columns, doubled as data
+        + b" \r\x00\x1b[D"
+    )
+    keys = []
+    for i in range(len(stream)):  # Byte by byte, so that every sequence is split
+        keys += decoder.feed(stream[i:i + 1])
+    assert keys == [ord("l"), KEY_UP, ord(" "), ord("\r"), KEY_LEFT]
+    assert sizes == [(30, 255)]
+
+    replies = []
+    decoder = TelnetDecoder(reply=replies.append)
+    assert decoder.feed(bytes([IAC, WILL, NAWS, IAC, DO, SGA, IAC, WILL, linemode, IAC, DO, timing_mark])) == []
+    assert replies == [bytes([IAC, DONT, linemode]), bytes([IAC, WONT, timing_mark])]
+    assert decoder.feed(b"\x1b") == [] and decoder.pending_escape  # Maybe the start of an arrow key
+    assert decoder.flush() == [ESC]  # Nothing followed, so it was a lone ESC
+    assert decoder.feed(b"\x1b[") == [] and decoder.flush() == [ESC, ord("[")]
+    assert decoder.flush() == [] and decoder.feed(b"\x1b[A") == [KEY_UP]
+
+
+def test_telnet_server_sessions():
+    import asyncio
+
+    from server.server import GameServer
+    from server.server_consts import IAC, NAWS, SB, SE
+
+    async def client(port):
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(bytes([IAC, SB, NAWS, 0, 80, 0, 24, IAC, SE]) + b"s")  # Single player
+        received = b""
+        while b"TETRIS" not in received:
+            received += await asyncio.wait_for(reader.read(65536), timeout=5)
+        writer.close()
+        return received
+
+    async def run():
+        game_server = GameServer()
+        server = await game_server.start(host="127.0.0.1", port=0)
+        port = server.sockets[0].getsockname()[1]
+        frames = await asyncio.gather(*[client(port) for _ in range(3)])
+        while game_server.sessions:  # Every session ends once its client left
+            await asyncio.sleep(0.01)
+        server.close()
+        return frames
+
+    for frame in asyncio.run(run()):
+        assert frame.startswith(bytes([IAC]))  # Negotiation comes first
+        assert b"\x1b[" in frame
+
+
+def test_game_screen_draws_live_opponent_boards():
+    from game.game_consts import DEFAULT_KEYMAP
+    from player.player import Player
+    from screen.renderers import NullRenderer
+    from screen.views.game_views import GameScreen
+    from screen.views.game_views_consts import OPPONENT_BORDER_TEXT
+
+    game_player, opponent = Player(0, seed=0), Player(1, seed=1)
+    game_player.spawn_first_piece()
+    opponent.spawn_first_piece()
+    game_screen = GameScreen(
+        stdscr=NullRenderer(size=(30, 100)),
+        game_player=game_player,
+        keymap=DEFAULT_KEYMAP,
+        stats_map={"score": lambda p: p.score},
+        opponents={1: opponent},
+    )
+    opponent_panel = OPPONENT_BORDER_TEXT.format(number=2)
+    game_screen.print_screen()
+    game_screen.print_screen()
+    assert game_screen.panel_misses[opponent_panel] == 1 and game_screen.panel_hits[opponent_panel] == 1
+    opponent.cycle(hard_drop=True)
+    game_screen.print_screen()  # Redrawn from the opponent's board, with nothing sent to the screen
+    assert game_screen.panel_misses[opponent_panel] == 2
+
+
+def test_board_stream_rebuilds_board():
+    import random
+
+    from game.headless import player_action_map
+    from player.board import BOARD_BACKENDS
+    from player.exceptions import GameOverException
+    from player.player import Player
+    from server.board_stream import BoardDecoder, BoardEncoder, player_piece_state
+
+    rng = random.Random(0)
+    for board_backend in BOARD_BACKENDS:
+        game_player = Player(0, board_backend=board_backend, seed=0)
+        game_player.spawn_first_piece()
+        action_map = player_action_map(game_player)
+        encoder, decoder = BoardEncoder(game_player), BoardDecoder(board_backend=board_backend)
+        stream = b""
+        for _ in range(500):
+            try:
+                action_map[rng.choice(list(action_map))]()
+            except GameOverException:
+                break
+            if rng.random() < 0.05:  # Garbage with a hole
+                rows = game_player.board.row_masks()
+                garbage = [0b1111111111 & ~(1 << rng.randrange(10))] * rng.randint(1, 3)
+                game_player.board = BOARD_BACKENDS[board_backend].from_row_masks(
+                    garbage + rows[: len(rows) - len(garbage)]
+                )
+            stream += b"".join(encoder.update())
+            cut = rng.randint(0, len(stream))  # Packets may arrive split between reads
+            decoder.feed(stream[:cut])
+            stream = stream[cut:]
+        stream += b"".join(encoder.update())
+        decoder.feed(stream)
+        assert not decoder.needs_resync
+        assert decoder.board.to_list() == game_player.board.to_list()
+        assert tuple(decoder.piece) == player_piece_state(game_player)
+        assert decoder.score == game_player.score
+
+
+def test_board_stream_orders_and_resyncs():
+    from game.game_consts import DOWN, LEFT, RIGHT
+    from game.headless import player_action_map
+    from player.player import Player
+    from server.board_stream import BoardDecoder, BoardEncoder
+    from server.server_consts import BOARD_REORDER_WINDOW
+
+    game_player = Player(0, seed=0)
+    game_player.spawn_first_piece()
+    action_map = player_action_map(game_player)
+    encoder = BoardEncoder(game_player)
+    packets = encoder.update()
+    while len(packets) < BOARD_REORDER_WINDOW + 10:
+        action_map[LEFT if len(packets) % 2 else RIGHT]()
+        action_map[DOWN]()
+        packets += encoder.update()
+    swapped_decoder = BoardDecoder()
+    swapped_decoder.receive(packets[0])
+    for first, second in zip(packets[1::2], packets[2::2]):
+        swapped_decoder.receive(second)
+        swapped_decoder.receive(first)
+    swapped_decoder.receive(packets[-1])  # Either a duplicate, or the odd one out
+    assert swapped_decoder.next_seq == encoder.seq and not swapped_decoder.needs_resync
+    lossy_decoder = BoardDecoder()
+    for packet in packets[:1] + packets[2:]:
+        lossy_decoder.receive(packet)
+    assert lossy_decoder.needs_resync
+    lossy_decoder.receive(encoder.snapshot())
+    assert not lossy_decoder.needs_resync
+    assert lossy_decoder.board.row_masks() == game_player.board.row_masks()
+
+
+def test_board_stream_resyncs_on_corrupt_lock():
+    import struct
+
+    from player.player import Player
+    from player.player_consts import PIECE_IDS, T_BLOCK
+    from server.board_stream import BoardDecoder, BoardEncoder
+    from server.server_consts import BOARD_PACKET_HEADER_FORMAT, BOARD_PIECE_FORMAT, LOCK_PACKET
+
+    game_player = Player(0, seed=0)
+    game_player.spawn_first_piece()
+    game_player.cycle(hard_drop=True)
+    encoder = BoardEncoder(game_player)
+    piece_key, rotation_state, bb_x, bb_y = game_player.last_locked_piece
+    for piece in [
+        (PIECE_IDS[piece_key], rotation_state, bb_x, bb_y),  # Over the piece that locked
+        (PIECE_IDS[T_BLOCK], 0, 21, 4),  # Out of the top of the board
+        (PIECE_IDS[T_BLOCK], 0, 10, -3),  # Out of its left side
+        (len(PIECE_IDS), 0, 10, 4),  # Not a piece
+    ]:
+        decoder = BoardDecoder()
+        decoder.receive(encoder.snapshot())
+        decoder.receive(struct.pack(BOARD_PACKET_HEADER_FORMAT, LOCK_PACKET, 0, encoder.seq) + struct.pack(
+            BOARD_PIECE_FORMAT, *piece
+        ))
+        assert decoder.needs_resync
+        assert decoder.board.row_masks() == game_player.board.row_masks()  # Nothing was locked
+        decoder.receive(encoder.snapshot())
+        assert not decoder.needs_resync
+
+
+def test_board_stream_resyncs_on_corrupt_packets():
+    import struct
+
+    from player.board import BOARD_BACKENDS
+    from player.player import Player
+    from player.player_consts import HEIGHT, PIECE_IDS, T_BLOCK, WIDTH
+    from server.board_stream import BoardDecoder, BoardEncoder
+    from server.server_consts import (
+        BOARD_GARBAGE_FORMAT,
+        BOARD_GARBAGE_ROW_FORMAT,
+        BOARD_PACKET_HEADER_FORMAT,
+        BOARD_PIECE_FORMAT,
+        BOARD_SNAPSHOT_FORMAT,
+        GARBAGE_PACKET,
+        MOVE_PACKET,
+        SNAPSHOT_PACKET,
+    )
+
+    def garbage(rows):
+        return GARBAGE_PACKET, struct.pack(BOARD_GARBAGE_FORMAT, len(rows)) + b"".join(
+            struct.pack(BOARD_GARBAGE_ROW_FORMAT, row) for row in rows
+        )
+
+    def snapshot(rows, piece):
+        return SNAPSHOT_PACKET, struct.pack(BOARD_SNAPSHOT_FORMAT, 0, *rows, *piece)
+
+    t_block = PIECE_IDS[T_BLOCK]
+    corrupt_packets = [
+        garbage([0b0111111111] * (HEIGHT + 5)),  # More rows than the board holds
+        garbage([1 << WIDTH]),  # A pixel past the board's width
+        snapshot([0] * (HEIGHT - 1) + [1 << WIDTH], (t_block, 0, 10, 4)),
+        snapshot([0] * HEIGHT, (len(PIECE_IDS), 0, 10, 4)),  # Not a piece
+        snapshot([0] * HEIGHT, (t_block, 0, HEIGHT, 4)),  # Out of the top of the board
+        (MOVE_PACKET, struct.pack(BOARD_PIECE_FORMAT, t_block, 4, 10, 4)),  # Not a rotation state
+        (MOVE_PACKET, struct.pack(BOARD_PIECE_FORMAT, t_block, 0, 10, WIDTH - 1)),  # Out of the right side
+    ]
+    game_player = Player(0, seed=0)
+    game_player.spawn_first_piece()
+    game_player.cycle(hard_drop=True)
+    encoder = BoardEncoder(game_player)
+    for board_backend in BOARD_BACKENDS:
+        for packet_type, payload in corrupt_packets:
+            decoder = BoardDecoder(board_backend=board_backend)
+            decoder.receive(encoder.snapshot())
+            piece = decoder.piece
+            decoder.receive(struct.pack(BOARD_PACKET_HEADER_FORMAT, packet_type, 0, encoder.seq) + payload)
+            assert decoder.needs_resync
+            assert decoder.board.row_masks() == game_player.board.row_masks() and decoder.piece == piece
+            assert len(decoder.board) == HEIGHT
+
+
+def test_board_stream_resyncs_on_unknown_packet_type():
+    import struct
+
+    from player.player import Player
+    from server.board_stream import BoardDecoder, BoardEncoder
+    from server.server_consts import BOARD_PACKET_HEADER_FORMAT
+
+    game_player = Player(0, seed=0)
+    game_player.spawn_first_piece()
+    encoder = BoardEncoder(game_player)
+    decoder = BoardDecoder()
+    decoder.feed(encoder.snapshot())
+    game_player.cycle(hard_drop=True)
+    packets = b"".join(encoder.update())
+    # The packets before the unknown one are applied, then the rest of the stream can't be split anymore
+    decoder.feed(packets + struct.pack(BOARD_PACKET_HEADER_FORMAT, 77, 0, encoder.seq) + bytes(8))
+    assert decoder.needs_resync
+    assert decoder.board.row_masks() == game_player.board.row_masks()
+    decoder.feed(encoder.snapshot())
+    assert not decoder.needs_resync
+
+
+def test_matchmaker_skips_sessions_that_left():
+    import asyncio
+
+    from game.game_consts import DEFAULT_KEYMAP
+    from screen.renderers import NullRenderer
+    from server.match import Matchmaker
+
+    class Session:
+        def __init__(self):
+            self.renderer = NullRenderer(size=(30, 100))
+            self.keymap = DEFAULT_KEYMAP
+
+        def show_waiting(self, waiting, room_size):
+            pass
+
+    async def run():
+        matchmaker = Matchmaker(room_size=4, wait_timeout=60)
+        joins = [asyncio.ensure_future(matchmaker.join(Session())) for _ in range(3)]
+        await asyncio.sleep(0)
+        joins[1].cancel()
+        matchmaker._open_room()  # The wait timer firing before the cancelled join resumes
+        (room, player_id), (other_room, other_player_id) = await asyncio.gather(joins[0], joins[2])
+        assert room is other_room and room.players_count == 2 and {player_id, other_player_id} == {0, 1}
+        assert joins[1].cancelled() and not matchmaker.waiting
+
+        joins = [asyncio.ensure_future(matchmaker.join(Session())) for _ in range(2)]
+        await asyncio.sleep(0)
+        joins[0].cancel()
+        matchmaker._open_room()  # A single player is left, no room is opened
+        await asyncio.sleep(0)
+        assert matchmaker.rooms_opened == 1 and len(matchmaker.waiting) == 1 and not joins[1].done()
+        joins[1].cancel()
+
+    asyncio.run(run())
+
+
+def test_telnet_server_matches():
+    import asyncio
+
+    from server.server import GameServer
+    from server.server_consts import IAC, NAWS, SB, SE
+
+    async def client(port, opponent_title):
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(bytes([IAC, SB, NAWS, 0, 100, 0, 30, IAC, SE]) + b"m")  # Online match
+        received = b""
+        while opponent_title not in received:
+            received += await asyncio.wait_for(reader.read(65536), timeout=10)
+        writer.close()
+        return received
+
+    async def run():
+        game_server = GameServer(match_size=2)
+        server = await game_server.start(host="127.0.0.1", port=0)
+        port = server.sockets[0].getsockname()[1]
+        await asyncio.gather(client(port, b"P2"), client(port, b"P1"))
+        while game_server.sessions:
+            await asyncio.sleep(0.01)
+        server.close()
+        return game_server.matchmaker
+
+    matchmaker = asyncio.run(run())
+    assert matchmaker.rooms_opened == 1 and not matchmaker.waiting
+
+
+def test_telnet_server_hands_matches_to_the_match_worker():
+    import asyncio
+
+    from server.handoff import handoff_links
+    from server.server import GameServer
+    from server.server_consts import IAC, NAWS, SB, SE
+
+    async def client(port):
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(bytes([IAC, SB, NAWS, 0, 100, 0, 30, IAC, SE]) + b"m")  # Online match
+        received = b""
+        while b"P1" not in received and b"P2" not in received:  # Whichever player id the session got
+            received += await asyncio.wait_for(reader.read(65536), timeout=10)
+        writer.close()
+        return received
+
+    async def run():
+        handoff_link, adopt_link = handoff_links()
+        # Two workers, as if in two processes, the second one serving the matches
+        worker = GameServer(match_size=2, handoff_link=handoff_link)
+        match_worker = GameServer(match_size=2, adopt_link=adopt_link)
+        servers = [await game_server.start(host="127.0.0.1", port=0) for game_server in (worker, match_worker)]
+        ports = [server.sockets[0].getsockname()[1] for server in servers]
+        await asyncio.gather(client(ports[0]), client(ports[1]))
+        while worker.sessions or match_worker.sessions:
+            await asyncio.sleep(0.01)
+        for server in servers:
+            server.close()
+        handoff_link.close()
+        adopt_link.close()
+        return worker.matchmaker, match_worker.matchmaker
+
+    matchmaker, match_worker_matchmaker = asyncio.run(run())
+    assert matchmaker.rooms_opened == 0
+    assert match_worker_matchmaker.rooms_opened == 1 and not match_worker_matchmaker.waiting
+
+
+def test_telnet_server_spectators():
+    import asyncio
+
+    from server.server import GameServer
+    from server.server_consts import IAC, NAWS, SB, SE
+
+    window_size = bytes([IAC, SB, NAWS, 0, 80, 0, 24, IAC, SE])
+
+    async def read_until(reader, text):
+        received = b""
+        while text not in received:
+            received += await asyncio.wait_for(reader.read(65536), timeout=5)
+        return received
+
+    async def run():
+        game_server = GameServer()
+        server = await game_server.start(host="127.0.0.1", port=0)
+        port = server.sockets[0].getsockname()[1]
+        player_reader, player_writer = await asyncio.open_connection("127.0.0.1", port)
+        player_writer.write(window_size + b"s")
+        await read_until(player_reader, b"NEXT")
+        spectator_reader, spectator_writer = await asyncio.open_connection("127.0.0.1", port)
+        spectator_writer.write(window_size + b"w")
+        await read_until(spectator_reader, b"NEXT")  # The keyframe of the player's screen
+        player_writer.close()
+        await read_until(spectator_reader, b"No games")  # Back to picking a game once the player left
+        spectator_writer.close()
+        while game_server.sessions:
+            await asyncio.sleep(0.01)
+        server.close()
+
+    asyncio.run(run())
+
+
+def test_broadcaster_drops_frames_of_slow_watchers():
+    import asyncio
+
+    from server.spectators import Broadcaster
+
+    class FakeWriter:
+        def __init__(self):
+            self.transport = self
+            self.unsent = 0
+            self.sent = []
+
+        def write(self, data):
+            self.sent.append(data)
+
+        def is_closing(self):
+            return False
+
+        def get_write_buffer_size(self):
+            return self.unsent
+
+    async def run():
+        broadcaster = Broadcaster(keyframe=lambda: b"keyframe", buffer_limit=100, resume_size=10)
+        fast, slow = FakeWriter(), FakeWriter()
+        fast_watcher, slow_watcher = broadcaster.attach(fast), broadcaster.attach(slow)
+        slow.unsent = 1000
+        broadcaster.publish(b"1")
+        broadcaster.publish(b"2")  # Both frames are fanned out together
+        await asyncio.sleep(0)
+        broadcaster.publish(b"3")
+        await asyncio.sleep(0)
+        slow.unsent = 50  # Still lagging, until it drains below resume_size
+        broadcaster.publish(b"4")
+        await asyncio.sleep(0)
+        slow.unsent = 0
+        broadcaster.publish(b"5")
+        await asyncio.sleep(0)
+        assert fast.sent == [b"keyframe", b"12", b"3", b"4", b"5"]
+        assert slow.sent == [b"keyframe", b"keyframe"]
+        assert slow_watcher.frames_dropped == 3 and not slow_watcher.lagging
+        broadcaster.close()
+        assert fast_watcher.detached.is_set()
+
+    asyncio.run(run())
+
+
+def test_ansi_renderer_only_sends_changed_cells():
+    from screen.renderers import AnsiRenderer
+
+    sent = []
+    renderer = AnsiRenderer(write=sent.append, size=(3, 10))
+    renderer.write_row(0, "abcdef")
+    renderer.write_row(5, "out of the terminal")
+    renderer.present()
+    assert sent == [b"\x1b[1;1Habcdef"]
+    renderer.write_row(0, "abXdef")
+    renderer.write_row(1, "")
+    renderer.stage()
+    renderer.write_row(0, "ab")
+    renderer.present()
+    assert sent[1:] == [b"\x1b[1;3HX\x1b[1;3H\x1b[K"]
+
+
+def test_game_screen_draws_to_any_renderer():
+    from screen.renderers import NullRenderer
+
+    renderer = NullRenderer(size=(30, 60))
+    game_player, game_screen = _game_screen(renderer)
+    game_screen.print_screen(stage_only=True)
+    assert renderer.rows_written == 30 and renderer.updates == 0
+    game_player.cycle(hard_drop=True)
+    game_screen.print_screen()
+    assert 30 < renderer.rows_written <= 36 and renderer.updates == 1
+
+
+def test_worker_supervisor_restarts_crashed_workers():
+    import asyncio
+
+    from server.server_consts import IAC, NAWS, SB, SE
+    from server.workers import WorkerSupervisor
+
+    async def connect(port):
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(bytes([IAC, SB, NAWS, 0, 80, 0, 24, IAC, SE]) + b"s")  # Single player
+        received = b""
+        while b"TETRIS" not in received:
+            received += await asyncio.wait_for(reader.read(65536), timeout=5)
+        writer.close()
+
+    async def connect_all(port, sessions, attempts=50):
+        for _ in range(attempts):  # The workers might still be starting
+            try:
+                return await asyncio.gather(*[connect(port) for _ in range(sessions)])
+            except ConnectionRefusedError:
+                await asyncio.sleep(0.1)
+        raise ConnectionRefusedError
+
+    supervisor = WorkerSupervisor(workers=2, host="127.0.0.1", port=0)
+    supervisor.start()
+    try:
+        asyncio.run(connect_all(supervisor.port, sessions=6))
+        supervisor.processes[0].kill()
+        supervisor.restart_crashed(timeout=5)
+        assert supervisor.restarts == 1
+        assert all(process.is_alive() for process in supervisor.processes)
+        asyncio.run(connect_all(supervisor.port, sessions=6))
+    finally:
+        supervisor.stop()
@@ -1,6 +1,7 @@
 """
 Here are various utility functions useful for the project
 """
+import asyncio
 import logging as log
 
 
@@ -9,3 +10,17 @@ def initlog(log_path):
     Initializes a 'logging' logger with a DEBUG level (hardcoded right now)
     """
     log.basicConfig(filename=log_path, filemode="w+", level=log.DEBUG)
+
+
+async def run_until_first_done(*coros):
+    """
+    Runs coroutines together until one of them returns or raises, then cancels the others
+    :return: The result of the first one done, its exception is raised
+    """
+    tasks = [asyncio.ensure_future(coro) for coro in coros]
+    try:
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        return done.pop().result()
+    finally:
+        for task in tasks:
+            task.cancel()